@@ -0,0 +1,151 @@
+"""
+Teste de estresse: milhares de comandos concorrentes contra o cog de música
+
+Uso:
+    python -m benchmarks.concurrency_stress [--guilds N] [--commands N] [--track-seconds S]
+
+Dispara !play, !skip, !pause, !resume, !shuffle e cliques nos botões do
+painel ao mesmo tempo, em vários servidores falsos (sem Discord, rede ou
+FFmpeg; veja benchmarks/fakes.py). Depois espera as filas esvaziarem e
+confere as invariantes da serialização por servidor:
+
+- nenhum `play` com outra música já tocando;
+- nenhuma música tocada duas vezes;
+- nenhuma música aceita na fila que nunca tocou;
+- nenhuma vaga do supervisor do FFmpeg presa depois que tudo parou.
+
+Termina com código 1 se alguma invariante for violada.
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from collections import Counter
+
+from benchmarks.fakes import FakeBot, FakeContext, FakeGuild, FakeInteraction, FakeResolver, create_music_cog
+
+from utils.views import MusicControlButton
+
+# Peso de cada comando no sorteio
+COMMAND_WEIGHTS = {
+    'play': 60,
+    'skip': 15,
+    'pause': 5,
+    'resume': 5,
+    'shuffle': 5,
+    'button_skip': 5,
+    'button_play_pause': 5,
+}
+
+
+async def run_command(cog, bot, guild, name: str, query: str, errors: Counter):
+    try:
+        if name.startswith('button_'):
+            button = MusicControlButton(name[len('button_'):], guild.id)
+            await button.callback(FakeInteraction(bot, guild))
+        elif name == 'play':
+            await cog.play.callback(cog, FakeContext(guild), query=query)
+        else:
+            command = getattr(cog, name)
+            await command.callback(cog, FakeContext(guild))
+    except Exception as e:
+        errors[type(e).__name__] += 1
+
+
+async def drain(cog, guilds, timeout: float):
+    """Retoma o que ficou pausado e espera todas as filas acabarem"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        busy = False
+        for guild in guilds:
+            manager = await cog.music_manager.get_guild_manager(guild.id)
+            if manager.voice_client and manager.voice_client.is_paused():
+                manager.voice_client.resume()
+            if manager.is_active or manager.queue:
+                busy = True
+        if not busy:
+            return True
+        await asyncio.sleep(0.05)
+    return False
+
+
+async def run(args) -> bool:
+    random.seed(args.seed)
+    bot = FakeBot()
+    resolver = FakeResolver(latency=args.latency, jitter=args.latency)
+    cog = create_music_cog(bot, resolver)
+    guilds = [FakeGuild(args.track_seconds) for _ in range(args.guilds)]
+
+    names = random.choices(list(COMMAND_WEIGHTS), weights=list(COMMAND_WEIGHTS.values()), k=args.commands)
+    requested = {}
+    tasks = []
+    errors = Counter()
+    start = time.perf_counter()
+    for i, name in enumerate(names):
+        guild = random.choice(guilds)
+        query = f'musica-{i}'
+        if name == 'play':
+            requested[f'stream://https://www.youtube.com/watch?v={query}'] = guild
+        tasks.append(asyncio.create_task(run_command(cog, bot, guild, name, query, errors)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+
+    drained = await drain(cog, guilds, args.timeout)
+
+    double_starts = 0
+    played = Counter()
+    queue_full = 0
+    for guild in guilds:
+        for client in guild.voice_channel.voice_clients:
+            double_starts += client.double_starts
+            played.update(client.played)
+        queue_full += sum(count for title, count in guild.text_channel.titles.items() if 'Fila Cheia' in title)
+    duplicates = sum(count - 1 for count in played.values() if count > 1)
+    # Com as filas vazias, toda fonte já passou pelo cleanup
+    ffmpeg_slots = cog.music_manager.ffmpeg.active
+    lost = len(set(requested) - set(played)) - queue_full
+
+    print(f"{args.commands} comandos em {args.guilds} servidores: {elapsed:.2f}s "
+          f"({args.commands / elapsed:,.0f} comandos/s)")
+    print(f"Músicas pedidas: {len(requested)}  tocadas: {len(played)}  recusadas (fila cheia): {queue_full}")
+    print(f"Comandos por tipo: {dict(Counter(names))}")
+    if errors:
+        print(f"Exceções: {dict(errors)}")
+    if cog.scheduler.sent:
+        print(f"Painel: {cog.scheduler.scheduled} atualizações agendadas, {cog.scheduler.sent} enviadas")
+
+    violations = {
+        'play com música tocando': double_starts,
+        'músicas tocadas duas vezes': duplicates,
+        'músicas perdidas': lost,
+        'filas que não esvaziaram': 0 if drained else 1,
+        'vagas do FFmpeg presas': ffmpeg_slots,
+    }
+    ok = True
+    for label, count in violations.items():
+        status = 'ok' if not count else 'FALHOU'
+        ok = ok and not count
+        print(f"{label:<28} {count:>6}  {status}")
+
+    cog.scheduler.close()
+    await cog.music_manager.cleanup_all()
+    return ok and not errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--guilds', type=int, default=100)
+    parser.add_argument('--commands', type=int, default=5000)
+    parser.add_argument('--track-seconds', type=float, default=0.02, help='Duração de cada música falsa')
+    parser.add_argument('--latency', type=float, default=0.02, help='Latência simulada do yt-dlp')
+    parser.add_argument('--timeout', type=float, default=120, help='Tempo máximo para as filas esvaziarem')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if not asyncio.run(run(args)):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,443 @@
+"""
+Objetos falsos do Discord e do yt-dlp para rodar o cog de música sem rede, sem FFmpeg e sem token
+
+Usados pelos harnesses de estresse/carga. O `FakeResolver` substitui o
+resolvedor inteiro; o `FakeYoutubeDL` entra no `YTDLPool` e deixa o
+`Resolver` real (threads, limites e cache) no caminho. Importe este módulo antes do
+`config` (ou de qualquer módulo que o importe): ele força o backend de
+estado em memória, desativa o cache de áudio e usa o modo PCM.
+"""
+import asyncio
+import itertools
+import math
+import os
+import random
+import time
+import zlib
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional
+
+os.environ['STATE_BACKEND'] = 'memory'
+os.environ['AUDIO_CACHE_DIR'] = ''
+os.environ['PLAYBACK_MODE'] = 'pcm'
+os.environ['PREFETCH_WARM_FFMPEG'] = '0'
+os.environ.setdefault('FFMPEG_MAX_PROCESSES', '0')
+
+import discord
+
+FRAME = bytes(discord.opus.Encoder.FRAME_SIZE)
+
+_ids = itertools.count(1)
+
+
+def next_id() -> int:
+    return next(_ids)
+
+
+class Latency:
+    """Distribuição de latência em segundos, lida de uma especificação curta
+
+    - `0.05` ou `const:0.05`: sempre o mesmo valor;
+    - `uniform:0.01,0.2`: uniforme entre os dois valores;
+    - `exp:0.1`: exponencial com essa média;
+    - `lognormal:0.3,0.6`: log-normal com essa mediana e esse sigma (cauda longa,
+      parecida com a de extrações reais).
+    """
+
+    KINDS = ('const', 'uniform', 'exp', 'lognormal')
+
+    def __init__(self, spec: str = '0'):
+        self.spec = spec
+        kind, _, values = spec.partition(':') if ':' in spec else ('const', '', spec)
+        if kind not in self.KINDS:
+            raise ValueError(f"Distribuição desconhecida: {kind} (use {', '.join(self.KINDS)})")
+        self.kind = kind
+        self.params = [float(value) for value in values.split(',')]
+
+    def sample(self) -> float:
+        if self.kind == 'const':
+            return self.params[0]
+        if self.kind == 'uniform':
+            return random.uniform(*self.params)
+        if self.kind == 'exp':
+            return random.expovariate(1 / self.params[0]) if self.params[0] else 0.0
+        median, sigma = self.params
+        return random.lognormvariate(math.log(median), sigma) if median else 0.0
+
+    async def wait(self):
+        seconds = self.sample()
+        if seconds > 0:
+            await asyncio.sleep(seconds)
+
+    def __repr__(self) -> str:
+        return f"Latency({self.spec!r})"
+
+
+NO_LATENCY = Latency('0')
+
+
+class FakeSource(discord.AudioSource):
+    """Fonte PCM silenciosa que lembra de qual URL veio"""
+
+    def __init__(self, audio_url: str, start: float = 0.0):
+        self.audio_url = audio_url
+        self.start = start
+        self.cleaned_up = False
+
+    def read(self) -> bytes:
+        return FRAME
+
+    def is_opus(self) -> bool:
+        return False
+
+    def cleanup(self):
+        self.cleaned_up = True
+
+
+def unwrap(source: discord.AudioSource) -> Optional[FakeSource]:
+    """Desce pelos wrappers (volume, TrackedSource) até a FakeSource"""
+    while source is not None and not isinstance(source, FakeSource):
+        source = getattr(source, 'original', None)
+    return source
+
+
+class FakeResolver:
+    """Resolvedor com a mesma interface do `Resolver`, com latência simulada"""
+
+    def __init__(self, latency: float = 0.05, jitter: float = 0.05, duration: int = 1):
+        self.latency = latency
+        self.jitter = jitter
+        self.duration = duration
+        self.pending = 0
+        self.running = 0
+        self.calls = Counter()
+
+    async def _wait(self, kind: str):
+        self.calls[kind] += 1
+        self.running += 1
+        try:
+            await asyncio.sleep(self.latency + random.random() * self.jitter)
+        finally:
+            self.running -= 1
+
+    async def resolve_metadata(self, query: str, message_id: Optional[int] = None) -> Dict:
+        await self._wait('metadata')
+        return {
+            'webpage_url': f'https://www.youtube.com/watch?v={query}',
+            'title': query,
+            'duration': self.duration,
+        }
+
+    async def resolve_stream(self, url: str) -> str:
+        await self._wait('stream')
+        return f'stream://{url}'
+
+    async def extract(self, query: str, profile: str = 'metadata', message_id: Optional[int] = None) -> Dict:
+        await self._wait(profile)
+        return {'entries': []}
+
+    def cancel_for_message(self, message_id: int) -> int:
+        return 0
+
+    def stats(self) -> Dict:
+        return {'pending': self.pending, 'running': self.running}
+
+    def shutdown(self):
+        pass
+
+
+def video_info(video_id: str) -> Dict[str, Any]:
+    """Resultado do yt-dlp para um vídeo, com URL de stream assinada válida por 6 horas"""
+    return {
+        'id': video_id,
+        'extractor_key': 'Youtube',
+        'webpage_url': f'https://www.youtube.com/watch?v={video_id}',
+        'title': f'Música {video_id}',
+        'duration': 120 + int(video_id[-3:]) % 240 if video_id[-3:].isdigit() else 180,
+        'thumbnail': f'https://i.ytimg.com/vi/{video_id}/hqdefault.jpg',
+        'url': f'https://rr1---sn-fake.googlevideo.com/videoplayback?id={video_id}&expire={int(time.time()) + 21600}',
+        'format_id': '251',
+        'ext': 'webm',
+        'acodec': 'opus',
+    }
+
+
+def video_id_for(text: str) -> str:
+    """ID de 11 caracteres estável para um termo de busca"""
+    return f"{zlib.crc32(text.encode()):011d}"
+
+
+class FakeYoutubeDL:
+    """Substituto do `yt_dlp.YoutubeDL` para o `YTDLPool`
+
+    `extract_info` bloqueia a thread pelo tempo sorteado em `latency`, como
+    uma extração real, e devolve resultados no formato do yt-dlp para URLs do
+    YouTube, buscas `ytsearchN:` e termos soltos.
+    """
+
+    def __init__(self, params: Dict[str, Any], latency: Latency = NO_LATENCY):
+        self.params = params
+        self.latency = latency
+        self.calls = 0
+
+    @classmethod
+    def factory(cls, latency: Latency) -> Callable[[Dict[str, Any]], 'FakeYoutubeDL']:
+        return lambda params: cls(params, latency)
+
+    def get_info_extractor(self, key: str):
+        return None
+
+    def extract_info(self, query: str, download: bool = False, process: bool = True) -> Dict[str, Any]:
+        self.calls += 1
+        time.sleep(self.latency.sample())
+        if query.startswith('ytsearch'):
+            count, _, term = query[len('ytsearch'):].partition(':')
+            return {
+                '_type': 'playlist',
+                'title': term,
+                'entries': [video_info(video_id_for(f'{term}#{i}')) for i in range(int(count or 1))],
+            }
+        if 'watch?v=' in query:
+            return video_info(query.split('watch?v=', 1)[1][:11])
+        # Termo solto: o perfil de metadados busca o primeiro resultado
+        return {'_type': 'playlist', 'title': query, 'entries': [video_info(video_id_for(query))]}
+
+    def close(self):
+        pass
+
+
+class FakeVoiceClient:
+    """Imita o `discord.VoiceClient`: uma fonte por vez e `after` chamado em outra thread
+
+    Cada música "toca" por `track_seconds`. `play` com algo tocando levanta
+    `ClientException` como o discord.py e conta em `double_starts`.
+    """
+
+    def __init__(self, channel: 'FakeVoiceChannel', track_seconds: float):
+        self.channel = channel
+        self.track_seconds = track_seconds
+        self.loop = asyncio.get_running_loop()
+        self.source: Optional[discord.AudioSource] = None
+        self._after = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._remaining = 0.0
+        self._started_at = 0.0
+        self._paused = False
+        self.connected = True
+        self.played: List[str] = []
+        self.double_starts = 0
+
+    def is_connected(self) -> bool:
+        return self.connected
+
+    def is_playing(self) -> bool:
+        return self.source is not None and not self._paused
+
+    def is_paused(self) -> bool:
+        return self.source is not None and self._paused
+
+    def play(self, source: discord.AudioSource, *, after=None):
+        if self.source is not None:
+            self.double_starts += 1
+            raise discord.ClientException('Already playing audio.')
+        self.source = source
+        self._after = after
+        self._paused = False
+        fake = unwrap(source)
+        self.played.append(fake.audio_url if fake else repr(source))
+        self._schedule(self.track_seconds)
+
+    def _schedule(self, seconds: float):
+        self._remaining = seconds
+        self._started_at = self.loop.time()
+        self._timer = self.loop.call_later(seconds, self._finish)
+
+    def _finish(self):
+        source, after = self.source, self._after
+        if self._timer:
+            self._timer.cancel()
+        self._timer = None
+        self.source = None
+        self._after = None
+        self._paused = False
+        if source is not None:
+            source.cleanup()
+            if after:
+                # O discord.py chama o `after` na thread do player
+                self.loop.run_in_executor(None, after, None)
+
+    def stop(self):
+        self._finish()
+
+    def pause(self):
+        if self.is_playing():
+            self._paused = True
+            self._timer.cancel()
+            self._remaining -= self.loop.time() - self._started_at
+
+    def resume(self):
+        if self.is_paused():
+            self._paused = False
+            self._schedule(max(self._remaining, 0.0))
+
+    async def move_to(self, channel: 'FakeVoiceChannel'):
+        self.channel = channel
+
+    async def disconnect(self, *, force: bool = False):
+        self.stop()
+        self.connected = False
+
+
+class FakeVoiceChannel:
+    def __init__(self, guild: 'FakeGuild', track_seconds: float):
+        self.id = next_id()
+        self.name = f'voz-{self.id}'
+        self.guild = guild
+        self.track_seconds = track_seconds
+        self.voice_clients: List[FakeVoiceClient] = []
+
+    async def connect(self, **kwargs) -> FakeVoiceClient:
+        client = FakeVoiceClient(self, self.track_seconds)
+        self.voice_clients.append(client)
+        return client
+
+
+class FakeMessage:
+    def __init__(self, channel: 'FakeTextChannel', embed: Optional[discord.Embed] = None):
+        self.id = next_id()
+        self.channel = channel
+        self.embed = embed
+        self.deleted = False
+
+    async def edit(self, *, embed: Optional[discord.Embed] = None, view=None, **kwargs):
+        await self.channel.rest_latency.wait()
+        if self.deleted:
+            raise discord.NotFound(FakeResponse(404), 'Unknown Message')
+        self.channel.edits += 1
+        self.channel.record(embed)
+        self.embed = embed
+
+    async def delete(self):
+        await self.channel.rest_latency.wait()
+        self.deleted = True
+
+
+class FakeResponse:
+    """Resposta HTTP mínima para construir exceções do discord.py"""
+
+    def __init__(self, status: int):
+        self.status = status
+        self.reason = 'fake'
+
+
+class FakeTextChannel:
+    """Canal de texto; cada envio/edição espera a latência REST sorteada"""
+
+    def __init__(self, guild: 'FakeGuild', rest_latency: Latency = NO_LATENCY):
+        self.id = next_id()
+        self.name = f'texto-{self.id}'
+        self.guild = guild
+        self.rest_latency = rest_latency
+        self.messages = 0
+        self.edits = 0
+        self.titles = Counter()
+
+    def record(self, embed: Optional[discord.Embed]):
+        if embed is not None and embed.title:
+            self.titles[embed.title] += 1
+
+    async def send(self, content: Optional[str] = None, *, embed: Optional[discord.Embed] = None, view=None,
+                   **kwargs) -> FakeMessage:
+        await self.rest_latency.wait()
+        self.messages += 1
+        self.record(embed)
+        return FakeMessage(self, embed)
+
+
+class FakeVoiceState:
+    def __init__(self, channel: FakeVoiceChannel):
+        self.channel = channel
+
+
+class FakeMember:
+    def __init__(self, guild: 'FakeGuild', voice_channel: FakeVoiceChannel):
+        self.id = next_id()
+        self.name = self.display_name = f'usuario-{self.id}'
+        self.mention = f'<@{self.id}>'
+        self.guild = guild
+        self.voice = FakeVoiceState(voice_channel)
+
+
+class FakeGuild:
+    def __init__(self, track_seconds: float, members: int = 5, rest_latency: Latency = NO_LATENCY):
+        self.id = next_id()
+        self.text_channel = FakeTextChannel(self, rest_latency)
+        self.voice_channel = FakeVoiceChannel(self, track_seconds)
+        self.members = [FakeMember(self, self.voice_channel) for _ in range(members)]
+
+
+class FakeContext:
+    """O suficiente de `commands.Context` para os comandos do cog"""
+
+    def __init__(self, guild: FakeGuild, author: Optional[FakeMember] = None):
+        self.guild = guild
+        self.author = author or random.choice(guild.members)
+        self.channel = guild.text_channel
+        self.message = FakeMessage(self.channel)
+        self.interaction = None
+
+    async def send(self, content: Optional[str] = None, **kwargs) -> FakeMessage:
+        return await self.channel.send(content, **kwargs)
+
+
+class FakeInteractionResponse:
+    def __init__(self, rest_latency: Latency = NO_LATENCY):
+        self.rest_latency = rest_latency
+        self.messages: List[str] = []
+
+    async def send_message(self, content: Optional[str] = None, **kwargs):
+        await self.rest_latency.wait()
+        self.messages.append(content)
+
+
+class FakeInteraction:
+    """Clique em um botão do painel"""
+
+    def __init__(self, bot: 'FakeBot', guild: FakeGuild):
+        self.client = bot
+        self.guild = guild
+        self.channel = guild.text_channel
+        self.user = random.choice(guild.members)
+        self.response = FakeInteractionResponse(guild.text_channel.rest_latency)
+
+
+class FakeBot:
+    """Bot mínimo: o loop, os cogs e a busca de usuários"""
+
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.cogs: Dict[str, object] = {}
+
+    @property
+    def voice_clients(self) -> List[FakeVoiceClient]:
+        return []
+
+    def get_user(self, user_id: int):
+        return None
+
+    def get_cog(self, name: str):
+        return self.cogs.get(name)
+
+
+def create_music_cog(bot: FakeBot, resolver):
+    """Cria o cog de música usando o resolvedor falso e fontes de áudio sem FFmpeg"""
+    from utils.resolver import Resolver
+    from utils import music_manager
+    from cogs.music import Music
+
+    Resolver._default = resolver
+    # Só a fonte é falsa: a admissão e o registro no supervisor do FFmpeg são os reais
+    music_manager.create_source = lambda audio_url, volume, start=0.0, **options: FakeSource(audio_url, start)
+    cog = Music(bot)
+    bot.cogs['Music'] = cog
+    return cog
@@ -0,0 +1,262 @@
+"""
+Teste de carga: o cog de música com centenas/milhares de servidores ativos, sem Discord nem rede
+
+Uso:
+    python -m benchmarks.load_test [--guilds N] [--rate R] [--duration S]
+                                   [--extract-latency DIST] [--rest-latency DIST]
+                                   [--mix play=50,skip=15,queue=25,search=10]
+
+Primeiro cada servidor recebe um !play (todos ficam tocando); depois chegam
+comandos em ritmo de Poisson (`--rate` por segundo, no total) durante
+`--duration` segundos. O `Resolver` real roda com o `FakeYoutubeDL`, então
+threads, limites de pendências e cache entram na medição; as chamadas REST
+(enviar/editar mensagens) esperam a latência de `--rest-latency`.
+
+As latências aceitam `0.05`, `uniform:a,b`, `exp:média` e `lognormal:mediana,sigma`
+(ver benchmarks/fakes.py).
+
+Relata percentis de latência por comando, o atraso do event loop e a memória
+por servidor ativo (RSS, ou heap do Python com `--tracemalloc`).
+"""
+import argparse
+import asyncio
+import random
+import resource
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from typing import Dict, List
+
+from benchmarks.fakes import (FakeBot, FakeContext, FakeGuild, FakeYoutubeDL, Latency, create_music_cog)
+
+from config import RESOLVER_WORKERS, RESOLVER_MAX_PENDING, EXTRACTOR_RATE
+from utils.cache import SongCache
+from utils.extractor_health import ExtractorHealth
+from utils.ffmpeg_supervisor import FFmpegSupervisor
+from utils.resolver import Resolver
+from utils.ytdl_pool import YTDLPool
+
+SEARCH_TERMS = ('lofi', 'rock nacional', 'samba', 'forró', 'jazz', 'trilha sonora', 'pagode', 'mpb', 'funk', 'indie')
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """Percentil `q` (0-100) de uma lista já ordenada"""
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(len(samples) * q / 100))]
+
+
+def rss_bytes() -> int:
+    """Memória residente do processo (Linux); cai para o pico do getrusage em outros sistemas"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def parse_mix(spec: str) -> Dict[str, int]:
+    mix = {}
+    for part in spec.split(','):
+        name, _, weight = part.partition('=')
+        if name not in ('play', 'skip', 'queue', 'search'):
+            raise SystemExit(f"Comando desconhecido no --mix: {name}")
+        mix[name] = int(weight)
+    return mix
+
+
+class LagSampler:
+    """Mede o atraso do event loop: quanto um sleep de `interval` demora a mais"""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(loop.time() - start - self.interval, 0.0))
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        self._task.cancel()
+
+
+class LoadTest:
+    def __init__(self, args):
+        self.args = args
+        self.bot = FakeBot()
+        rest_latency = Latency(args.rest_latency)
+        pool = YTDLPool(factory=FakeYoutubeDL.factory(Latency(args.extract_latency)), prewarm=False)
+        health = ExtractorHealth(rate=args.extractor_rate, burst=max(int(args.extractor_rate * 2), 1))
+        self.resolver = Resolver(workers=args.workers, max_pending=args.max_pending,
+                                 cache=SongCache(path=None), pool=pool, health=health)
+        FFmpegSupervisor._default = FFmpegSupervisor(max_processes=args.ffmpeg_max)
+        self.cog = create_music_cog(self.bot, self.resolver)
+        self.guilds = [FakeGuild(args.track_seconds, rest_latency=rest_latency) for _ in range(args.guilds)]
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, Counter] = defaultdict(Counter)
+        self.tasks = set()
+
+    def random_query(self) -> str:
+        """Músicas populares se repetem (cache); parte dos pedidos é por termo de busca"""
+        if random.random() < 0.3:
+            return f"{random.choice(SEARCH_TERMS)} {random.randint(1, 500)}"
+        index = min(int(random.paretovariate(1.2)), self.args.catalog)
+        return f"https://www.youtube.com/watch?v={index:011d}"
+
+    async def command(self, name: str, guild: FakeGuild):
+        cog = self.cog
+        ctx = FakeContext(guild)
+        start = time.perf_counter()
+        try:
+            if name == 'play':
+                await cog.play.callback(cog, ctx, query=self.random_query())
+            elif name == 'search':
+                await cog.search.callback(cog, ctx, query=random.choice(SEARCH_TERMS))
+            elif name == 'queue':
+                await cog.queue.callback(cog, ctx, 1)
+            else:
+                await cog.skip.callback(cog, ctx)
+        except Exception as e:
+            self.errors[name][type(e).__name__] += 1
+        self.latencies[name].append(time.perf_counter() - start)
+
+    def spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def warmup(self):
+        """Um !play por servidor, sem passar do limite de pendências do resolvedor"""
+        limit = asyncio.Semaphore(max(self.args.max_pending // 2, 1))
+
+        async def play(guild):
+            async with limit:
+                await self.command('play', guild)
+
+        await asyncio.gather(*(play(guild) for guild in self.guilds))
+        self.latencies.pop('play', None)
+        self.errors.pop('play', None)
+
+    async def traffic(self):
+        mix = parse_mix(self.args.mix)
+        names, weights = list(mix), list(mix.values())
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.args.duration
+        sent = 0
+        while loop.time() < deadline:
+            await asyncio.sleep(random.expovariate(self.args.rate))
+            name = random.choices(names, weights)[0]
+            self.spawn(self.command(name, random.choice(self.guilds)))
+            sent += 1
+        if self.tasks:
+            await asyncio.wait(self.tasks, timeout=self.args.drain_timeout)
+        return sent
+
+    async def run(self):
+        args = self.args
+        if args.tracemalloc:
+            tracemalloc.start()
+        memory_before = tracemalloc.get_traced_memory()[0] if args.tracemalloc else rss_bytes()
+
+        start = time.perf_counter()
+        await self.warmup()
+        warmup_time = time.perf_counter() - start
+        managers = self.cog.music_manager.guilds.values()
+        active = sum(1 for manager in managers if manager.is_active)
+        memory_after = tracemalloc.get_traced_memory()[0] if args.tracemalloc else rss_bytes()
+
+        sampler = LagSampler()
+        sampler.start()
+        sent = await self.traffic()
+        sampler.stop()
+
+        self.report(warmup_time, active, memory_after - memory_before, sent, sampler.samples)
+        for task in self.tasks:
+            task.cancel()
+        self.cog.scheduler.close()
+        await self.cog.music_manager.cleanup_all()
+        self.resolver.shutdown()
+
+    def report(self, warmup_time: float, active: int, memory: int, sent: int, lag: List[float]):
+        args = self.args
+        print(f"Aquecimento: {args.guilds} servidores em {warmup_time:.1f}s, {active} tocando")
+        memory_label = 'heap Python' if args.tracemalloc else 'RSS'
+        print(f"Memória por servidor ativo ({memory_label}): {memory / max(active, 1) / 1024:.1f} KiB")
+        print(f"Tráfego: {sent} comandos em {args.duration:.0f}s "
+              f"(extração {args.extract_latency}, REST {args.rest_latency})")
+        print()
+        print(f"{'comando':<8} {'n':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'máx':>9}  erros")
+        for name in sorted(self.latencies):
+            samples = sorted(self.latencies[name])
+            errors = ', '.join(f"{kind}={count}" for kind, count in self.errors[name].items()) or '-'
+            print(f"{name:<8} {len(samples):>6} " +
+                  " ".join(f"{percentile(samples, q) * 1000:>7.1f}ms" for q in (50, 95, 99, 100)) +
+                  f"  {errors}")
+        lag.sort()
+        print()
+        print(f"Atraso do event loop: p50={percentile(lag, 50) * 1000:.1f}ms p99={percentile(lag, 99) * 1000:.1f}ms "
+              f"máx={percentile(lag, 100) * 1000:.1f}ms ({len(lag)} amostras)")
+        replies = Counter()
+        for guild in self.guilds:
+            replies.update({title: count for title, count in guild.text_channel.titles.items() if 'Erro' in title})
+        if replies:
+            print(f"Respostas de erro: {', '.join(f'{title}={count}' for title, count in replies.most_common())}")
+        stats = self.resolver.stats()
+        print(f"Resolvedor: {stats['completed']} extrações, {stats['rejected']} recusadas (ocupado), "
+              f"{stats['timeouts']} timeouts, média {stats['avg_time'] * 1000:.0f}ms")
+        cache = stats['cache']
+        print(f"Cache: metadados {cache['metadata']['hits']} hits / {cache['metadata']['misses']} misses, "
+              f"streams {cache['streams']['hits']} hits / {cache['streams']['misses']} misses")
+        flights = stats['singleflight']
+        print(f"Single-flight: {flights['leaders']} extrações, {flights['shared']} economizadas, "
+              f"{flights['suppressed']} recusadas em espera após falha")
+        health = stats['health']
+        print(f"Extrator: disjuntor {health['state']}, {health['opened']} aberturas, {health['rejected']} recusadas, "
+              f"espera no limite de ritmo {health['waited']:.1f}s")
+        ffmpeg = self.cog.music_manager.ffmpeg.stats()
+        print(f"FFmpeg: {len(ffmpeg['processes'])} em execução, {ffmpeg['waiting']} na fila, "
+              f"{ffmpeg['rejected']} desistiram da fila")
+        search = self.cog.music_manager.search.stats()
+        print(f"Buscas: {search['hits']} hits / {search['misses']} misses")
+        scheduler = self.cog.scheduler.stats()
+        print(f"Painel: {scheduler['scheduled']} atualizações agendadas, {scheduler['sent']} enviadas")
+
+
+async def run(args):
+    # Os objetos falsos precisam do event loop já rodando
+    await LoadTest(args).run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--guilds', type=int, default=1000)
+    parser.add_argument('--rate', type=float, default=200, help='Comandos por segundo (todos os servidores)')
+    parser.add_argument('--duration', type=float, default=20, help='Segundos de tráfego depois do aquecimento')
+    parser.add_argument('--mix', default='play=50,skip=15,queue=25,search=10')
+    parser.add_argument('--extract-latency', default='lognormal:0.3,0.6')
+    parser.add_argument('--rest-latency', default='lognormal:0.08,0.4')
+    parser.add_argument('--track-seconds', type=float, default=60, help='Duração de cada música falsa')
+    parser.add_argument('--catalog', type=int, default=5000, help='Quantidade de músicas distintas')
+    parser.add_argument('--workers', type=int, default=RESOLVER_WORKERS)
+    parser.add_argument('--max-pending', type=int, default=RESOLVER_MAX_PENDING)
+    parser.add_argument('--ffmpeg-max', type=int, default=0, help='Limite de FFmpeg simultâneos (0 = sem limite)')
+    parser.add_argument('--extractor-rate', type=float, default=1000,
+                        help=f'Limite de extrações por segundo (no bot: EXTRACTOR_RATE={EXTRACTOR_RATE})')
+    parser.add_argument('--drain-timeout', type=float, default=60)
+    parser.add_argument('--tracemalloc', action='store_true', help='Mede o heap do Python (mais lento)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
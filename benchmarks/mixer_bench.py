@@ -0,0 +1,90 @@
+"""
+Benchmark: frames por segundo do PCMVolumeTransformer vs. MixerSource (NumPy)
+
+Uso:
+    python -m benchmarks.mixer_bench [--frames N]
+
+Precisa do NumPy. Não usa FFmpeg nem rede: os frames vêm da memória, então
+o resultado mede só o custo do processamento em Python.
+"""
+import argparse
+import sys
+import time
+
+import discord
+
+from utils import mixer
+
+FRAME_BYTES = discord.opus.Encoder.FRAME_SIZE
+
+
+class MemorySource(discord.AudioSource):
+    """Repete um frame de PCM `frames` vezes"""
+
+    def __init__(self, frame: bytes, frames: int):
+        self.frame = frame
+        self.left = frames
+
+    def read(self) -> bytes:
+        if self.left <= 0:
+            return b''
+        self.left -= 1
+        return self.frame
+
+
+def test_frame() -> bytes:
+    np = mixer.np
+    t = np.arange(FRAME_BYTES // 4) / 48000
+    samples = (0.3 * 32767 * np.sin(2 * np.pi * 440 * t)).astype(np.int16)
+    return np.repeat(samples, 2).tobytes()
+
+
+def measure(label: str, source: discord.AudioSource, frames: int, before_read=None):
+    start = time.perf_counter()
+    count = 0
+    while True:
+        if before_read:
+            before_read(count)
+        if not source.read():
+            break
+        count += 1
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {count / elapsed:>10.0f} frames/s  {elapsed / count * 1e6:7.1f}µs/frame  "
+          f"({count * 0.02 / elapsed:,.0f}x tempo real)")
+    return count / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type=int, default=50000)
+    args = parser.parse_args()
+
+    if not mixer.available():
+        print('Instale o NumPy para rodar este benchmark')
+        sys.exit(1)
+
+    frame = test_frame()
+    frames = args.frames
+
+    baseline = measure('PCMVolumeTransformer', discord.PCMVolumeTransformer(MemorySource(frame, frames), 0.5), frames)
+    measure('MixerSource (ganho)', mixer.MixerSource(MemorySource(frame, frames), 0.5, normalize=False), frames)
+    measure('MixerSource (normalização)', mixer.MixerSource(MemorySource(frame, frames), 0.5, normalize=True), frames)
+
+    # Troca o volume a cada 50 frames para manter a rampa sempre ativa
+    ramped = mixer.MixerSource(MemorySource(frame, frames), 0.5, normalize=True)
+
+    def change_volume(count):
+        if count % 50 == 0:
+            ramped.volume = 0.3 if ramped.volume > 0.4 else 0.6
+
+    measure('MixerSource (rampa)', ramped, frames, change_volume)
+
+    # Crossfade durante todo o teste
+    crossfading = mixer.MixerSource(MemorySource(frame, frames), 0.5, normalize=True, crossfade=frames * 0.02)
+    crossfading.start_crossfade(MemorySource(frame, frames))
+    mixed = measure('MixerSource (crossfade)', crossfading, frames)
+    print(f"Crossfade com normalização custa {baseline / mixed:.2f}x o tempo do transformer por frame")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark: CPU por stream no modo PCM (volume em Python) vs. modo Opus (volume no FFmpeg)
+
+Uso:
+    python -m benchmarks.opus_cpu_bench [ARQUIVO] [--seconds N]
+
+Sem ARQUIVO, gera um áudio de teste em Opus com o FFmpeg (precisa do FFmpeg
+com libopus e da biblioteca Opus carregável pelo discord.py). A CPU medida
+inclui o processo do FFmpeg e o trabalho feito em Python (volume e codificação).
+"""
+import argparse
+import os
+import resource
+import subprocess
+import tempfile
+import time
+
+import discord
+from discord.opus import Encoder
+
+from config import LOCAL_FFMPEG_OPTIONS
+from utils.audio import create_source
+
+
+def generate_input(path: str, seconds: int):
+    """Gera um tom de teste já codificado em Opus"""
+    subprocess.run(
+        ['ffmpeg', '-loglevel', 'error', '-y', '-f', 'lavfi', '-i', f'sine=frequency=440:duration={seconds}',
+         '-ac', '2', '-ar', '48000', '-c:a', 'libopus', path],
+        check=True
+    )
+
+
+def children_cpu() -> float:
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def run(path: str, mode: str, volume: float):
+    """Lê o stream inteiro como o player do discord.py faria, sem enviar pela rede"""
+    encoder = Encoder() if mode == 'pcm' else None
+    cpu_start = time.process_time()
+    children_start = children_cpu()
+    source = create_source(path, volume, mode=mode, ffmpeg_options=LOCAL_FFMPEG_OPTIONS)
+    if mode == 'pcm':
+        source = discord.PCMVolumeTransformer(source, volume=volume)
+    frames = 0
+    while True:
+        data = source.read()
+        if not data:
+            break
+        if encoder:
+            encoder.encode(data, encoder.SAMPLES_PER_FRAME)
+        frames += 1
+    source.cleanup()
+    python_cpu = time.process_time() - cpu_start
+    ffmpeg_cpu = children_cpu() - children_start
+    audio_seconds = frames * 0.02
+    total = python_cpu + ffmpeg_cpu
+    print(f"{mode:<5} volume={int(volume * 100):>3}%  python={python_cpu:6.2f}s ffmpeg={ffmpeg_cpu:6.2f}s "
+          f"total={total:6.2f}s  CPU por stream={total / audio_seconds * 100:5.2f}% de um núcleo")
+    return total / audio_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('file', nargs='?')
+    parser.add_argument('--seconds', type=int, default=120)
+    args = parser.parse_args()
+
+    if not discord.opus.is_loaded():
+        discord.opus._load_default()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.file
+        if not path:
+            path = os.path.join(tmp, 'tone.opus')
+            generate_input(path, args.seconds)
+
+        pcm = run(path, 'pcm', 0.5)
+        opus_filter = run(path, 'opus', 0.5)
+        opus_copy = run(path, 'opus', 1.0)
+        print(f"Opus com filtro usa {opus_filter / pcm * 100:.0f}% da CPU do modo PCM; "
+              f"cópia direta usa {opus_copy / pcm * 100:.0f}%")
+
+
+if __name__ == '__main__':
+    main()
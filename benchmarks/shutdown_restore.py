@@ -0,0 +1,109 @@
+"""
+Teste de encerramento: as filas salvas sobrevivem ao desligamento do bot
+
+Uso:
+    python -m benchmarks.shutdown_restore [--guilds N] [--songs N]
+
+Enche as filas de vários servidores falsos, encerra como o `bot.close()`
+(`cleanup_all(preserve_state=True)`) com o listener de voz do cog de eventos
+recebendo cada desconexão, como no Discord, e cria um novo gerenciador
+sobre o mesmo backend de estado. Confere que:
+
+- o encerramento termina sem exceções;
+- cada servidor volta com a música atual e a fila na mesma ordem.
+
+Termina com código 1 se alguma verificação falhar.
+"""
+import argparse
+import asyncio
+import sys
+
+from benchmarks.fakes import FakeBot, FakeContext, FakeGuild, FakeResolver, FakeVoiceClient, FakeVoiceState, create_music_cog
+
+from cogs.events import Events
+from utils.music_manager import MusicManager
+
+
+def dispatch_voice_events(bot: FakeBot, events: Events):
+    """Faz cada desconexão disparar o `on_voice_state_update` do bot, como o gateway do Discord
+
+    O evento roda em uma task própria, então pode chegar no meio do encerramento.
+    """
+    disconnect = FakeVoiceClient.disconnect
+
+    async def disconnect_and_notify(client: FakeVoiceClient, *, force: bool = False):
+        await disconnect(client, force=force)
+        event = events.on_voice_state_update(bot.user, FakeVoiceState(client.channel), FakeVoiceState(None))
+        pending.append(asyncio.create_task(event))
+        await asyncio.sleep(0)
+
+    pending = []
+
+    FakeVoiceClient.disconnect = disconnect_and_notify
+    return pending
+
+
+async def run(args) -> bool:
+    bot = FakeBot()
+    bot.user = object()
+    resolver = FakeResolver(latency=0.0, jitter=0.0)
+    cog = create_music_cog(bot, resolver)
+    events = Events(bot)
+    bot.cogs['Events'] = events
+    pending = dispatch_voice_events(bot, events)
+
+    guilds = [FakeGuild(track_seconds=60) for _ in range(args.guilds)]
+    expected = {}
+    for guild in guilds:
+        ctx = FakeContext(guild)
+        for i in range(args.songs):
+            await cog.play.callback(cog, ctx, query=f'musica-{guild.id}-{i}')
+        manager = await cog.music_manager.get_guild_manager(guild.id)
+        expected[guild.id] = [manager.current_song.url] + [song.url for song in manager.queue]
+
+    store = cog.music_manager.store
+    error = None
+    try:
+        cog.scheduler.close()
+        await cog.music_manager.cleanup_all(preserve_state=True)
+        # Os eventos de voz que ainda não rodaram
+        for result in await asyncio.gather(*pending, return_exceptions=True):
+            if isinstance(result, Exception):
+                raise result
+    except Exception as e:
+        error = e
+
+    # Reinício: um gerenciador novo lendo o mesmo backend
+    restarted = MusicManager(resolver=resolver, store=store)
+    restored = 0
+    for guild in guilds:
+        manager = await restarted.get_guild_manager(guild.id)
+        if [song.url for song in manager.queue] == expected[guild.id]:
+            restored += 1
+
+    print(f"{args.guilds} servidores com {args.songs} músicas cada")
+    checks = {
+        'exceções no encerramento': 0 if error is None else 1,
+        'filas perdidas': args.guilds - restored,
+    }
+    if error is not None:
+        print(f"Exceção: {type(error).__name__}: {error}")
+    ok = True
+    for label, count in checks.items():
+        status = 'ok' if not count else 'FALHOU'
+        ok = ok and not count
+        print(f"{label:<28} {count:>6}  {status}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--guilds', type=int, default=20)
+    parser.add_argument('--songs', type=int, default=5)
+    args = parser.parse_args()
+    ok = asyncio.run(run(args))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
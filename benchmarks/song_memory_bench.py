@@ -0,0 +1,88 @@
+"""
+Benchmark: memória por música na fila (dataclass antiga vs. Song com __slots__)
+
+Uso:
+    python -m benchmarks.song_memory_bench [--sizes 100 1000 10000]
+"""
+import argparse
+import gc
+import tracemalloc
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from utils.music_manager import Song
+from utils.song_queue import SongQueue
+
+
+@dataclass
+class LegacySong:
+    """Representação anterior: dataclass com __dict__ e o membro inteiro"""
+    url: str
+    title: str
+    duration: Optional[int] = None
+    thumbnail: Optional[str] = None
+    requester: Optional[Any] = None
+
+
+class FakeMember:
+    """Substituto leve de discord.Member (só o necessário para o benchmark)"""
+
+    def __init__(self, member_id: int):
+        self.id = member_id
+        self.name = f"membro{member_id}"
+        self.roles = [object() for _ in range(5)]
+
+
+def make_fields(i: int):
+    video_id = f"{i:011d}"
+    return (
+        f"https://www.youtube.com/watch?v={video_id}",
+        f"Música de teste número {i}",
+        180 + i % 120,
+        f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg",
+    )
+
+
+def measure(factory, size: int, members) -> float:
+    """Bytes que continuam alocados por música depois de montar uma fila de `size` itens
+
+    As strings são criadas dentro da medição e descartadas em seguida, como
+    acontece com o resultado do yt-dlp: só fica o que a música referencia.
+    """
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    queue = [factory(*make_fields(i), members[i % len(members)]) for i in range(size)]
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del queue
+    return (after - before) / size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000, 50000])
+    parser.add_argument('--members', type=int, default=20, help='membros distintos pedindo músicas')
+    args = parser.parse_args()
+
+    members = [FakeMember(1000 + i) for i in range(args.members)]
+    print(f"{'músicas':>8} {'dataclass':>12} {'slots':>12} {'economia':>9}")
+    for size in args.sizes:
+        legacy = measure(LegacySong, size, members)
+        slotted = measure(Song, size, members)
+        print(f"{size:>8} {legacy:>10.1f} B {slotted:>10.1f} B {1 - slotted / legacy:>8.0%}")
+
+    # Custo da fila indexada em si, com músicas já criadas
+    songs = [Song(*make_fields(i), members[i % len(members)]) for i in range(args.sizes[-1])]
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    queue = SongQueue(songs)
+    overhead = (tracemalloc.get_traced_memory()[0] - before) / len(songs)
+    tracemalloc.stop()
+    print(f"SongQueue: {overhead:.1f} B por música de estrutura ({len(queue)} músicas)")
+
+
+if __name__ == '__main__':
+    main()
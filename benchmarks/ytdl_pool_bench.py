@@ -0,0 +1,70 @@
+"""
+Benchmark: extração com YoutubeDL recriado a cada chamada vs. instâncias do pool
+
+Uso:
+    python -m benchmarks.ytdl_pool_bench [URL ...] [--runs N]
+
+Precisa de acesso à internet (faz extrações reais no YouTube).
+"""
+import argparse
+import statistics
+import time
+
+import yt_dlp
+
+from config import YTDL_PROFILES
+from utils.ytdl_pool import YTDLPool
+
+DEFAULT_URLS = [
+    'https://www.youtube.com/watch?v=dQw4w9WgXcQ',
+    'https://www.youtube.com/watch?v=9bZkp7q19f0',
+]
+
+
+def cold_extract(url: str):
+    """Como o código fazia antes: uma instância nova por extração"""
+    with yt_dlp.YoutubeDL(YTDL_PROFILES['stream']) as ydl:
+        return ydl.extract_info(url, download=False)
+
+
+def pooled_extract(pool: YTDLPool, url: str):
+    with pool.checkout('stream') as ydl:
+        return ydl.extract_info(url, download=False)
+
+
+def measure(label: str, func, urls, runs: int):
+    samples = []
+    for _ in range(runs):
+        for url in urls:
+            start = time.perf_counter()
+            func(url)
+            samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(f"{label:<8} n={len(samples):<4} média={statistics.mean(samples):8.1f}ms "
+          f"mediana={statistics.median(samples):8.1f}ms p95={p95:8.1f}ms")
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('urls', nargs='*', default=DEFAULT_URLS)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    pool = YTDLPool(size=1)
+    print(f"Pool aquecido em {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    # Uma extração de cada para descartar efeitos de DNS/TLS da primeira conexão
+    cold_extract(args.urls[0])
+    pooled_extract(pool, args.urls[0])
+
+    cold = measure('frio', cold_extract, args.urls, args.runs)
+    pooled = measure('pool', lambda url: pooled_extract(pool, url), args.urls, args.runs)
+    print(f"Ganho na mediana: {statistics.median(cold) - statistics.median(pooled):.1f}ms por extração")
+    pool.close()
+
+
+if __name__ == '__main__':
+    main()
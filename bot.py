@@ -40,6 +40,10 @@ FFMPEG_OPTIONS = {
     'options': '-vn', # -vn significa "no video", apenas áudio
 }
 
+# Instâncias do yt-dlp reutilizadas entre os comandos (criar uma por chamada é caro)
+ytdl = yt_dlp.YoutubeDL(YTDL_OPTIONS)
+ytdl_info = yt_dlp.YoutubeDL({'quiet': True, 'no_warnings': True})
+
 # Dicionário para armazenar as filas de música por servidor (guild)
 music_queues = {}
 
@@ -68,10 +72,9 @@ async def play_next_song(ctx):
 
         try:
             # Extrai a URL direta do áudio usando yt_dlp
-            with yt_dlp.YoutubeDL(YTDL_OPTIONS) as ydl: # <-- CORREÇÃO AQUI
-                info = ydl.extract_info(song_url, download=False)
-                url = info['url'] # URL direta do stream de áudio
-                title = info.get('title', 'Música Desconhecida')
+            info = ytdl.extract_info(song_url, download=False)
+            url = info['url'] # URL direta do stream de áudio
+            title = info.get('title', 'Música Desconhecida')
 
             # Reproduz o áudio
             voice_client.play(discord.FFmpegPCMAudio(url, **FFMPEG_OPTIONS),
@@ -210,20 +213,19 @@ async def play(ctx, *, search_query: str):
     await ctx.send(f'Procurando por: **{search_query}**...')
 
     try:
-        with yt_dlp.YoutubeDL(YTDL_OPTIONS) as ydl: # <-- CORREÇÃO AQUI
-            info = ydl.extract_info(search_query, download=False)
-            # Se for uma playlist, pega a primeira música
-            if 'entries' in info:
-                # Filtrar para garantir que seja uma entrada de vídeo válida, não um erro
-                entries = [entry for entry in info['entries'] if entry is not None]
-                if not entries:
-                    await ctx.send("Não encontrei vídeos válidos na playlist ou busca.")
-                    return
-                song_url = entries[0]['webpage_url']
-                title = entries[0].get('title', 'Música da Playlist')
-            else:
-                song_url = info['webpage_url']
-                title = info.get('title', 'Música Desconhecida')
+        info = ytdl.extract_info(search_query, download=False)
+        # Se for uma playlist, pega a primeira música
+        if 'entries' in info:
+            # Filtrar para garantir que seja uma entrada de vídeo válida, não um erro
+            entries = [entry for entry in info['entries'] if entry is not None]
+            if not entries:
+                await ctx.send("Não encontrei vídeos válidos na playlist ou busca.")
+                return
+            song_url = entries[0]['webpage_url']
+            title = entries[0].get('title', 'Música da Playlist')
+        else:
+            song_url = info['webpage_url']
+            title = info.get('title', 'Música Desconhecida')
 
         # Verifica se já está tocando
         if ctx.voice_client.is_playing() or ctx.voice_client.is_paused():
@@ -281,9 +283,8 @@ async def show_queue(ctx):
         for i, song_url in enumerate(music_queues[guild_id]['queue']):
             try:
                 # Tenta extrair o título novamente para exibição
-                with yt_dlp.YoutubeDL({'quiet': True, 'no_warnings': True}) as ydl:
-                    info = ydl.extract_info(song_url, download=False)
-                    title = info.get('title', song_url)
+                info = ytdl_info.extract_info(song_url, download=False)
+                title = info.get('title', song_url)
                 queue_titles.append(f"{i+1}. {title}")
             except Exception:
                 queue_titles.append(f"{i+1}. {song_url} (Erro ao obter título)")
@@ -302,9 +303,8 @@ async def now_playing(ctx):
     if guild_id in music_queues and music_queues[guild_id]['current_song']:
         song_url = music_queues[guild_id]['current_song']
         try:
-            with yt_dlp.YoutubeDL({'quiet': True, 'no_warnings': True}) as ydl:
-                info = ydl.extract_info(song_url, download=False)
-                title = info.get('title', song_url)
+            info = ytdl_info.extract_info(song_url, download=False)
+            title = info.get('title', song_url)
             await ctx.send(f"Tocando agora: **{title}**")
         except Exception:
             await ctx.send(f"Tocando agora: **{song_url}** (Título não disponível)")
@@ -2,8 +2,10 @@
 Cog de eventos do bot
 """
 import discord
+from datetime import datetime
 from discord.ext import commands
 from utils.embeds import MusicEmbeds
+from utils import metrics
 
 class Events(commands.Cog):
     """Eventos do bot"""
@@ -31,6 +33,8 @@ class Events(commands.Cog):
     @commands.Cog.listener()
     async def on_command_error(self, ctx, error):
         """Tratamento global de erros"""
+        metrics.ERRORS.labels(type(error).__name__).inc()
+        
         if isinstance(error, commands.CommandNotFound):
             embed = MusicEmbeds.error_embed(
                 "Comando Não Encontrado",
@@ -127,5 +131,54 @@ class Events(commands.Cog):
         if music_cog and hasattr(music_cog, 'music_manager'):
             await music_cog.music_manager.cleanup_guild(guild.id)
 
+    @commands.command(name='lag', hidden=True, help='Mostra a saúde do event loop')
+    @commands.is_owner()
+    async def loop_health(self, ctx, events: int = 5):
+        """Comando para ver o atraso do event loop, travadas e comandos lentos"""
+        monitor = getattr(self.bot, 'loop_monitor', None)
+        if monitor is None:
+            embed = MusicEmbeds.error_embed("Monitor Desligado", "Ative com `LOOP_MONITOR=1` no .env")
+            await ctx.send(embed=embed)
+            return
+            
+        stats = monitor.stats()
+        embed = discord.Embed(
+            title="🩺 Event Loop",
+            description=(
+                f"**Atraso**: {stats['lag'] * 1000:.1f}ms (p50 {stats['p50'] * 1000:.1f}ms, "
+                f"p99 {stats['p99'] * 1000:.1f}ms, máx {stats['max'] * 1000:.1f}ms)\n"
+                f"**Travadas**: {stats['stalls']}\n"
+                f"**Comandos lentos**: {stats['slow_commands']}\n"
+                f"**Comandos em andamento**: {stats['active_commands']}"
+            ),
+            color=discord.Color.blue()
+        )
+        for event in list(monitor.events)[-events:]:
+            when = datetime.fromtimestamp(event['time']).strftime('%H:%M:%S')
+            value = event['message']
+            if event.get('top'):
+                value += "\n" + "\n".join(f"`{frame}`" for frame in event['top'])
+            elif event.get('stack'):
+                # Só as últimas linhas da pilha (é onde está o código que bloqueou), cortadas antes
+                # de fechar o bloco para o campo não passar de 1024 caracteres
+                room = min(700, 1024 - len(value) - len("\n``````"))
+                if room > 0:
+                    value += f"\n```{event['stack'][-room:]}```"
+            embed.add_field(name=f"{when} · {event['kind']}", value=value[:1024], inline=False)
+        await ctx.send(embed=embed)
+
+    @commands.command(name='sync', hidden=True, help='Registra os comandos de barra no Discord')
+    @commands.is_owner()
+    async def sync_commands(self, ctx, scope: str = 'global'):
+        """Comando para sincronizar os comandos de barra (`!sync guild` vale na hora, só neste servidor)"""
+        if scope == 'guild':
+            self.bot.tree.copy_global_to(guild=ctx.guild)
+            synced = await self.bot.tree.sync(guild=ctx.guild)
+        else:
+            synced = await self.bot.tree.sync()
+        names = ', '.join(f"/{command.name}" for command in synced) or 'nenhum'
+        embed = MusicEmbeds.success_embed("Comandos Sincronizados", f"{len(synced)} comandos de barra: {names}")
+        await ctx.send(embed=embed)
+
 async def setup(bot):
     await bot.add_cog(Events(bot))
\ No newline at end of file
@@ -2,14 +2,23 @@
 Cog de comandos de música
 """
 import discord
+from discord import app_commands
 from discord.ext import commands
 import asyncio
-import yt_dlp
+import time
 from typing import Optional, List
 from utils.music_manager import MusicManager, Song
+from utils.resolver import ResolverBusy, ResolverCancelled
+from utils.extractor_health import ExtractorUnavailable, is_upstream_failure
+from utils.ffmpeg_supervisor import FFmpegBusy
+from utils.filters import FilterError
 from utils.embeds import MusicEmbeds
 from utils.views import MusicControlView, SearchResultView, VolumeModal
-from config import YTDL_OPTIONS, FFMPEG_OPTIONS, AUTO_DISCONNECT_TIMEOUT, SEARCH_RESULTS_LIMIT
+from utils.audio import TrackedSource, wrap_source
+from utils.message_scheduler import MessageScheduler
+from utils import metrics
+from config import (AUTO_DISCONNECT_TIMEOUT, PROGRESS_UPDATE_INTERVAL, AUTOCOMPLETE_LIMIT, PLAYBACK_RETRY_BUDGET,
+                    PLAYBACK_RETRY_DELAY, PLAYBACK_RETRY_MAX_DELAY)
 
 class Music(commands.Cog):
     """Comandos relacionados à música"""
@@ -17,10 +26,43 @@ class Music(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.music_manager = MusicManager()
+        self.scheduler = MessageScheduler()
+        Song.user_lookup = bot.get_user
+        self.register_metrics()
+    
+    def register_metrics(self):
+        """Liga as métricas calculadas na coleta ao estado do cog"""
+        guilds = self.music_manager.guilds
+        resolver = self.music_manager.resolver
+        metrics.ACTIVE_VOICE_CLIENTS.set_function(lambda: len(self.bot.voice_clients))
+        metrics.QUEUED_SONGS.set_function(lambda: sum(len(manager.queue) for manager in guilds.values()))
+        metrics.MAX_QUEUE_LENGTH.set_function(lambda: max((len(manager.queue) for manager in guilds.values()), default=0))
+        metrics.RESOLVER_PENDING.set_function(lambda: resolver.pending)
+        metrics.RESOLVER_RUNNING.set_function(lambda: resolver.running)
+        audio_cache = self.music_manager.audio_cache
+        if audio_cache:
+            metrics.AUDIO_CACHE_BYTES.set_function(lambda: audio_cache.size)
+    
+    async def cog_before_invoke(self, ctx):
+        ctx.metrics_started_at = time.perf_counter()
+    
+    async def cog_after_invoke(self, ctx):
+        started_at = getattr(ctx, 'metrics_started_at', None)
+        if started_at is not None:
+            metrics.COMMAND_LATENCY.labels(ctx.command.name).observe(time.perf_counter() - started_at)
         
     async def cog_unload(self):
         """Limpa recursos quando o cog é descarregado"""
-        await self.music_manager.cleanup_all()
+        # As filas continuam salvas para serem restauradas quando o cog voltar
+        self.scheduler.close()
+        await self.music_manager.cleanup_all(preserve_state=True)
+        self.music_manager.close()
+        self.music_manager.resolver.shutdown()
+    
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload):
+        """Cancela extrações pendentes quando a mensagem do comando é apagada"""
+        self.music_manager.resolver.cancel_for_message(payload.message_id)
     
     async def ensure_voice_connection(self, ctx) -> bool:
         """Garante que o bot está conectado ao canal de voz do usuário"""
@@ -29,7 +71,7 @@ class Music(commands.Cog):
             await ctx.send(embed=embed)
             return False
             
-        manager = self.music_manager.get_guild_manager(ctx.guild.id)
+        manager = await self.music_manager.get_guild_manager(ctx.guild.id)
         
         if not manager.voice_client:
             try:
@@ -50,57 +92,240 @@ class Music(commands.Cog):
                 
         return True
     
-    async def play_next_song(self, ctx, manager):
-        """Toca a próxima música da fila"""
-        if manager._disconnect_task:
-            manager._disconnect_task.cancel()
-            manager._disconnect_task = None
-            
-        next_song = manager.get_next_song()
-        if not next_song:
-            # Agenda desconexão automática
-            manager._disconnect_task = asyncio.create_task(self.auto_disconnect(ctx, manager))
-            return
-            
-        manager.current_song = next_song
+    async def play_next_song(self, ctx, manager, after_track: Optional[int] = None, if_idle: bool = False):
+        """Toca a próxima música da fila
+
+        A escolha da música e o início da reprodução acontecem sob
+        `manager.lock`; a resolução da URL e o FFmpeg ficam fora dele, para uma
+        extração lenta não travar os outros comandos do servidor.
+        `after_track` é a música que terminou: se a fila já avançou por outro
+        caminho (pulo, parada), a chamada é ignorada. Com `if_idle`, só começa
+        se nada estiver tocando ou sendo iniciado.
+        """
+        async with manager.lock:
+            if after_track is not None and after_track != manager.track_id:
+                return
+            if if_idle and manager.is_active:
+                return
+            if manager._disconnect_task:
+                manager._disconnect_task.cancel()
+                manager._disconnect_task = None
+                
+            manager.cancel_progress_updates()
+            requested_at = time.perf_counter()
+            track_id = manager.next_track()
+            next_song = manager.get_next_song()
+            if not next_song:
+                manager.starting = False
+                manager.last_track_ended_at = None
+                # Agenda desconexão automática
+                self.schedule_disconnect(ctx.channel, manager)
+                return
+                
+            manager.starting = True
+            manager.current_song = next_song
+            # Com crossfade, a próxima música já está tocando misturada com a anterior
+            crossfaded = manager.take_crossfade(next_song)
         
         try:
-            with yt_dlp.YoutubeDL(YTDL_OPTIONS) as ydl:
-                info = ydl.extract_info(next_song.url, download=False)
-                audio_url = info['url']
+            if crossfaded:
+                tracked, audio_url = crossfaded
+            else:
+                prefetched = await manager.take_prefetched(next_song)
+                if prefetched:
+                    audio_url, warm_source = prefetched
+                else:
+                    audio_url = await manager.resolve_audio(next_song)
+                    warm_source = None
+                    
+                if warm_source is None:
+                    # Espera na fila se o limite de FFmpeg simultâneos foi atingido
+                    await manager.ffmpeg.admit()
+                    with metrics.FFMPEG_SPAWN_TIME.time():
+                        warm_source = manager.create_source(audio_url, admitted=True)
                 
-            # Cria source de áudio com volume
-            source = discord.PCMVolumeTransformer(
-                discord.FFmpegPCMAudio(audio_url, **FFMPEG_OPTIONS),
-                volume=manager.volume
-            )
-            
-            def after_playing(error):
-                if error:
-                    print(f'Erro na reprodução: {error}')
-                asyncio.run_coroutine_threadsafe(self.play_next_song(ctx, manager), self.bot.loop)
-            
-            manager.voice_client.play(source, after=after_playing)
+                ended_at = manager.last_track_ended_at
+                
+                def on_first_frame(now):
+                    metrics.TIME_TO_FIRST_AUDIO.observe(now - requested_at)
+                    if ended_at is not None:
+                        metrics.INTER_TRACK_GAP.observe(now - ended_at)
+                
+                tracked = TrackedSource(warm_source, on_first_frame, speed=manager.filters.speed)
             
-            # Envia embed com controles
-            embed = MusicEmbeds.now_playing(next_song)
-            view = MusicControlView(self.music_manager, ctx.guild.id)
-            await ctx.send(embed=embed, view=view)
+            async with manager.lock:
+                if manager.track_id != track_id:
+                    # Parado (ou desconectado) enquanto a música era resolvida
+                    tracked.cleanup()
+                    return
+                    
+                if manager.audio_cache:
+                    manager.audio_cache.record_play(next_song.url, next_song.duration)
+                
+                def on_crossfade():
+                    # Chamado na thread de áudio quando a música está perto do fim
+                    asyncio.run_coroutine_threadsafe(manager.prepare_crossfade(source), self.bot.loop)
+                
+                # Cria source de áudio (o volume é aplicado pelo FFmpeg ou, em PCM, em Python)
+                source = wrap_source(tracked, manager.volume, next_song.duration, on_crossfade)
+                manager.now_playing = tracked
+                manager.audio_url = audio_url
+                
+                def after_playing(error):
+                    manager.last_track_ended_at = time.perf_counter()
+                    if error:
+                        print(f'Erro na reprodução: {error}')
+                        metrics.ERRORS.labels(type(error).__name__).inc()
+                    asyncio.run_coroutine_threadsafe(self.play_next_song(ctx, manager, after_track=track_id),
+                                                     self.bot.loop)
+                
+                manager.voice_client.play(source, after=after_playing)
+                manager.starting = False
+                manager.playback_failures = 0
+                manager.start_prefetch()
+                
+                # Atualiza o painel de controle do servidor (pulos seguidos viram uma única edição)
+                self.refresh_status(ctx.channel, manager)
+                manager.start_progress_updates(self.progress_updates(manager, next_song))
             
         except Exception as e:
-            embed = MusicEmbeds.error_embed("Erro de Reprodução", f"Não consegui reproduzir a música: {e}")
+            metrics.ERRORS.labels(type(e).__name__).inc()
+            await self.playback_failed(ctx, manager, track_id, next_song, e)
+    
+    async def playback_failed(self, ctx, manager, track_id: int, song: Song, error: Exception):
+        """Agenda a próxima tentativa depois que uma música não conseguiu começar
+
+        Bloqueios do YouTube, a fila do resolvedor cheia e a falta de FFmpeg
+        livre não são culpa da música: ela volta para o início da fila e a
+        tentativa espera o disjuntor do extrator (ou uma vaga). Outros erros
+        descartam a música e seguem para a próxima. A espera dobra a cada
+        falha seguida e, depois de `PLAYBACK_RETRY_BUDGET` falhas, a
+        reprodução para (a fila fica) até alguém pedir de novo.
+        """
+        async with manager.lock:
+            if manager.track_id != track_id:
+                return  # Pulada ou parada enquanto era resolvida
+            manager.playback_failures += 1
+            failures = manager.playback_failures
+            busy = isinstance(error, (FFmpegBusy, ResolverBusy))
+            upstream = busy or isinstance(error, ExtractorUnavailable) or is_upstream_failure(error)
+            if upstream:
+                manager.requeue(song)
+                
+            exhausted = failures > PLAYBACK_RETRY_BUDGET
+            if exhausted:
+                metrics.PLAYBACK_RETRIES.labels('budget').inc()
+                manager.playback_failures = 0
+                manager.starting = False
+                manager.current_song = None
+                self.schedule_disconnect(ctx.channel, manager)
+            else:
+                metrics.PLAYBACK_RETRIES.labels('upstream' if upstream else 'error').inc()
+                delay = min(PLAYBACK_RETRY_DELAY * 2 ** (failures - 1), PLAYBACK_RETRY_MAX_DELAY)
+                delay = max(delay, getattr(error, 'retry_after', 0.0))
+                manager.schedule_retry(delay, lambda: self.play_next_song(ctx, manager, after_track=track_id))
+        
+        if exhausted:
+            embed = MusicEmbeds.error_embed(
+                "Reprodução Interrompida",
+                f"{failures} tentativas seguidas de iniciar uma música falharam. Use `!play` para tentar de novo."
+            )
+            await ctx.send(embed=embed)
+            self.refresh_status(ctx.channel, manager)
+        elif not upstream:
+            embed = MusicEmbeds.error_embed("Erro de Reprodução", f"Não consegui reproduzir a música: {error}")
+            await ctx.send(embed=embed)
+        elif failures == 1:
+            # Um aviso por sequência de bloqueios, não um por tentativa
+            title, reason = (("Aguardando Vaga", "O bot está sobrecarregado agora") if busy else
+                             ("YouTube Indisponível", "O YouTube está limitando o bot"))
+            embed = MusicEmbeds.error_embed(
+                title,
+                f"{reason}. **{song.title}** continua na fila e será tentada de novo em {delay:.0f}s."
+            )
+            await ctx.send(embed=embed)
+    
+    def schedule_disconnect(self, channel, manager):
+        """Agenda a desconexão por inatividade, substituindo a anterior"""
+        if manager._disconnect_task:
+            manager._disconnect_task.cancel()
+        manager._disconnect_task = asyncio.create_task(self.auto_disconnect(channel, manager))
+    
+    def stop_playback(self, channel, manager):
+        """Para a música e limpa a fila (chamar com `manager.lock`)"""
+        manager.stop()
+        self.schedule_disconnect(channel, manager)
+    
+    async def update_panel(self, channel, manager, embed: discord.Embed, resend: bool = False):
+        """Edita o painel de controle do servidor, enviando um novo só se necessário
+
+        Cada servidor tem uma única mensagem de painel. Ela é editada a cada
+        música; um novo painel só é enviado se o antigo foi apagado, se o
+        comando veio de outro canal ou se `resend` for usado (o antigo é apagado).
+        """
+        panel = manager.panel_message
+        if panel and not resend and panel.channel.id == channel.id:
+            try:
+                await panel.edit(embed=embed)
+                return
+            except discord.NotFound:
+                manager.panel_message = None
+            except discord.HTTPException as e:
+                print(f'Erro ao atualizar o painel: {e}')
+                return
+        
+        view = MusicControlView(manager.guild_id)
+        manager.panel_message = await channel.send(embed=embed, view=view)
+        if panel:
+            try:
+                await panel.delete()
+            except discord.HTTPException:
+                pass
+    
+    def has_panel(self, channel, manager) -> bool:
+        """Indica se o painel do servidor está neste canal"""
+        return bool(manager.panel_message and manager.panel_message.channel.id == channel.id)
+    
+    def refresh_status(self, channel, manager, event: Optional[str] = None):
+        """Agenda a atualização do painel; mudanças seguidas são agrupadas em uma edição"""
+        if event:
+            manager.activity.append(event)
+        route = 'edit' if self.has_panel(channel, manager) else 'send'
+        self.scheduler.schedule(
+            channel.id,
+            lambda: self.update_panel(channel, manager, MusicEmbeds.status_panel(manager)),
+            route
+        )
+    
+    async def acknowledge(self, ctx, manager, title: str, description: str):
+        """Confirma um comando: no painel, se ele estiver neste canal, ou com uma mensagem nova"""
+        if self.has_panel(ctx.channel, manager):
+            self.refresh_status(ctx.channel, manager, f"{description} — {ctx.author.display_name}")
+        else:
+            embed = MusicEmbeds.success_embed(title, description)
             await ctx.send(embed=embed)
-            # Tenta próxima música
-            asyncio.create_task(self.play_next_song(ctx, manager))
     
-    async def auto_disconnect(self, ctx, manager):
+    async def progress_updates(self, manager, song: Song):
+        """Atualiza a barra de progresso do painel a cada PROGRESS_UPDATE_INTERVAL segundos"""
+        last_position = None
+        while manager.current_song is song:
+            await asyncio.sleep(PROGRESS_UPDATE_INTERVAL)
+            position = manager.position
+            # Pausado (ou sem painel): não há o que editar
+            if position == last_position or not manager.panel_message:
+                continue
+            last_position = position
+            self.refresh_status(manager.panel_message.channel, manager)
+    
+    async def auto_disconnect(self, channel, manager):
         """Desconecta automaticamente após timeout"""
         try:
             await asyncio.sleep(AUTO_DISCONNECT_TIMEOUT)
-            if manager.voice_client and not manager.voice_client.is_playing() and not manager.queue:
+            if manager.voice_client and not manager.is_active and not manager.queue:
+                self.scheduler.cancel(channel.id)
                 await manager.cleanup()
                 embed = MusicEmbeds.success_embed("Desconectado", "Saí do canal por inatividade")
-                await ctx.send(embed=embed)
+                await channel.send(embed=embed)
         except asyncio.CancelledError:
             pass
     
@@ -108,16 +333,21 @@ class Music(commands.Cog):
     async def join(self, ctx):
         """Comando para conectar ao canal de voz"""
         if await self.ensure_voice_connection(ctx):
-            manager = self.music_manager.get_guild_manager(ctx.guild.id)
+            manager = await self.music_manager.get_guild_manager(ctx.guild.id)
             embed = MusicEmbeds.success_embed("Conectado", f"Entrei no canal **{manager.voice_channel.name}**!")
             await ctx.send(embed=embed)
+            
+            # Retoma uma fila restaurada de antes da reinicialização
+            if manager.queue:
+                await self.play_next_song(ctx, manager, if_idle=True)
     
     @commands.command(name='leave', help='Desconecta o bot do canal de voz')
     async def leave(self, ctx):
         """Comando para desconectar do canal de voz"""
-        manager = self.music_manager.get_guild_manager(ctx.guild.id)
+        manager = await self.music_manager.get_guild_manager(ctx.guild.id)
         
         if manager.voice_client:
+            self.scheduler.cancel(ctx.channel.id)
             await manager.cleanup()
             embed = MusicEmbeds.success_embed("Desconectado", "Saí do canal de voz. Até a próxima!")
             await ctx.send(embed=embed)
@@ -125,45 +355,137 @@ class Music(commands.Cog):
             embed = MusicEmbeds.error_embed("Erro", "Não estou em um canal de voz!")
             await ctx.send(embed=embed)
     
-    @commands.command(name='play', help='Reproduz uma música do YouTube')
+    @commands.hybrid_command(name='play', help='Reproduz uma música do YouTube')
+    @app_commands.describe(query='Nome ou link da música')
     async def play(self, ctx, *, query: str):
         """Comando para reproduzir música"""
+        if ctx.interaction:
+            # Comando de barra: confirma o recebimento antes de conectar e resolver
+            await ctx.defer()
         if not await self.ensure_voice_connection(ctx):
             return
             
-        manager = self.music_manager.get_guild_manager(ctx.guild.id)
+        manager = await self.music_manager.get_guild_manager(ctx.guild.id)
         
-        # Mensagem de carregamento
-        loading_embed = discord.Embed(
-            title="🔍 Buscando...",
-            description=f"Procurando por: **{query}**",
-            color=discord.Color.yellow()
-        )
-        message = await ctx.send(embed=loading_embed)
+        # Com o painel neste canal, o resultado aparece nele e não há mensagem de carregamento
+        # (comandos de barra sempre precisam de uma resposta)
+        message = None
+        if ctx.interaction or not self.has_panel(ctx.channel, manager):
+            loading_embed = discord.Embed(
+                title="🔍 Buscando...",
+                description=f"Procurando por: **{query}**",
+                color=discord.Color.yellow()
+            )
+            message = await ctx.send(embed=loading_embed)
+        
+        async def reply(embed):
+            if message:
+                await message.edit(embed=embed)
+            else:
+                await ctx.send(embed=embed)
         
         try:
-            song = await Song.from_url(query, ctx.author)
+            song = await Song.from_url(query, ctx.author, self.music_manager.resolver, message_id=ctx.message.id)
+            self.music_manager.search.index.add(song.title, song.url)
             
-            # Verifica se já está tocando
-            if manager.voice_client.is_playing() or manager.voice_client.is_paused():
-                if manager.add_song(song):
-                    embed = MusicEmbeds.song_added(song, len(manager.queue))
-                    await message.edit(embed=embed)
-                else:
+            # Verifica se já está tocando; a checagem e a inserção não podem ser intercaladas
+            # com outro !play, senão os dois começariam a tocar
+            async with manager.lock:
+                active = manager.is_active
+                added = manager.add_song(song)
+                position = len(manager.queue)
+                
+            if active:
+                if not added:
                     embed = MusicEmbeds.error_embed("Fila Cheia", "A fila atingiu o limite máximo!")
+                    await reply(embed)
+                elif message:
+                    embed = MusicEmbeds.song_added(song, position)
                     await message.edit(embed=embed)
+                else:
+                    self.refresh_status(ctx.channel, manager,
+                                        f"➕ **{song.title}** (#{position}) — {ctx.author.display_name}")
             else:
-                manager.add_song(song)
-                await message.delete()
-                await self.play_next_song(ctx, manager)
+                if message:
+                    await message.delete()
+                await self.play_next_song(ctx, manager, if_idle=True)
                 
+        except ResolverCancelled:
+            if message:
+                await message.delete()
         except Exception as e:
             embed = MusicEmbeds.error_embed("Erro de Busca", f"Não consegui encontrar a música: {e}")
+            await reply(embed)
+    
+    @commands.command(name='playlist', aliases=['pl'], help='Adiciona todas as músicas de uma playlist à fila')
+    async def playlist(self, ctx, *, url: str):
+        """Comando para importar uma playlist"""
+        if not await self.ensure_voice_connection(ctx):
+            return
+
+        manager = await self.music_manager.get_guild_manager(ctx.guild.id)
+
+        loading_embed = discord.Embed(
+            title="📥 Importando Playlist...",
+            description=f"Lendo: **{url}**",
+            color=discord.Color.yellow()
+        )
+        message = await ctx.send(embed=loading_embed)
+        manager.start_import(self.import_playlist(ctx, manager, url, message))
+
+    async def import_playlist(self, ctx, manager, url: str, message: discord.Message):
+        """Enfileira a playlist em lotes, editando uma única mensagem de progresso"""
+        added = 0
+        queue_full = False
+        started = False
+        playlist = {'title': url, 'count': None}
+
+        try:
+            async for playlist, batch in self.music_manager.resolver.iter_playlist(url, message_id=ctx.message.id):
+                for entry in batch:
+                    if not manager.add_song(Song.from_entry(entry, ctx.author)):
+                        queue_full = True
+                        break
+                    added += 1
+
+                # Começa a tocar assim que a primeira música entra na fila
+                if not started:
+                    started = True
+                    if manager.voice_client:
+                        await self.play_next_song(ctx, manager, if_idle=True)
+
+                if queue_full:
+                    break
+                embed = MusicEmbeds.playlist_progress(playlist['title'], added, playlist['count'])
+                await message.edit(embed=embed)
+
+            embed = MusicEmbeds.playlist_progress(playlist['title'], added, playlist['count'],
+                                                  done=True, queue_full=queue_full)
             await message.edit(embed=embed)
+
+        except ResolverCancelled:
+            await message.delete()
+        except asyncio.CancelledError:
+            embed = MusicEmbeds.playlist_progress(playlist['title'], added, playlist['count'], done=True)
+            await message.edit(embed=embed)
+            raise
+        except Exception as e:
+            embed = MusicEmbeds.error_embed("Erro na Playlist", f"Não consegui importar a playlist: {e}")
+            await message.edit(embed=embed)
+
+    @play.autocomplete('query')
+    async def play_autocomplete(self, interaction: discord.Interaction, current: str) -> List[app_commands.Choice[str]]:
+        """Sugere músicas já resolvidas pelo título; nunca espera o yt-dlp"""
+        matches = self.music_manager.search.index.complete(current, AUTOCOMPLETE_LIMIT)
+        # O valor enviado é a URL, então escolher uma sugestão não precisa de nova busca
+        return [app_commands.Choice(name=title[:100], value=url) for title, url in matches if len(url) <= 100]
     
-    @commands.command(name='search', help='Busca músicas e permite seleção')
+    @commands.hybrid_command(name='search', help='Busca músicas e permite seleção')
+    @app_commands.describe(query='Termo de busca')
     async def search(self, ctx, *, query: str):
         """Comando para buscar e selecionar músicas"""
+        if ctx.interaction:
+            await ctx.defer()
         if not await self.ensure_voice_connection(ctx):
             return
             
@@ -175,17 +497,16 @@ class Music(commands.Cog):
         message = await ctx.send(embed=loading_embed)
         
         try:
-            with yt_dlp.YoutubeDL({**YTDL_OPTIONS, 'quiet': True}) as ydl:
-                search_results = ydl.extract_info(f"ytsearch{SEARCH_RESULTS_LIMIT}:{query}", download=False)
+            # Buscas repetidas vêm do cache; buscas iguais simultâneas compartilham a extração
+            results = await self.music_manager.search.search(query)
                 
-            if not search_results or not search_results.get('entries'):
+            if not results:
                 embed = MusicEmbeds.error_embed("Sem Resultados", "Não encontrei nenhuma música com esse termo")
                 await message.edit(embed=embed)
                 return
                 
-            results = search_results['entries'][:SEARCH_RESULTS_LIMIT]
             embed = MusicEmbeds.search_results(results, query)
-            view = SearchResultView(results, self.music_manager, ctx.guild.id, ctx.author)
+            view = SearchResultView(results, self.music_manager, ctx)
             
             await message.edit(embed=embed, view=view)
             
@@ -193,30 +514,58 @@ class Music(commands.Cog):
             embed = MusicEmbeds.error_embed("Erro de Busca", f"Erro ao buscar: {e}")
             await message.edit(embed=embed)
     
+    @search.autocomplete('query')
+    async def search_autocomplete(self, interaction: discord.Interaction, current: str) -> List[app_commands.Choice[str]]:
+        """Sugere títulos já resolvidos enquanto o termo é digitado"""
+        matches = self.music_manager.search.index.complete(current, AUTOCOMPLETE_LIMIT)
+        return [app_commands.Choice(name=title[:100], value=title[:100]) for title, _ in matches]
+    
     @commands.command(name='queue', aliases=['q'], help='Mostra a fila de músicas')
     async def queue(self, ctx, page: int = 1):
         """Comando para mostrar a fila"""
-        manager = self.music_manager.get_guild_manager(ctx.guild.id)
+        manager = await self.music_manager.get_guild_manager(ctx.guild.id)
         embed = MusicEmbeds.queue_display(manager, page - 1)
         await ctx.send(embed=embed)
     
     @commands.command(name='nowplaying', aliases=['np'], help='Mostra a música atual')
     async def now_playing(self, ctx):
         """Comando para mostrar música atual"""
-        manager = self.music_manager.get_guild_manager(ctx.guild.id)
+        manager = await self.music_manager.get_guild_manager(ctx.guild.id)
         
         if manager.current_song:
-            embed = MusicEmbeds.now_playing(manager.current_song)
-            view = MusicControlView(self.music_manager, ctx.guild.id)
-            await ctx.send(embed=embed, view=view)
+            # Reenvia o painel no fim do canal em vez de criar um segundo painel
+            embed = MusicEmbeds.status_panel(manager)
+            await self.update_panel(ctx.channel, manager, embed, resend=True)
         else:
             embed = MusicEmbeds.error_embed("Nada Tocando", "Nenhuma música está tocando no momento")
             await ctx.send(embed=embed)
     
+    @commands.command(name='seek', help='Vai para um momento da música (ex.: 1:30 ou 90)')
+    async def seek(self, ctx, timestamp: str):
+        """Comando para avançar/voltar a música atual"""
+        manager = await self.music_manager.get_guild_manager(ctx.guild.id)
+        
+        try:
+            position = 0
+            for part in timestamp.split(':'):
+                position = position * 60 + int(part)
+        except ValueError:
+            embed = MusicEmbeds.error_embed("Tempo Inválido", "Use o formato `m:ss`, `h:mm:ss` ou segundos")
+            await ctx.send(embed=embed)
+            return
+            
+        if not await manager.seek(position):
+            embed = MusicEmbeds.error_embed("Nada Tocando", "Nenhuma música está tocando!")
+            await ctx.send(embed=embed)
+            return
+            
+        await self.acknowledge(ctx, manager, "Posição Alterada",
+                               f"⏩ Pulei para **{MusicEmbeds.format_time(manager.position)}**")
+    
     @commands.command(name='volume', help='Ajusta o volume (0-100)')
     async def volume(self, ctx, volume: int = None):
         """Comando para ajustar volume"""
-        manager = self.music_manager.get_guild_manager(ctx.guild.id)
+        manager = await self.music_manager.get_guild_manager(ctx.guild.id)
         
         if volume is None:
             current_volume = int(manager.volume * 100)
@@ -233,43 +582,59 @@ class Music(commands.Cog):
             await ctx.send(embed=embed)
             return
             
-        manager.volume = volume / 100.0
+        manager.set_volume(volume / 100.0)
+        await self.acknowledge(ctx, manager, "Volume Ajustado", f"🔊 Volume definido para **{volume}%**")
+    
+    @commands.command(name='filter', aliases=['fx'], help='Aplica efeitos: bassboost, nightcore, speed, pitch, eq, clear')
+    async def filter(self, ctx, name: str = None, *, value: str = None):
+        """Comando para ligar, ajustar ou desligar filtros de áudio"""
+        manager = await self.music_manager.get_guild_manager(ctx.guild.id)
         
-        if manager.voice_client and hasattr(manager.voice_client.source, 'volume'):
-            manager.voice_client.source.volume = manager.volume
+        if name is None:
+            await ctx.send(embed=MusicEmbeds.filters_display(manager.filters))
+            return
             
-        embed = MusicEmbeds.success_embed("Volume Ajustado", f"Volume definido para **{volume}%**")
-        await ctx.send(embed=embed)
+        try:
+            if name.lower() == 'clear':
+                manager.clear_filters()
+            else:
+                manager.set_filter(name, value)
+        except (FilterError, ValueError) as e:
+            embed = MusicEmbeds.error_embed("Filtro Inválido", str(e))
+            await ctx.send(embed=embed)
+            return
+            
+        await ctx.send(embed=MusicEmbeds.filters_display(manager.filters))
     
     @commands.command(name='skip', help='Pula a música atual')
     async def skip(self, ctx):
         """Comando para pular música"""
-        manager = self.music_manager.get_guild_manager(ctx.guild.id)
+        manager = await self.music_manager.get_guild_manager(ctx.guild.id)
         
-        if not manager.voice_client or not manager.voice_client.is_playing():
+        async with manager.lock:
+            playing = manager.voice_client and manager.voice_client.is_playing()
+            if playing:
+                skipped_song = manager.current_song
+                # O fim da música (callback do player) avança a fila
+                manager.voice_client.stop()
+                
+        if not playing:
             embed = MusicEmbeds.error_embed("Nada Tocando", "Nenhuma música está tocando!")
             await ctx.send(embed=embed)
             return
-            
-        skipped_song = manager.current_song
-        manager.voice_client.stop()
         
         if skipped_song:
-            embed = MusicEmbeds.success_embed("Música Pulada", f"Pulei: **{skipped_song.title}**")
-            await ctx.send(embed=embed)
+            await self.acknowledge(ctx, manager, "Música Pulada", f"⏭️ Pulei: **{skipped_song.title}**")
     
     @commands.command(name='stop', help='Para a música e limpa a fila')
     async def stop(self, ctx):
         """Comando para parar música"""
-        manager = self.music_manager.get_guild_manager(ctx.guild.id)
+        manager = await self.music_manager.get_guild_manager(ctx.guild.id)
         
         if manager.voice_client:
-            manager.voice_client.stop()
-            manager.clear_queue()
-            manager.current_song = None
-            
-            embed = MusicEmbeds.success_embed("Parado", "Música parada e fila limpa")
-            await ctx.send(embed=embed)
+            async with manager.lock:
+                self.stop_playback(ctx.channel, manager)
+            await self.acknowledge(ctx, manager, "Parado", "⏹️ Música parada e fila limpa")
         else:
             embed = MusicEmbeds.error_embed("Nada Tocando", "Não estou tocando nada!")
             await ctx.send(embed=embed)
@@ -277,13 +642,16 @@ class Music(commands.Cog):
     @commands.command(name='pause', help='Pausa a música atual')
     async def pause(self, ctx):
         """Comando para pausar música"""
-        manager = self.music_manager.get_guild_manager(ctx.guild.id)
+        manager = await self.music_manager.get_guild_manager(ctx.guild.id)
         
-        if manager.voice_client and manager.voice_client.is_playing():
-            manager.voice_client.pause()
-            manager.is_paused = True
-            embed = MusicEmbeds.success_embed("Pausado", "Música pausada")
-            await ctx.send(embed=embed)
+        async with manager.lock:
+            playing = manager.voice_client and manager.voice_client.is_playing()
+            if playing:
+                manager.voice_client.pause()
+                manager.is_paused = True
+                
+        if playing:
+            await self.acknowledge(ctx, manager, "Pausado", "⏸️ Música pausada")
         else:
             embed = MusicEmbeds.error_embed("Nada Tocando", "Nenhuma música está tocando!")
             await ctx.send(embed=embed)
@@ -291,13 +659,16 @@ class Music(commands.Cog):
     @commands.command(name='resume', help='Retoma a música pausada')
     async def resume(self, ctx):
         """Comando para retomar música"""
-        manager = self.music_manager.get_guild_manager(ctx.guild.id)
+        manager = await self.music_manager.get_guild_manager(ctx.guild.id)
         
-        if manager.voice_client and manager.voice_client.is_paused():
-            manager.voice_client.resume()
-            manager.is_paused = False
-            embed = MusicEmbeds.success_embed("Retomado", "Música retomada")
-            await ctx.send(embed=embed)
+        async with manager.lock:
+            paused = manager.voice_client and manager.voice_client.is_paused()
+            if paused:
+                manager.voice_client.resume()
+                manager.is_paused = False
+                
+        if paused:
+            await self.acknowledge(ctx, manager, "Retomado", "▶️ Música retomada")
         else:
             embed = MusicEmbeds.error_embed("Não Pausado", "Nenhuma música pausada!")
             await ctx.send(embed=embed)
@@ -305,7 +676,7 @@ class Music(commands.Cog):
     @commands.command(name='shuffle', help='Embaralha a fila')
     async def shuffle(self, ctx):
         """Comando para embaralhar fila"""
-        manager = self.music_manager.get_guild_manager(ctx.guild.id)
+        manager = await self.music_manager.get_guild_manager(ctx.guild.id)
         
         if not manager.queue:
             embed = MusicEmbeds.error_embed("Fila Vazia", "A fila está vazia!")
@@ -313,25 +684,23 @@ class Music(commands.Cog):
             return
             
         manager.shuffle_queue()
-        embed = MusicEmbeds.success_embed("Embaralhado", "Fila embaralhada com sucesso!")
-        await ctx.send(embed=embed)
+        await self.acknowledge(ctx, manager, "Embaralhado", "🔀 Fila embaralhada")
     
     @commands.command(name='loop', help='Ativa/desativa loop da música atual')
     async def loop(self, ctx):
         """Comando para ativar/desativar loop"""
-        manager = self.music_manager.get_guild_manager(ctx.guild.id)
+        manager = await self.music_manager.get_guild_manager(ctx.guild.id)
         
         manager.is_looping = not manager.is_looping
         status = "ativado" if manager.is_looping else "desativado"
         emoji = "🔁" if manager.is_looping else "➡️"
         
-        embed = MusicEmbeds.success_embed("Loop", f"{emoji} Loop {status}")
-        await ctx.send(embed=embed)
+        await self.acknowledge(ctx, manager, "Loop", f"{emoji} Loop {status}")
     
     @commands.command(name='remove', help='Remove uma música da fila')
     async def remove(self, ctx, index: int):
         """Comando para remover música da fila"""
-        manager = self.music_manager.get_guild_manager(ctx.guild.id)
+        manager = await self.music_manager.get_guild_manager(ctx.guild.id)
         
         if index < 1 or index > len(manager.queue):
             embed = MusicEmbeds.error_embed("Índice Inválido", f"Use um número entre 1 e {len(manager.queue)}")
@@ -340,8 +709,95 @@ class Music(commands.Cog):
             
         removed_song = manager.remove_song(index - 1)
         if removed_song:
-            embed = MusicEmbeds.success_embed("Removido", f"Removido: **{removed_song.title}**")
-            await ctx.send(embed=embed)
+            await self.acknowledge(ctx, manager, "Removido", f"🗑️ Removido: **{removed_song.title}**")
+
+    @commands.command(name='ffmpeg', hidden=True, help='Mostra os processos do FFmpeg')
+    @commands.is_owner()
+    async def ffmpeg_stats(self, ctx, limit: int = 10):
+        """Comando para ver os FFmpeg em execução, a fila de admissão e o consumo de cada processo"""
+        stats = self.music_manager.ffmpeg.stats()
+        processes = sorted(stats['processes'], key=lambda process: process['cpu'], reverse=True)
+        embed = discord.Embed(
+            title="🎛️ FFmpeg",
+            description=(
+                f"**Vagas**: {stats['active']}/{stats['max'] or '∞'} ({stats['waiting']} na fila)\n"
+                f"**Iniciados**: {stats['spawned']}, {stats['rejected']} desistiram da fila\n"
+                f"**Travadas**: {stats['stalls']}\n"
+                f"**Encerrados sozinhos**: {stats['reaped']}\n"
+                f"**CPU total**: {sum(process['cpu'] for process in processes):.0f}%, "
+                f"**memória**: {sum(process['rss'] for process in processes) / 1024 ** 2:.0f} MB"
+            ),
+            color=discord.Color.blue()
+        )
+        for process in processes[:limit]:
+            guild = self.bot.get_guild(process['guild_id'])
+            embed.add_field(
+                name=f"PID {process['pid']} · {guild.name if guild else process['guild_id']}",
+                value=f"{process['cpu']:.1f}% CPU, {process['rss'] / 1024 ** 2:.1f} MB\n"
+                      f"{process['bytes'] / 1024 ** 2:.1f} MB lidos em {process['age'] / 60:.0f}min"
+                      + (f"\n{process['restarts']} reinícios" if process['restarts'] else "")
+                      + (" · 🧊 travado" if process['stalled'] else ""),
+                inline=True
+            )
+        await ctx.send(embed=embed)
+    
+    @commands.command(name='resolver', hidden=True, help='Mostra as métricas do resolvedor')
+    @commands.is_owner()
+    async def resolver_stats(self, ctx):
+        """Comando para ver a profundidade da fila de extrações"""
+        stats = self.music_manager.resolver.stats()
+        cache_stats = stats.pop('cache')
+        pool_stats = stats.pop('pool')
+        flight_stats = stats.pop('singleflight')
+        health_stats = stats.pop('health')
+        embed = discord.Embed(
+            title="⚙️ Resolvedor",
+            description="\n".join(f"**{key}**: {value:.2f}" if isinstance(value, float) else f"**{key}**: {value}"
+                                  for key, value in stats.items()),
+            color=discord.Color.blue()
+        )
+        for tier in ('metadata', 'streams'):
+            tier_stats = cache_stats[tier]
+            embed.add_field(
+                name=f"Cache ({tier})",
+                value=f"{tier_stats['size']} itens\n{tier_stats['hits']} hits / {tier_stats['misses']} misses",
+                inline=True
+            )
+        embed.add_field(
+            name="Pool do yt-dlp",
+            value=f"{pool_stats['created']} criadas / {pool_stats['reused']} reutilizadas",
+            inline=True
+        )
+        embed.add_field(
+            name="Saúde do extrator",
+            value=f"Disjuntor {health_stats['state']}"
+                  + (f" (volta em {health_stats['retry_after']:.0f}s)" if health_stats['retry_after'] else "")
+                  + f"\n{health_stats['rate']:.1f} extrações/s, {health_stats['opened']} aberturas\n"
+                  f"{health_stats['throttled']} bloqueios / {health_stats['rejected']} recusadas",
+            inline=True
+        )
+        embed.add_field(
+            name="Extrações compartilhadas",
+            value=f"{flight_stats['shared']} economizadas ({flight_stats['inflight']} em andamento)\n"
+                  f"{flight_stats['suppressed']} recusadas em espera após falha",
+            inline=True
+        )
+        search_stats = self.music_manager.search.stats()
+        embed.add_field(
+            name="Buscas",
+            value=f"{search_stats['size']} no cache\n{search_stats['hits']} hits / {search_stats['misses']} misses\n"
+                  f"{search_stats['titles']} títulos indexados",
+            inline=True
+        )
+        if self.music_manager.audio_cache:
+            audio_stats = self.music_manager.audio_cache.stats()
+            embed.add_field(
+                name="Cache de áudio",
+                value=f"{audio_stats['files']} arquivos ({audio_stats['bytes'] / 1024 ** 2:.1f} MB)\n"
+                      f"{audio_stats['hits']} hits / {audio_stats['misses']} misses",
+                inline=True
+            )
+        await ctx.send(embed=embed)
 
 async def setup(bot):
     await bot.add_cog(Music(bot))
\ No newline at end of file
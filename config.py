@@ -32,8 +32,139 @@ FFMPEG_OPTIONS = {
     'options': '-vn'
 }
 
+# Modo de reprodução: 'opus' (o FFmpeg entrega Opus, volume por filtro), 'pcm' (volume em Python)
+# ou 'numpy' (PCM processado com NumPy: rampa de volume, normalização e crossfade)
+PLAYBACK_MODE = os.getenv('PLAYBACK_MODE', 'opus')
+OPUS_BITRATE = 128  # kbps, usado quando o FFmpeg precisa codificar
+
 # Configurações gerais
 DEFAULT_VOLUME = 0.5
 MAX_QUEUE_SIZE = 50
 SEARCH_RESULTS_LIMIT = 5
-AUTO_DISCONNECT_TIMEOUT = 300  # 5 minutos
\ No newline at end of file
+SEARCH_CACHE_SIZE = 512  # Buscas guardadas (pelo termo normalizado)
+SEARCH_CACHE_TTL = 60 * 60  # 1 hora
+TITLE_INDEX_SIZE = 5000  # Títulos recentes usados no autocomplete dos comandos de barra
+AUTOCOMPLETE_LIMIT = 25  # Máximo de sugestões aceito pelo Discord
+AUTO_DISCONNECT_TIMEOUT = 300  # 5 minutos
+
+# Configurações do resolvedor (extração do yt-dlp fora do event loop)
+RESOLVER_WORKERS = int(os.getenv('RESOLVER_WORKERS', 4))
+RESOLVER_MAX_PENDING = int(os.getenv('RESOLVER_MAX_PENDING', 64))
+RESOLVER_TIMEOUT = float(os.getenv('RESOLVER_TIMEOUT', 30))
+# Extrações iguais em andamento são compartilhadas; após uma falha a mesma chave espera antes de tentar de novo
+SINGLEFLIGHT_BACKOFF = 2.0  # segundos, dobrando a cada falha seguida
+SINGLEFLIGHT_MAX_BACKOFF = 60.0
+# Saúde do extrator: ritmo das extrações e disjuntor quando o YouTube bloqueia o bot (HTTP 429, "sign in")
+EXTRACTOR_RATE = float(os.getenv('EXTRACTOR_RATE', 5))  # Extrações por segundo
+EXTRACTOR_BURST = 10
+EXTRACTOR_MIN_RATE = 0.5  # Piso do ritmo, que cai pela metade a cada bloqueio
+EXTRACTOR_MAX_WAIT = 10.0  # Espera máxima por uma vaga antes de recusar a extração
+BREAKER_THRESHOLD = 5  # Bloqueios dentro da janela que abrem o disjuntor
+BREAKER_WINDOW = 30.0  # segundos
+BREAKER_COOLDOWN = 15.0  # Pausa das extrações; dobra a cada reabertura seguida
+BREAKER_MAX_COOLDOWN = 5 * 60
+# Falhas seguidas ao iniciar músicas antes de a reprodução parar, e a espera entre as tentativas
+PLAYBACK_RETRY_BUDGET = 5
+PLAYBACK_RETRY_DELAY = 1.0  # dobra a cada falha seguida
+PLAYBACK_RETRY_MAX_DELAY = 30.0
+# Supervisor do FFmpeg: processos simultâneos neste processo do bot (0 = sem limite) e detecção de travadas
+FFMPEG_MAX_PROCESSES = int(os.getenv('FFMPEG_MAX_PROCESSES', 100))
+FFMPEG_ADMISSION_TIMEOUT = 30.0  # Espera máxima na fila por um FFmpeg livre
+FFMPEG_STALL_TIMEOUT = 8.0  # Leitura sem áudio por mais tempo que isso reinicia o FFmpeg na posição atual
+FFMPEG_MAX_STALL_RESTARTS = 3  # Por música; depois disso ela é encerrada
+FFMPEG_SAMPLE_INTERVAL = 5.0  # Coleta de CPU e memória dos processos (/proc)
+
+# Configurações do cache de músicas resolvidas
+METADATA_CACHE_SIZE = int(os.getenv('METADATA_CACHE_SIZE', 2048))
+METADATA_CACHE_TTL = 6 * 60 * 60  # 6 horas
+STREAM_CACHE_SIZE = int(os.getenv('STREAM_CACHE_SIZE', 1024))
+STREAM_CACHE_TTL = 30 * 60  # Usado quando a URL não tem o parâmetro `expire`
+STREAM_EXPIRE_MARGIN = 5 * 60  # Descarta a URL alguns minutos antes de expirar
+SONG_CACHE_PATH = os.getenv('SONG_CACHE_PATH')  # Ex.: song_cache.json (desativado se vazio)
+
+# Pré-carregamento da próxima música da fila
+PREFETCH_WARM_FFMPEG = os.getenv('PREFETCH_WARM_FFMPEG', '0') == '1'  # Inicia o FFmpeg antes da hora
+
+# Importação de playlists (extração "flat": só lista os vídeos, sem resolver cada um)
+YTDL_PLAYLIST_OPTIONS = {
+    **YTDL_OPTIONS,
+    'noplaylist': False,
+    'extract_flat': 'in_playlist',
+    'lazy_playlist': True,
+}
+PLAYLIST_BATCH_SIZE = 10
+
+# Perfis de opções do yt-dlp; cada perfil tem seu próprio pool de instâncias
+YTDL_PROFILES = {
+    'search': {**YTDL_OPTIONS, 'quiet': True},
+    'metadata': YTDL_OPTIONS,
+    'stream': YTDL_OPTIONS,
+    'playlist': YTDL_PLAYLIST_OPTIONS,
+}
+YTDL_POOL_SIZE = RESOLVER_WORKERS  # Instâncias ociosas mantidas por perfil
+
+# Persistência das filas entre reinicializações: 'sqlite' (arquivo abaixo, desativado se vazio) ou 'memory'
+STATE_BACKEND = os.getenv('STATE_BACKEND', 'sqlite')
+STATE_DB_PATH = os.getenv('STATE_DB_PATH', 'music_state.db')
+
+# Endpoint de métricas no formato do Prometheus (desativado se a porta for 0)
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0))
+
+# Cache local de áudio: músicas populares são baixadas já em Opus (desativado se vazio)
+AUDIO_CACHE_DIR = os.getenv('AUDIO_CACHE_DIR')  # Ex.: audio_cache
+AUDIO_CACHE_MAX_BYTES = int(os.getenv('AUDIO_CACHE_MAX_BYTES', 2 * 1024 ** 3))  # 2 GB
+AUDIO_CACHE_MIN_PLAYS = int(os.getenv('AUDIO_CACHE_MIN_PLAYS', 3))  # Reproduções antes de baixar
+AUDIO_CACHE_MAX_DURATION = 20 * 60  # Músicas mais longas (ou ao vivo) não são baixadas
+AUDIO_CACHE_DOWNLOADS = 1  # Downloads simultâneos
+AUDIO_CACHE_DOWNLOAD_TIMEOUT = 300  # Segundos para baixar e converter uma música
+AUDIO_CACHE_TRACKED = 10000  # Músicas com contagem de reproduções guardada
+YTDL_DOWNLOAD_OPTIONS = {
+    **YTDL_OPTIONS,
+    'audioformat': 'opus',
+    'outtmpl': '%(extractor)s-%(id)s.%(ext)s',  # Relativo à pasta do cache
+    # `extractaudio`/`audioformat` são opções da linha de comando; na API viram o pós-processador
+    'postprocessors': [{'key': 'FFmpegExtractAudio', 'preferredcodec': 'opus'}],
+}
+# Arquivos locais não usam as opções de reconexão do HTTP
+LOCAL_FFMPEG_OPTIONS = {'options': '-vn'}
+
+# Processamento em Python com NumPy (PLAYBACK_MODE='numpy'): rampa de volume, normalização e crossfade
+VOLUME_RAMP_SECONDS = 0.2
+LOUDNESS_NORMALIZATION = os.getenv('LOUDNESS_NORMALIZATION', '1') == '1'
+LOUDNESS_TARGET = -16.0  # LUFS
+CROSSFADE_SECONDS = float(os.getenv('CROSSFADE_SECONDS', 3))  # 0 desativa
+
+# Filtros de áudio: mudanças seguidas são agrupadas antes de reiniciar o FFmpeg
+FILTER_DEBOUNCE = 0.75  # segundos sem novas mudanças
+FILTER_MAX_DELAY = 3.0  # aplica mesmo que as mudanças continuem chegando
+
+# Barra de progresso do painel: intervalo mínimo entre edições da mensagem
+PROGRESS_UPDATE_INTERVAL = 15  # segundos
+
+# Shards: com SHARD_COUNT > 0 o bot usa o AutoShardedBot. SHARD_IDS limita os shards deste
+# processo (ex.: 0-3 ou 0,2,4); o launcher.py divide os shards entre SHARD_PROCESSES processos
+SHARD_COUNT = int(os.getenv('SHARD_COUNT', 0))
+SHARD_IDS = os.getenv('SHARD_IDS')
+SHARD_PROCESSES = int(os.getenv('SHARD_PROCESSES', os.cpu_count() or 1))
+SHARD_RESTART_DELAY = 5  # segundos antes de reiniciar um processo de shards que caiu
+
+# Painel de status: mudanças seguidas viram uma única edição da mensagem
+STATUS_DEBOUNCE = 1.0  # segundos agrupando mudanças antes de editar
+STATUS_RATE_LIMITS = {  # rota -> (requisições, segundos), por canal
+    'edit': (5, 5.0),
+    'send': (5, 5.0),
+}
+STATUS_ACTIVITY_SIZE = 5  # Últimas ações mostradas no painel
+
+# Saúde do event loop: o atraso é medido a cada LOOP_LAG_INTERVAL; travadas acima de
+# LOOP_STALL_THRESHOLD registram a pilha de quem bloqueou o loop
+LOOP_MONITOR = os.getenv('LOOP_MONITOR', '1') == '1'
+LOOP_LAG_INTERVAL = 0.5  # segundos entre amostras de atraso
+LOOP_STALL_THRESHOLD = 0.25  # segundos sem o loop responder
+LOOP_DEBUG = os.getenv('LOOP_DEBUG', '0') == '1'  # Modo debug do asyncio (mais lento; avisa callbacks lentos)
+LOOP_MONITOR_LOG = os.getenv('LOOP_MONITOR_LOG')  # Ex.: loop_monitor.log (um evento JSON por linha)
+SLOW_COMMAND_THRESHOLD = float(os.getenv('SLOW_COMMAND_THRESHOLD', 2.0))  # segundos
+PROFILER_SAMPLE_INTERVAL = 0.01  # segundos entre amostras da pilha enquanto há comandos rodando
+PROFILER_MAX_SAMPLES = 6000  # amostras guardadas (1 minuto a 100 Hz)
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')  # Perfis dos comandos lentos (formato "folded")
@@ -0,0 +1,108 @@
+"""
+Launcher de shards: divide os shards do bot entre vários processos
+
+Uso:
+    python launcher.py [--shards N] [--processes P]
+
+Cada processo roda um ShardedMusicBot com uma faixa contínua de shards, então
+extração e codificação de áudio deixam de disputar um único GIL. Se um
+processo cair, só ele é reiniciado; os outros shards continuam no ar.
+O estado das filas fica no backend configurado (STATE_BACKEND); com SQLite,
+todos os processos usam o mesmo arquivo.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import signal
+import time
+from typing import Dict, List
+
+from config import SHARD_COUNT, SHARD_PROCESSES, SHARD_RESTART_DELAY, METRICS_PORT
+from utils.sharding import split_shards, format_shard_ids
+
+
+def run_worker(index: int, shard_ids: List[int], shard_count: int):
+    """Ponto de entrada de cada processo"""
+    import main
+    # Cada processo expõe as métricas em uma porta própria
+    metrics_port = METRICS_PORT + index if METRICS_PORT else 0
+
+    async def run():
+        # O launcher encerra os processos com SIGTERM: cancela o bot, que fecha
+        # normalmente (bot.close) e grava as escritas pendentes do estado
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        await main.main(shard_ids, shard_count, metrics_port)
+
+    try:
+        asyncio.run(run())
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+
+
+class Launcher:
+    """Inicia um processo por faixa de shards e reinicia os que caírem"""
+
+    def __init__(self, shard_count: int, processes: int):
+        self.shard_count = shard_count
+        self.groups = split_shards(shard_count, processes)
+        self.workers: Dict[int, multiprocessing.Process] = {}
+        self.running = True
+
+    def start_worker(self, index: int):
+        shard_ids = self.groups[index]
+        process = multiprocessing.Process(
+            target=run_worker,
+            args=(index, shard_ids, self.shard_count),
+            name=f'shards-{format_shard_ids(shard_ids)}'
+        )
+        process.start()
+        self.workers[index] = process
+        print(f"🧩 Processo {process.pid}: shards {format_shard_ids(shard_ids)}")
+
+    def run(self):
+        for index in range(len(self.groups)):
+            self.start_worker(index)
+        while self.running:
+            time.sleep(1)
+            for index, process in list(self.workers.items()):
+                if not process.is_alive() and self.running:
+                    print(f"⚠️ Shards {format_shard_ids(self.groups[index])} pararam "
+                          f"(código {process.exitcode}); reiniciando em {SHARD_RESTART_DELAY}s")
+                    time.sleep(SHARD_RESTART_DELAY)
+                    self.start_worker(index)
+
+    def stop(self, *args):
+        self.running = False
+        for process in self.workers.values():
+            if process.is_alive():
+                process.terminate()
+        for process in self.workers.values():
+            process.join(timeout=10)
+            if process.is_alive():
+                print(f"⚠️ Processo {process.pid} não encerrou a tempo; forçando")
+                process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shards', type=int, default=SHARD_COUNT)
+    parser.add_argument('--processes', type=int, default=SHARD_PROCESSES)
+    args = parser.parse_args()
+
+    if args.shards <= 0:
+        print("❌ Defina o número de shards (--shards ou SHARD_COUNT no .env)")
+        return
+
+    multiprocessing.set_start_method('spawn')
+    launcher = Launcher(args.shards, args.processes)
+    signal.signal(signal.SIGTERM, launcher.stop)
+    try:
+        launcher.run()
+    except KeyboardInterrupt:
+        print("\n🛑 Encerrando shards...")
+    finally:
+        launcher.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -6,12 +6,17 @@ import discord
 from discord.ext import commands
 import asyncio
 import os
-from config import DISCORD_TOKEN
+from typing import List, Optional
+from config import DISCORD_TOKEN, METRICS_HOST, METRICS_PORT, SHARD_COUNT, SHARD_IDS, LOOP_MONITOR
+from utils.sharding import parse_shard_ids, format_shard_ids
+from utils.metrics import MetricsServer
+from utils.loop_monitor import LoopMonitor
+from utils.views import MusicControlButton
 
 class MusicBot(commands.Bot):
     """Classe principal do bot de música"""
     
-    def __init__(self):
+    def __init__(self, metrics_port: int = METRICS_PORT, **options):
         intents = discord.Intents.default()
         intents.message_content = True
         intents.voice_states = True
@@ -19,8 +24,12 @@ class MusicBot(commands.Bot):
         super().__init__(
             command_prefix='!',
             intents=intents,
-            help_command=None  # Vamos criar um comando help customizado
+            help_command=None,  # Vamos criar um comando help customizado
+            **options
         )
+        self.metrics_port = metrics_port
+        self.metrics_server = None
+        self.loop_monitor: Optional[LoopMonitor] = None
     
     async def setup_hook(self):
         """Carrega os cogs quando o bot inicia"""
@@ -30,14 +39,40 @@ class MusicBot(commands.Bot):
             print("✅ Todos os cogs foram carregados com sucesso!")
         except Exception as e:
             print(f"❌ Erro ao carregar cogs: {e}")
+        
+        # Os botões do painel são tratados pelo custom_id, inclusive em mensagens antigas
+        self.add_dynamic_items(MusicControlButton)
+        
+        # Atraso do event loop, travadas e perfil dos comandos lentos (ver !lag)
+        if LOOP_MONITOR:
+            self.loop_monitor = LoopMonitor()
+            self.loop_monitor.start()
+            self.before_invoke(self.loop_monitor.command_started)
+            self.after_invoke(self.loop_monitor.command_finished)
+        
+        if self.metrics_port:
+            self.metrics_server = MetricsServer(METRICS_HOST, self.metrics_port)
+            await self.metrics_server.start()
+            print(f"📊 Métricas disponíveis em http://{METRICS_HOST}:{self.metrics_port}/metrics")
     
     async def close(self):
         """Limpa recursos antes de fechar"""
         music_cog = self.get_cog('Music')
         if music_cog and hasattr(music_cog, 'music_manager'):
-            await music_cog.music_manager.cleanup_all()
+            # Mantém as filas salvas para restaurá-las na próxima inicialização
+            await music_cog.music_manager.cleanup_all(preserve_state=True)
+        if self.metrics_server:
+            await self.metrics_server.stop()
+        if self.loop_monitor:
+            self.loop_monitor.stop()
         await super().close()
 
+class ShardedMusicBot(MusicBot, commands.AutoShardedBot):
+    """Bot com vários shards em um mesmo processo (cada processo pode cuidar de uma faixa)"""
+    
+    def __init__(self, shard_count: int, shard_ids: Optional[List[int]] = None, metrics_port: int = METRICS_PORT):
+        super().__init__(metrics_port=metrics_port, shard_count=shard_count, shard_ids=shard_ids)
+
 # Comando help customizado
 @commands.command(name='help')
 async def help_command(ctx, command_name: str = None):
@@ -83,6 +118,7 @@ async def help_command(ctx, command_name: str = None):
                 "`!join` - Conectar ao canal de voz\n"
                 "`!leave` - Desconectar do canal\n"
                 "`!play <música>` - Tocar uma música\n"
+                "`!playlist <link>` - Adicionar uma playlist à fila\n"
                 "`!search <termo>` - Buscar e selecionar música\n"
                 "`!pause` - Pausar música\n"
                 "`!resume` - Retomar música\n"
@@ -109,7 +145,9 @@ async def help_command(ctx, command_name: str = None):
             name="🔧 Controles",
             value=(
                 "`!volume [0-100]` - Ajustar/ver volume\n"
+                "`!seek <tempo>` - Ir para um momento da música\n"
                 "`!loop` - Ativar/desativar loop\n"
+                "`!filter [efeito] [valor]` - Efeitos: bassboost, nightcore, speed, pitch, eq\n"
             ),
             inline=False
         )
@@ -118,14 +156,25 @@ async def help_command(ctx, command_name: str = None):
     
     await ctx.send(embed=embed)
 
-async def main():
-    """Função principal"""
+async def main(shard_ids: Optional[List[int]] = None, shard_count: int = SHARD_COUNT,
+               metrics_port: int = METRICS_PORT):
+    """Função principal
+
+    Com `shard_count` (ou SHARD_COUNT no .env) o bot roda em modo de shards;
+    `shard_ids` limita os shards deste processo (usado pelo launcher.py).
+    """
     if not DISCORD_TOKEN:
         print("❌ Erro: Token do Discord não encontrado!")
         print("Certifique-se de que a variável DISCORD_TOKEN está definida no arquivo .env")
         return
     
-    bot = MusicBot()
+    if shard_count:
+        shard_ids = shard_ids if shard_ids is not None else parse_shard_ids(SHARD_IDS)
+        bot = ShardedMusicBot(shard_count, shard_ids, metrics_port)
+        shards = format_shard_ids(shard_ids) if shard_ids else 'todos'
+        print(f"🧩 Modo de shards: {shards} de {shard_count}")
+    else:
+        bot = MusicBot(metrics_port)
     bot.add_command(help_command)
     
     try:
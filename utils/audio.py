@@ -0,0 +1,133 @@
+"""
+Fontes de áudio usadas na reprodução
+"""
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import discord
+
+from config import FFMPEG_OPTIONS, PLAYBACK_MODE, OPUS_BITRATE
+from utils import mixer
+
+if PLAYBACK_MODE == 'numpy' and not mixer.available():
+    print('⚠️ PLAYBACK_MODE=numpy, mas o NumPy não está instalado; usando o PCMVolumeTransformer')
+
+
+class TrackedSource(discord.AudioSource):
+    """Repassa os frames de outra fonte contando quantos já foram lidos
+
+    Cada leitura corresponde a 20 ms de áudio. `on_first_frame` é chamado
+    (na thread de áudio) quando o primeiro frame com dados é lido. A fonte
+    interna pode ser trocada com `replace` (ex.: para reiniciar o FFmpeg em
+    outra posição) sem interromper o player do discord.py, inclusive com uma
+    leitura travada em andamento: encerrar a fonte antiga faz essa leitura
+    voltar vazia, e ela é refeita na nova.
+    """
+
+    FRAME_SECONDS = 0.02
+
+    def __init__(self, original: discord.AudioSource, on_first_frame: Optional[Callable[[float], None]] = None,
+                 offset: float = 0.0, speed: float = 1.0):
+        self.original = original
+        self.frames = 0
+        self.started_at: Optional[float] = None
+        self._on_first_frame = on_first_frame
+        # Posição (em segundos) da fonte atual e quantos frames já tinham sido lidos quando ela entrou
+        self._offset = offset
+        self._base_frames = 0
+        # Segundos da música por segundo de áudio (filtros de velocidade)
+        self._speed = speed
+        self._lock = threading.Lock()
+
+    def read(self) -> bytes:
+        while True:
+            original = self.original
+            # A leitura fica fora do lock: se o FFmpeg travar, `replace` não trava junto
+            data = original.read()
+            with self._lock:
+                if not data and self.original is not original:
+                    continue  # Fonte trocada durante a leitura
+                if data:
+                    if self.started_at is None:
+                        self.started_at = time.perf_counter()
+                        if self._on_first_frame:
+                            self._on_first_frame(self.started_at)
+                    self.frames += 1
+                return data
+
+    def replace(self, original: discord.AudioSource, position: float, speed: float = 1.0) -> discord.AudioSource:
+        """Troca a fonte interna, que começa em `position` segundos; retorna a antiga"""
+        with self._lock:
+            old = self.original
+            self.original = original
+            self._offset = position
+            self._base_frames = self.frames
+            self._speed = speed
+        return old
+
+    def is_opus(self) -> bool:
+        return self.original.is_opus()
+
+    def cleanup(self):
+        self.original.cleanup()
+
+    @property
+    def elapsed(self) -> float:
+        """Posição atual da música, em segundos"""
+        return self._offset + (self.frames - self._base_frames) * self.FRAME_SECONDS * self._speed
+
+
+def is_native_opus(audio_url: str) -> bool:
+    """Indica se a fonte já está em Opus (arquivo .opus do cache ou stream WebM do YouTube)"""
+    if audio_url.endswith('.opus'):
+        return True
+    return 'mime=audio%2Fwebm' in audio_url or 'mime=audio/webm' in audio_url
+
+
+def create_source(audio_url: str, volume: float, mode: str = PLAYBACK_MODE, start: float = 0.0,
+                  ffmpeg_options: Dict[str, str] = FFMPEG_OPTIONS, filters: str = '') -> discord.AudioSource:
+    """Inicia o FFmpeg para a música
+
+    - modo `pcm`: o FFmpeg entrega PCM; o volume é aplicado em Python
+      (`PCMVolumeTransformer`) e o discord.py codifica em Opus;
+    - modo `opus`: o FFmpeg entrega Opus pronto, com o volume aplicado por
+      filtro. Com volume 100%, sem filtros e fonte já em Opus, o áudio é só copiado.
+
+    `filters` é o grafo de efeitos (ver `FilterChain.compile`), aplicado em todos os modos.
+    """
+    before_options = ffmpeg_options.get('before_options', '')
+    if start:
+        before_options = f"{before_options} -ss {start:.2f}".strip()
+    options = ffmpeg_options.get('options', '')
+    graph = [filters] if filters else []
+    
+    if mode != 'opus':
+        if graph:
+            options = f"{options} -af {','.join(graph)}".strip()
+        return discord.FFmpegPCMAudio(audio_url, before_options=before_options or None, options=options or None)
+    
+    if volume == 1.0 and not graph and is_native_opus(audio_url):
+        codec = 'copy'
+    else:
+        codec = 'libopus'
+        if volume != 1.0:
+            graph.append(f"volume={volume:.2f}")
+        if graph:
+            options = f"{options} -af {','.join(graph)}".strip()
+    return discord.FFmpegOpusAudio(audio_url, bitrate=OPUS_BITRATE, codec=codec,
+                                   before_options=before_options or None, options=options or None)
+
+
+def wrap_source(tracked: TrackedSource, volume: float, duration: Optional[float] = None,
+                on_crossfade: Optional[Callable[[], None]] = None) -> discord.AudioSource:
+    """Aplica o volume em Python apenas quando a fonte entrega PCM
+
+    No modo `numpy` a fonte PCM passa pelo `MixerSource` (rampa de volume,
+    normalização e crossfade); sem o NumPy, pelo `PCMVolumeTransformer`.
+    """
+    if tracked.is_opus():
+        return tracked
+    if PLAYBACK_MODE == 'numpy' and mixer.available():
+        return mixer.MixerSource(tracked, volume, duration=duration, on_crossfade=on_crossfade)
+    return discord.PCMVolumeTransformer(tracked, volume=volume)
@@ -0,0 +1,217 @@
+"""
+Cache local de áudio: baixa as músicas mais tocadas e as serve do disco
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Dict, Optional, Set
+
+from utils.cache import canonical_id
+from utils.resolver import Resolver
+from utils.ytdl_pool import YTDLPool
+from utils import metrics
+from config import (AUDIO_CACHE_DIR, AUDIO_CACHE_MAX_BYTES, AUDIO_CACHE_MIN_PLAYS, AUDIO_CACHE_MAX_DURATION,
+                    AUDIO_CACHE_DOWNLOADS, AUDIO_CACHE_TRACKED, AUDIO_CACHE_DOWNLOAD_TIMEOUT,
+                    YTDL_DOWNLOAD_OPTIONS)
+
+INDEX_FILE = 'index.json'
+
+
+class AudioCache:
+    """Guarda em disco, já em Opus, as músicas que passam de `min_plays` reproduções
+
+    Cada reprodução é contada por chave canônica (`youtube:<id>`). Quando uma
+    música atinge o limite de popularidade ela é baixada em segundo plano;
+    as reproduções seguintes tocam o arquivo local. Quando o tamanho total
+    passa de `max_bytes`, os arquivos menos tocados (LFU) são apagados.
+
+    Os downloads passam pelo single-flight do resolvedor, pela chave canônica,
+    e pelo limite de ritmo e disjuntor do extrator.
+    """
+
+    def __init__(self, directory: str = AUDIO_CACHE_DIR, max_bytes: int = AUDIO_CACHE_MAX_BYTES,
+                 min_plays: int = AUDIO_CACHE_MIN_PLAYS, pool: Optional[YTDLPool] = None,
+                 resolver: Optional[Resolver] = None):
+        self.directory = directory
+        self.resolver = resolver or Resolver.default()
+        self.max_bytes = max_bytes
+        self.min_plays = min_plays
+        options = {**YTDL_DOWNLOAD_OPTIONS, 'outtmpl': os.path.join(directory, YTDL_DOWNLOAD_OPTIONS['outtmpl'])}
+        self.pool = pool or YTDLPool({'download': options}, size=AUDIO_CACHE_DOWNLOADS, prewarm=False)
+        # chave -> {'plays', 'last_played', 'file', 'size'} ('file' só existe se estiver no disco)
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._downloading: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=AUDIO_CACHE_DOWNLOADS, thread_name_prefix='audio-cache')
+        self.hits = 0
+        self.misses = 0
+        self.downloads = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+        self.load()
+
+    @property
+    def size(self) -> int:
+        """Bytes ocupados pelos arquivos do cache"""
+        with self._lock:
+            return sum(entry.get('size', 0) for entry in self._entries.values() if 'file' in entry)
+
+    def lookup(self, url: str) -> Optional[str]:
+        """Retorna o caminho do arquivo local da música, se estiver no cache"""
+        key = canonical_id(url)
+        with self._lock:
+            entry = self._entries.get(key) if key else None
+            filename = entry.get('file') if entry else None
+        if filename:
+            path = os.path.join(self.directory, filename)
+            if os.path.exists(path):
+                self.hits += 1
+                metrics.AUDIO_CACHE_REQUESTS.labels('hit').inc()
+                return path
+            # O arquivo foi apagado por fora
+            with self._lock:
+                entry.pop('file', None)
+                entry.pop('size', None)
+        self.misses += 1
+        metrics.AUDIO_CACHE_REQUESTS.labels('miss').inc()
+        return None
+
+    def record_play(self, url: str, duration: Optional[int] = None):
+        """Conta uma reprodução e agenda o download se a música ficou popular"""
+        key = canonical_id(url)
+        if not key:
+            return
+        with self._lock:
+            entry = self._entries.setdefault(key, {'plays': 0})
+            entry['plays'] += 1
+            entry['last_played'] = time.time()
+            wanted = (entry['plays'] >= self.min_plays and 'file' not in entry and key not in self._downloading
+                      and duration and duration <= AUDIO_CACHE_MAX_DURATION)
+            if wanted:
+                self._downloading.add(key)
+            if len(self._entries) > AUDIO_CACHE_TRACKED:
+                self._forget_cold()
+        if wanted:
+            try:
+                task = asyncio.get_running_loop().create_task(self._fetch(key, url))
+            except RuntimeError:
+                with self._lock:
+                    self._downloading.discard(key)
+                return
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def _forget_cold(self):
+        """Descarta a contagem das músicas menos tocadas que não estão no disco"""
+        cold = sorted((entry['plays'], entry.get('last_played', 0), key)
+                      for key, entry in self._entries.items()
+                      if 'file' not in entry and key not in self._downloading)
+        for _, _, key in cold[:len(self._entries) - AUDIO_CACHE_TRACKED]:
+            del self._entries[key]
+
+    async def _fetch(self, key: str, url: str):
+        """Baixa a música; downloads simultâneos do mesmo vídeo compartilham um só"""
+        try:
+            await self.resolver.flights.do(
+                ('download', key),
+                partial(self.resolver.upstream, self._download, key, url,
+                        timeout=AUDIO_CACHE_DOWNLOAD_TIMEOUT, executor=self._executor)
+            )
+        except Exception as e:
+            print(f'Erro ao baixar música para o cache local: {e}')
+            metrics.ERRORS.labels(type(e).__name__).inc()
+        finally:
+            with self._lock:
+                self._downloading.discard(key)
+
+    def _download(self, key: str, url: str):
+        """Baixa e converte a música para Opus (executado na thread do cache)"""
+        with self.pool.checkout('download') as ydl:
+            info = ydl.extract_info(url, download=True)
+        downloads = info.get('requested_downloads') or [{}]
+        path = downloads[0].get('filepath') or info.get('filepath')
+        if not path or not os.path.exists(path):
+            raise OSError('arquivo baixado não encontrado')
+        with self._lock:
+            entry = self._entries.setdefault(key, {'plays': 0})
+            entry['file'] = os.path.basename(path)
+            entry['size'] = os.path.getsize(path)
+            self.downloads += 1
+            self._evict()
+        self.save()
+
+    def _evict(self):
+        """Apaga os arquivos menos tocados até o cache caber em `max_bytes`"""
+        cached = [(entry['plays'], entry.get('last_played', 0), key)
+                  for key, entry in self._entries.items() if 'file' in entry]
+        total = sum(self._entries[key]['size'] for _, _, key in cached)
+        for _, _, key in sorted(cached):
+            if total <= self.max_bytes:
+                break
+            entry = self._entries[key]
+            try:
+                os.remove(os.path.join(self.directory, entry['file']))
+            except OSError:
+                pass
+            total -= entry.pop('size', 0)
+            del entry['file']
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            files = sum(1 for entry in self._entries.values() if 'file' in entry)
+            tracked = len(self._entries)
+        return {
+            'files': files,
+            'bytes': self.size,
+            'tracked': tracked,
+            'hits': self.hits,
+            'misses': self.misses,
+            'downloads': self.downloads,
+            'evictions': self.evictions,
+        }
+
+    def load(self):
+        """Carrega o índice do disco, ignorando arquivos que não existem mais"""
+        path = os.path.join(self.directory, INDEX_FILE)
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f'Não consegui carregar o índice do cache de áudio: {e}')
+            return
+        for entry in entries.values():
+            if 'file' in entry and not os.path.exists(os.path.join(self.directory, entry['file'])):
+                entry.pop('file')
+                entry.pop('size', None)
+        with self._lock:
+            self._entries = entries
+            self._evict()
+
+    def save(self):
+        """Salva o índice (contagens e arquivos) no disco"""
+        path = os.path.join(self.directory, INDEX_FILE)
+        with self._lock:
+            data = json.dumps(self._entries)
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f'Não consegui salvar o índice do cache de áudio: {e}')
+
+    def close(self):
+        """Interrompe downloads pendentes e salva o índice"""
+        for task in self._tasks:
+            task.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.pool.close()
+        self.save()
@@ -0,0 +1,210 @@
+"""
+Cache de metadados e URLs de stream das músicas resolvidas
+"""
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+
+from config import (METADATA_CACHE_SIZE, METADATA_CACHE_TTL, STREAM_CACHE_SIZE,
+                    STREAM_CACHE_TTL, STREAM_EXPIRE_MARGIN, SONG_CACHE_PATH)
+
+_YOUTUBE_ID = re.compile(
+    r'(?:youtube\.com/(?:watch\?(?:.*&)?v=|shorts/|embed/|live/)|youtu\.be/)([A-Za-z0-9_-]{11})'
+)
+
+# Campos dos metadados que valem a pena guardar
+METADATA_FIELDS = ('id', 'extractor_key', 'webpage_url', 'title', 'duration', 'thumbnail')
+
+
+def canonical_id(url: str) -> Optional[str]:
+    """Retorna a chave canônica (`youtube:<id>`) de uma URL, se reconhecida"""
+    match = _YOUTUBE_ID.search(url or '')
+    if match:
+        return f"youtube:{match.group(1)}"
+    return None
+
+
+def info_key(info: Dict[str, Any]) -> Optional[str]:
+    """Retorna a chave canônica de um resultado do yt-dlp"""
+    if info.get('id') and info.get('extractor_key'):
+        return f"{info['extractor_key'].lower()}:{info['id']}"
+    return canonical_id(info.get('webpage_url', ''))
+
+
+def normalize_query(query: str) -> str:
+    """Normaliza um termo de busca para uso como chave"""
+    return ' '.join(query.lower().split())
+
+
+def stream_expiry(stream_url: str, default_ttl: float = STREAM_CACHE_TTL) -> float:
+    """Calcula quando a URL de stream expira, usando o parâmetro `expire` da URL assinada"""
+    now = time.time()
+    try:
+        parsed = urlparse(stream_url)
+        params = parse_qs(parsed.query)
+        expire = params.get('expire')
+        if not expire:
+            # Algumas URLs do googlevideo trazem os parâmetros no caminho (/expire/123/)
+            parts = parsed.path.split('/')
+            if 'expire' in parts:
+                expire = [parts[parts.index('expire') + 1]]
+        if expire:
+            return float(expire[0]) - STREAM_EXPIRE_MARGIN
+    except (ValueError, IndexError):
+        pass
+    return now + default_ttl
+
+
+class TTLCache:
+    """Cache LRU com tempo de expiração por entrada"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: 'OrderedDict[str, Tuple[float, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Obtém um valor; retorna None se ausente ou expirado"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= time.time():
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any, expires_at: Optional[float] = None):
+        """Guarda um valor, removendo os menos usados se o cache estiver cheio"""
+        with self._lock:
+            self._data[key] = (expires_at or time.time() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: str) -> Optional[Any]:
+        """Remove uma entrada"""
+        with self._lock:
+            entry = self._data.pop(key, None)
+            return entry[1] if entry else None
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def dump(self) -> Dict[str, Tuple[float, Any]]:
+        """Retorna as entradas válidas para persistência"""
+        now = time.time()
+        with self._lock:
+            return {key: entry for key, entry in self._data.items() if entry[0] > now}
+
+    def load(self, entries: Dict[str, Any]):
+        """Carrega entradas persistidas, ignorando as expiradas"""
+        now = time.time()
+        for key, (expires_at, value) in entries.items():
+            if expires_at > now:
+                self.set(key, value, expires_at)
+
+    def stats(self) -> Dict[str, Any]:
+        return {'size': len(self), 'hits': self.hits, 'misses': self.misses}
+
+
+class SongCache:
+    """Cache de dois níveis: metadados (LRU/TTL) e URLs de stream (expiração da URL assinada)"""
+
+    def __init__(self, path: Optional[str] = SONG_CACHE_PATH):
+        self.path = path
+        self.metadata = TTLCache(METADATA_CACHE_SIZE, METADATA_CACHE_TTL)
+        self.streams = TTLCache(STREAM_CACHE_SIZE, STREAM_CACHE_TTL)
+        # Termos de busca já resolvidos -> chave canônica
+        self.aliases = TTLCache(METADATA_CACHE_SIZE, METADATA_CACHE_TTL)
+        if path:
+            self.load()
+
+    def key_for(self, query: str) -> Optional[str]:
+        """Descobre a chave canônica de uma URL ou de um termo já buscado"""
+        key = canonical_id(query)
+        if key:
+            return key
+        return self.aliases.get(normalize_query(query))
+
+    def get_metadata(self, query: str) -> Optional[Dict[str, Any]]:
+        key = self.key_for(query)
+        if key is None:
+            self.metadata.misses += 1
+            return None
+        return self.metadata.get(key)
+
+    def get_stream(self, query: str) -> Optional[str]:
+        key = self.key_for(query)
+        if key is None:
+            self.streams.misses += 1
+            return None
+        return self.streams.get(key)
+
+    def store(self, info: Dict[str, Any], query: Optional[str] = None) -> Optional[str]:
+        """Guarda os metadados e, se presente, a URL de stream de um resultado"""
+        key = info_key(info)
+        if key is None:
+            return None
+        self.metadata.set(key, {name: info.get(name) for name in METADATA_FIELDS})
+        if info.get('url') and info.get('format_id'):
+            self.streams.set(key, info['url'], stream_expiry(info['url']))
+        if query and canonical_id(query) is None:
+            self.aliases.set(normalize_query(query), key)
+        return key
+
+    def invalidate_stream(self, query: str):
+        """Descarta a URL de stream (ex.: quando o FFmpeg não consegue abri-la)"""
+        key = self.key_for(query)
+        if key:
+            self.streams.pop(key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'metadata': self.metadata.stats(),
+            'streams': self.streams.stats(),
+            'aliases': len(self.aliases),
+        }
+
+    def load(self):
+        """Carrega o cache do disco"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.metadata.load(data.get('metadata', {}))
+            self.streams.load(data.get('streams', {}))
+            self.aliases.load(data.get('aliases', {}))
+        except (OSError, ValueError) as e:
+            print(f'Não consegui carregar o cache de músicas: {e}')
+
+    def save(self):
+        """Salva o cache no disco"""
+        if not self.path:
+            return
+        data = {
+            'metadata': self.metadata.dump(),
+            'streams': self.streams.dump(),
+            'aliases': self.aliases.dump(),
+        }
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f'Não consegui salvar o cache de músicas: {e}')
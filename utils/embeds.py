@@ -4,12 +4,28 @@ Utilitários para criar embeds do Discord
 import discord
 from typing import List, Optional
 from utils.music_manager import Song, GuildMusicManager
+from utils.filters import FilterChain
 
 class MusicEmbeds:
     """Classe para criar embeds relacionados à música"""
     
     @staticmethod
-    def now_playing(song: Song, position: int = 0, duration: int = None) -> discord.Embed:
+    def format_time(seconds: float) -> str:
+        """Formata segundos como m:ss (ou h:mm:ss)"""
+        seconds = int(seconds)
+        hours, rest = divmod(seconds, 3600)
+        if hours:
+            return f"{hours}:{rest // 60:02d}:{rest % 60:02d}"
+        return f"{rest // 60}:{rest % 60:02d}"
+    
+    @staticmethod
+    def progress_bar(position: float, duration: float, width: int = 18) -> str:
+        """Barra de progresso em texto: ▬▬▬🔘▬▬▬▬"""
+        filled = min(int(position / duration * width), width - 1) if duration else 0
+        return "▬" * filled + "🔘" + "▬" * (width - filled - 1)
+    
+    @staticmethod
+    def now_playing(song: Song, position: float = 0, duration: int = None) -> discord.Embed:
         """Cria embed para música atual"""
         embed = discord.Embed(
             title="🎵 Tocando Agora",
@@ -20,23 +36,61 @@ class MusicEmbeds:
         if song.thumbnail:
             embed.set_thumbnail(url=song.thumbnail)
             
-        if song.requester:
+        if song.requester_id:
             embed.add_field(
                 name="Solicitado por",
-                value=song.requester.mention,
+                value=song.requester_mention,
                 inline=True
             )
-            
+        
+        duration = duration or song.duration
         if duration:
             embed.add_field(
                 name="Duração",
-                value=f"{duration // 60}:{duration % 60:02d}",
+                value=MusicEmbeds.format_time(duration),
                 inline=True
             )
+            embed.add_field(
+                name="Progresso",
+                value=f"{MusicEmbeds.progress_bar(position, duration)} "
+                      f"`{MusicEmbeds.format_time(position)} / {MusicEmbeds.format_time(duration)}`",
+                inline=False
+            )
             
         embed.set_footer(text="Use os botões abaixo para controlar a reprodução")
         return embed
     
+    @staticmethod
+    def status_panel(manager: GuildMusicManager, upcoming: int = 3) -> discord.Embed:
+        """Cria o embed do painel de status: música atual, próximas, estado e últimas ações"""
+        if manager.current_song:
+            embed = MusicEmbeds.now_playing(manager.current_song, manager.position)
+        else:
+            embed = discord.Embed(
+                title="⏹️ Nada Tocando",
+                description="Use `!play` para adicionar músicas",
+                color=discord.Color.dark_grey()
+            )
+        
+        if manager.queue:
+            lines = [f"`{i}.` {song.title}" for i, song in enumerate(manager.queue[:upcoming], 1)]
+            if len(manager.queue) > upcoming:
+                lines.append(f"... e mais {len(manager.queue) - upcoming}")
+            embed.add_field(name="⏭️ Próximas", value="\n".join(lines), inline=False)
+        
+        state = [f"🔊 {int(manager.volume * 100)}%"]
+        if manager.is_paused:
+            state.append("⏸️ Pausado")
+        if manager.is_looping:
+            state.append("🔁 Loop")
+        if manager.filters:
+            state.append("🎛️ " + ", ".join(name for name, _ in manager.filters.describe()))
+        embed.add_field(name="Estado", value=" · ".join(state), inline=False)
+        
+        if manager.activity:
+            embed.add_field(name="📝 Atividade", value="\n".join(manager.activity), inline=False)
+        return embed
+    
     @staticmethod
     def queue_display(manager: GuildMusicManager, page: int = 0, per_page: int = 10) -> discord.Embed:
         """Cria embed para exibir a fila"""
@@ -60,14 +114,13 @@ class MusicEmbeds:
             )
         else:
             start = page * per_page
-            end = start + per_page
-            queue_slice = manager.queue[start:end]
+            queue_slice = manager.queue.page(page, per_page)
             
             queue_text = ""
             for i, song in enumerate(queue_slice, start + 1):
                 queue_text += f"`{i}.` **{song.title}**\n"
-                if song.requester:
-                    queue_text += f"    Solicitado por {song.requester.mention}\n"
+                if song.requester_id:
+                    queue_text += f"    Solicitado por {song.requester_mention}\n"
             
             embed.add_field(
                 name=f"Próximas ({len(manager.queue)} na fila)",
@@ -98,15 +151,60 @@ class MusicEmbeds:
             inline=True
         )
         
-        if song.requester:
+        if song.requester_id:
             embed.add_field(
                 name="Solicitado por",
-                value=song.requester.mention,
+                value=song.requester_mention,
                 inline=True
             )
             
         return embed
     
+    @staticmethod
+    def playlist_progress(title: str, added: int, total: Optional[int] = None,
+                          done: bool = False, queue_full: bool = False) -> discord.Embed:
+        """Cria embed com o progresso da importação de uma playlist"""
+        if done:
+            header = "✅ Playlist Importada"
+            color = discord.Color.green()
+        else:
+            header = "📥 Importando Playlist..."
+            color = discord.Color.yellow()
+        
+        embed = discord.Embed(
+            title=header,
+            description=f"**{title}**",
+            color=color
+        )
+        
+        progress = f"{added}/{total}" if total else f"{added}"
+        embed.add_field(
+            name="Músicas adicionadas",
+            value=progress,
+            inline=True
+        )
+        
+        if queue_full:
+            embed.set_footer(text="A fila atingiu o limite máximo; o restante da playlist foi ignorado")
+        return embed
+    
+    @staticmethod
+    def filters_display(filters: FilterChain) -> discord.Embed:
+        """Cria embed com os filtros de áudio ativos"""
+        embed = discord.Embed(
+            title="🎛️ Filtros de Áudio",
+            color=discord.Color.purple()
+        )
+        
+        active = filters.describe()
+        if not active:
+            embed.description = "Nenhum filtro ativo"
+        for name, value in active:
+            embed.add_field(name=name, value=value, inline=True)
+            
+        embed.set_footer(text="Filtros: bassboost, nightcore, speed, pitch, eq, clear")
+        return embed
+    
     @staticmethod
     def error_embed(title: str, description: str) -> discord.Embed:
         """Cria embed de erro"""
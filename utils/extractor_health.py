@@ -0,0 +1,200 @@
+"""
+Saúde do extrator: ritmo adaptativo das extrações e disjuntor para bloqueios do YouTube
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Deque, Dict
+
+from utils import metrics
+from config import (EXTRACTOR_RATE, EXTRACTOR_BURST, EXTRACTOR_MIN_RATE, EXTRACTOR_MAX_WAIT,
+                    BREAKER_THRESHOLD, BREAKER_WINDOW, BREAKER_COOLDOWN, BREAKER_MAX_COOLDOWN)
+
+# Trechos das mensagens do yt-dlp que indicam bloqueio ou limitação (não um problema do vídeo)
+THROTTLE_MARKERS = (
+    'http error 429', 'too many requests', 'rate-limit', 'rate limit',
+    'sign in to confirm', 'http error 403', 'signature', 'nsig',
+)
+
+
+class ExtractorUnavailable(Exception):
+    """As extrações estão pausadas (disjuntor aberto) ou o limite de ritmo não tem vaga próxima"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def is_upstream_failure(error: BaseException) -> bool:
+    """A falha vem do YouTube (bloqueio, limitação, lentidão) e não do vídeo pedido"""
+    if isinstance(error, TimeoutError):
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in THROTTLE_MARKERS)
+
+
+class TokenBucket:
+    """Limite de ritmo com reserva: cada pedido reserva uma ficha e espera a sua vez
+
+    As fichas podem ficar negativas (vagas já reservadas), então a espera de
+    cada pedido é calculada na hora, sem fila nem task extra.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """Reserva uma ficha e retorna quantos segundos esperar por ela"""
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens -= 1
+        return max(-self.tokens / self.rate, 0.0)
+
+    def refund(self):
+        self.tokens += 1
+
+    def set_rate(self, rate: float):
+        self._refill(time.monotonic())
+        self.rate = rate
+
+
+class ExtractorHealth:
+    """Controla as extrações que saem para o YouTube
+
+    - Ritmo: um `TokenBucket` limita as extrações por segundo. Cada bloqueio
+      corta o ritmo pela metade (até `min_rate`); cada sucesso devolve um
+      pouco, até o ritmo configurado.
+    - Disjuntor: `threshold` falhas do YouTube dentro de `window` segundos
+      abrem o disjuntor, e toda extração falha na hora com
+      `ExtractorUnavailable` durante `cooldown` segundos. Depois uma única
+      extração de teste é liberada: se der certo o disjuntor fecha, senão
+      reabre com o dobro da pausa (até `max_cooldown`).
+
+    Falhas do próprio vídeo (removido, privado) não contam.
+    """
+
+    CLOSED, HALF_OPEN, OPEN = 'fechado', 'teste', 'aberto'
+
+    def __init__(self, rate: float = EXTRACTOR_RATE, burst: int = EXTRACTOR_BURST,
+                 min_rate: float = EXTRACTOR_MIN_RATE, max_wait: float = EXTRACTOR_MAX_WAIT,
+                 threshold: int = BREAKER_THRESHOLD, window: float = BREAKER_WINDOW,
+                 cooldown: float = BREAKER_COOLDOWN, max_cooldown: float = BREAKER_MAX_COOLDOWN):
+        self.max_rate = rate
+        self.min_rate = min_rate
+        self.max_wait = max_wait
+        self.bucket = TokenBucket(rate, burst)
+        self.threshold = threshold
+        self.window = window
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self._recent_failures: Deque[float] = deque()
+        self._open_until = 0.0
+        self._trips = 0
+        self._probing = False
+
+        # Métricas
+        self.opened = 0
+        self.rejected = 0
+        self.throttled = 0
+        self.waited = 0.0
+        metrics.EXTRACTOR_RATE.set_function(lambda: self.bucket.rate)
+        metrics.EXTRACTOR_BREAKER_OPEN.set_function(lambda: 0 if self.state == self.CLOSED else 1)
+
+    @property
+    def state(self) -> str:
+        if self._trips == 0:
+            return self.CLOSED
+        if self._probing or time.monotonic() >= self._open_until:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def _reject(self, reason: str, message: str, retry_after: float):
+        self.rejected += 1
+        metrics.EXTRACTOR_REJECTED.labels(reason).inc()
+        raise ExtractorUnavailable(message, retry_after)
+
+    async def admit(self) -> bool:
+        """Espera a vez de uma extração; falha com `ExtractorUnavailable` se elas estiverem pausadas
+
+        Retorna True se esta extração é o teste do disjuntor. O valor deve ser
+        repassado a `record_success`/`record_failure`, para que só o resultado
+        do teste decida se o disjuntor fecha ou reabre.
+        """
+        if self._trips:
+            remaining = self._open_until - time.monotonic()
+            if remaining > 0:
+                self._reject('open', "O YouTube está limitando o bot; as buscas voltam em instantes", remaining)
+            if self._probing:
+                self._reject('probing', "O YouTube está limitando o bot; testando se já liberou", 1.0)
+            # Libera uma única extração de teste, sem esperar o limite de ritmo
+            self._probing = True
+            return True
+
+        delay = self.bucket.reserve()
+        if delay > self.max_wait:
+            self.bucket.refund()
+            self._reject('rate', "Muitas buscas no momento, tente novamente em instantes", delay)
+        if delay:
+            self.waited += delay
+            await asyncio.sleep(delay)
+        return False
+
+    def record_success(self, probe: bool = False):
+        if self._trips and not probe:
+            return  # Liberada antes do disjuntor abrir: não diz se o YouTube já liberou
+        if self._trips:
+            print(f'✅ Extrator recuperado, disjuntor fechado após {self._trips} abertura(s)')
+        self._trips = 0
+        self._probing = False
+        # Aumento aditivo: +10% do ritmo máximo por sucesso
+        if self.bucket.rate < self.max_rate:
+            self.bucket.set_rate(min(self.max_rate, self.bucket.rate + self.max_rate / 10))
+
+    def record_failure(self, error: BaseException, probe: bool = False):
+        """Registra o fim sem sucesso de uma extração liberada por `admit`"""
+        if probe:
+            self._probing = False
+        if not is_upstream_failure(error):
+            # Um teste que falhou por outro motivo não diz nada sobre o YouTube: o próximo pedido testa
+            return
+
+        self.throttled += 1
+        # Redução multiplicativa do ritmo
+        self.bucket.set_rate(max(self.min_rate, self.bucket.rate / 2))
+
+        now = time.monotonic()
+        self._recent_failures.append(now)
+        while self._recent_failures and self._recent_failures[0] < now - self.window:
+            self._recent_failures.popleft()
+        if probe or (not self._trips and len(self._recent_failures) >= self.threshold):
+            self._trip(now, error)
+
+    def _trip(self, now: float, error: BaseException):
+        self._trips += 1
+        self.opened += 1
+        cooldown = min(self.cooldown * 2 ** (self._trips - 1), self.max_cooldown)
+        self._open_until = now + cooldown
+        self._recent_failures.clear()
+        print(f'⛔ Disjuntor do extrator aberto por {cooldown:.0f}s: {error}')
+
+    def retry_after(self) -> float:
+        """Segundos até as extrações serem liberadas de novo (0 se já estão)"""
+        return max(self._open_until - time.monotonic(), 0.0)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'state': self.state,
+            'rate': self.bucket.rate,
+            'retry_after': self.retry_after(),
+            'opened': self.opened,
+            'rejected': self.rejected,
+            'throttled': self.throttled,
+            'waited': self.waited,
+        }
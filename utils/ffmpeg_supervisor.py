@@ -0,0 +1,371 @@
+"""
+Supervisor dos processos do FFmpeg: limite de processos, fila de admissão, travadas e CPU/memória
+"""
+import asyncio
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+import discord
+
+from utils import metrics
+from config import (FFMPEG_MAX_PROCESSES, FFMPEG_ADMISSION_TIMEOUT, FFMPEG_STALL_TIMEOUT, FFMPEG_SAMPLE_INTERVAL)
+
+try:
+    _CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+    _PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):  # Sem /proc (Windows, macOS)
+    _CLOCK_TICKS = _PAGE_SIZE = None
+
+
+class FFmpegBusy(Exception):
+    """Nenhum FFmpeg ficou livre dentro do tempo de espera da fila de admissão"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class FFmpegProcess:
+    """Registro de um FFmpeg em execução (não guarda a fonte, para ela poder ser coletada)"""
+
+    def __init__(self, guild_id: int, process, restarts: int = 0,
+                 on_stall: Optional[Callable[['FFmpegProcess'], None]] = None):
+        self.guild_id = guild_id
+        self.process = process
+        self.pid: Optional[int] = getattr(process, 'pid', None)
+        self.restarts = restarts
+        self.on_stall = on_stall
+        self.started_at = time.monotonic()
+        self.bytes_read = 0
+        self.last_data: Optional[float] = None
+        # Momento em que a leitura em andamento começou (None entre leituras)
+        self.reading_since: Optional[float] = None
+        self.stalled = False
+        self.released = False
+        # CPU (em % de um núcleo) e memória residente, coletadas de /proc
+        self.cpu_percent = 0.0
+        self.rss = 0
+        self._cpu_time: Optional[float] = None
+        self._sampled_at: Optional[float] = None
+
+    def sample(self, now: float):
+        """Atualiza CPU e memória a partir de /proc/<pid> (Linux)"""
+        if self.pid is None or _CLOCK_TICKS is None:
+            return
+        try:
+            with open(f'/proc/{self.pid}/stat') as f:
+                # O nome do comando pode ter espaços; os campos seguintes vêm depois do ")"
+                fields = f.read().rpartition(')')[2].split()
+            with open(f'/proc/{self.pid}/statm') as f:
+                self.rss = int(f.read().split()[1]) * _PAGE_SIZE
+        except (OSError, IndexError, ValueError):
+            return
+        cpu_time = (int(fields[11]) + int(fields[12])) / _CLOCK_TICKS  # utime + stime
+        if self._cpu_time is not None and now > self._sampled_at:
+            self.cpu_percent = (cpu_time - self._cpu_time) / (now - self._sampled_at) * 100
+        self._cpu_time = cpu_time
+        self._sampled_at = now
+
+    def kill(self):
+        """Encerra o processo e o coleta (sem deixar zumbi)"""
+        process = self.process
+        if process is None:
+            return
+        try:
+            if process.poll() is None:
+                process.kill()
+                process.wait(timeout=5)
+        except Exception as e:
+            print(f'Erro ao encerrar o FFmpeg {self.pid}: {e}')
+
+
+class SupervisedSource(discord.AudioSource):
+    """Fonte do FFmpeg registrada no supervisor: conta os bytes lidos e libera a vaga no `cleanup`"""
+
+    def __init__(self, original: discord.AudioSource, supervisor: 'FFmpegSupervisor', record: FFmpegProcess):
+        self.original = original
+        self.supervisor = supervisor
+        self.record = record
+        self.closed = False
+        # Fonte descartada sem `cleanup` (ex.: corrida entre o fim da música e uma troca): mata e coleta o FFmpeg
+        self._finalizer = weakref.finalize(self, supervisor.release, record, True)
+
+    def read(self) -> bytes:
+        record = self.record
+        record.reading_since = time.monotonic()
+        try:
+            data = self.original.read()
+        except (AttributeError, ValueError):
+            # `cleanup` em outra thread fechou o pipe no meio da leitura
+            if self.closed:
+                return b''
+            raise
+        finally:
+            record.reading_since = None
+        if data:
+            record.bytes_read += len(data)
+            record.last_data = time.monotonic()
+        return data
+
+    def is_opus(self) -> bool:
+        return self.original.is_opus()
+
+    def cleanup(self):
+        self.closed = True
+        self.original.cleanup()
+        self._finalizer()
+
+
+class FFmpegSupervisor:
+    """Acompanha todos os FFmpeg do processo do bot
+
+    - Limite: no máximo `max_processes` FFmpeg ao mesmo tempo (0 = sem
+      limite). Quem precisa de um novo espera em fila (ordem de chegada) por
+      até `admission_timeout` segundos e recebe `FFmpegBusy` se nenhum ficar
+      livre. Reinícios da mesma música não esperam: o novo FFmpeg herda a
+      vaga do processo que substitui.
+    - Travadas: uma leitura parada há mais de `stall_timeout` segundos (o
+      FFmpeg não entrega áudio, ex.: a conexão com o YouTube congelou) chama
+      o `on_stall` da fonte, que reinicia o FFmpeg na posição atual.
+    - Zumbis: processos que terminaram sozinhos são coletados e liberam a
+      vaga; fontes descartadas sem `cleanup` têm o FFmpeg encerrado.
+    - CPU e memória de cada processo vêm de /proc a cada `sample_interval`.
+    """
+
+    _default: Optional['FFmpegSupervisor'] = None
+
+    @classmethod
+    def default(cls) -> 'FFmpegSupervisor':
+        """Retorna o supervisor compartilhado do processo"""
+        if cls._default is None:
+            cls._default = cls()
+        return cls._default
+
+    def __init__(self, max_processes: int = FFMPEG_MAX_PROCESSES, admission_timeout: float = FFMPEG_ADMISSION_TIMEOUT,
+                 stall_timeout: float = FFMPEG_STALL_TIMEOUT, sample_interval: float = FFMPEG_SAMPLE_INTERVAL):
+        self.max_processes = max_processes
+        self.admission_timeout = admission_timeout
+        self.stall_timeout = stall_timeout
+        self.sample_interval = sample_interval
+        # Vagas ocupadas: processos vivos mais admissões que ainda não iniciaram o FFmpeg
+        self.active = 0
+        self.processes: Dict[int, FFmpegProcess] = {}
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lock = threading.Lock()
+
+        # Métricas
+        self.spawned = 0
+        self.rejected = 0
+        self.stalls = 0
+        self.reaped = 0
+        self.total_wait = 0.0
+        metrics.FFMPEG_PROCESSES.set_function(lambda: len(self.processes))
+        metrics.FFMPEG_WAITING.set_function(lambda: len(self._waiters))
+        metrics.FFMPEG_CPU.set_function(lambda: {(str(r.pid), str(r.guild_id)): r.cpu_percent
+                                                 for r in list(self.processes.values())})
+        metrics.FFMPEG_RSS.set_function(lambda: {(str(r.pid), str(r.guild_id)): r.rss
+                                                 for r in list(self.processes.values())})
+
+    def _ensure_started(self):
+        if self._task is None:
+            self._loop = asyncio.get_running_loop()
+            self._thread_id = threading.get_ident()
+            self._task = self._loop.create_task(self._monitor())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        for waiter in self._waiters:
+            waiter.cancel()
+        self._waiters.clear()
+
+    # --- Admissão ---
+
+    def _has_room(self) -> bool:
+        return not self.max_processes or self.active < self.max_processes
+
+    async def admit(self):
+        """Reserva a vaga de um novo FFmpeg, esperando na fila se o limite foi atingido"""
+        self._ensure_started()
+        if self._has_room() and not self._waiters:
+            self.active += 1
+            return
+        waiter = self._loop.create_future()
+        self._waiters.append(waiter)
+        start = time.monotonic()
+        granted = False
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.admission_timeout)
+            granted = True
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            metrics.FFMPEG_REJECTED.inc()
+            raise FFmpegBusy("Muitas músicas tocando neste momento; a sua começa assim que houver vaga",
+                             self.admission_timeout)
+        finally:
+            self.total_wait += time.monotonic() - start
+            if not granted:
+                if waiter.done() and not waiter.cancelled():
+                    # A vaga chegou junto com o cancelamento: passa adiante
+                    self._free_slot()
+                else:
+                    waiter.cancel()
+                    self._waiters.remove(waiter)
+
+    def try_admit(self) -> bool:
+        """Reserva uma vaga só se houver uma livre agora (FFmpeg aquecido, crossfade)"""
+        if self._has_room() and not self._waiters:
+            self._ensure_started()
+            self.active += 1
+            return True
+        return False
+
+    def cancel_admission(self):
+        """Devolve uma vaga reservada que não chegou a iniciar o FFmpeg"""
+        self._free_slot()
+
+    def _free_slot(self):
+        """Libera uma vaga e a passa para o próximo da fila (roda no event loop)"""
+        self.active -= 1
+        while self._waiters and self._has_room():
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.active += 1
+                waiter.set_result(None)
+
+    # --- Processos ---
+
+    def spawn(self, guild_id: int, factory: Callable[[], discord.AudioSource], admitted: bool = False,
+              restarts: int = 0, on_stall: Optional[Callable[[FFmpegProcess], None]] = None,
+              replaces: Optional[FFmpegProcess] = None) -> SupervisedSource:
+        """Inicia o FFmpeg com `factory()` e o registra
+
+        Com `admitted`, usa a vaga reservada por `admit`/`try_admit`. Com
+        `replaces` (reinício da música atual), herda a vaga desse processo,
+        que deve ser encerrado pelo chamador. Sem vaga para usar, só inicia
+        se houver uma livre; senão falha com `FFmpegBusy`.
+        """
+        inherited = None
+        if not admitted:
+            if replaces is not None and self._take_slot(replaces):
+                inherited = replaces
+            elif self._has_room():
+                self.active += 1
+            else:
+                raise FFmpegBusy("Muitas músicas tocando neste momento", self.admission_timeout)
+        try:
+            source = factory()
+        except BaseException:
+            if inherited is not None:
+                self._return_slot(inherited)
+            else:
+                self._free_slot()
+            raise
+        record = FFmpegProcess(guild_id, getattr(source, '_process', None), restarts, on_stall)
+        self.spawned += 1
+        self.processes[id(record)] = record
+        return SupervisedSource(source, self, record)
+
+    def _take_slot(self, record: FFmpegProcess) -> bool:
+        """Tira a vaga de um processo ainda vivo para passá-la a outro; o processo deixa de ser vigiado"""
+        with self._lock:
+            if record.released:
+                return False
+            record.released = True
+        self.processes.pop(id(record), None)
+        return True
+
+    def _return_slot(self, record: FFmpegProcess):
+        """Devolve a vaga tirada por `_take_slot` (o novo FFmpeg não iniciou)"""
+        with self._lock:
+            record.released = False
+        self.processes[id(record)] = record
+
+    def release(self, record: FFmpegProcess, kill: bool = False):
+        """Libera a vaga do processo (uma única vez, de qualquer thread)"""
+        with self._lock:
+            if record.released:
+                return
+            record.released = True
+        if kill:
+            record.kill()
+        self.processes.pop(id(record), None)
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            self.active -= 1
+        elif threading.get_ident() == self._thread_id:
+            self._free_slot()
+        else:
+            loop.call_soon_threadsafe(self._free_slot)
+
+    # --- Vigia ---
+
+    async def _monitor(self):
+        tick = min(1.0, self.stall_timeout / 4)
+        last_sample = 0.0
+        while True:
+            await asyncio.sleep(tick)
+            now = time.monotonic()
+            sample = now - last_sample >= self.sample_interval
+            if sample:
+                last_sample = now
+            for record in list(self.processes.values()):
+                process = record.process
+                if process is not None and process.poll() is not None:
+                    # Terminou sozinho (fim do arquivo ou erro): o `poll` já coletou o processo
+                    self.reaped += 1
+                    self.release(record)
+                    continue
+                if sample:
+                    record.sample(now)
+                reading_since = record.reading_since
+                if reading_since is not None and now - reading_since >= self.stall_timeout:
+                    if not record.stalled:
+                        record.stalled = True
+                        self._stalled(record, now - reading_since)
+                else:
+                    record.stalled = False
+
+    def _stalled(self, record: FFmpegProcess, waited: float):
+        self.stalls += 1
+        metrics.FFMPEG_STALLS.inc()
+        print(f'🧊 FFmpeg {record.pid} (servidor {record.guild_id}) sem áudio há {waited:.0f}s')
+        if record.on_stall:
+            try:
+                record.on_stall(record)
+            except Exception as e:
+                print(f'Erro ao reiniciar o FFmpeg travado: {e}')
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        processes: List[Dict[str, Any]] = [
+            {
+                'pid': record.pid,
+                'guild_id': record.guild_id,
+                'age': now - record.started_at,
+                'bytes': record.bytes_read,
+                'cpu': record.cpu_percent,
+                'rss': record.rss,
+                'restarts': record.restarts,
+                'stalled': record.stalled,
+            }
+            for record in list(self.processes.values())
+        ]
+        return {
+            'active': self.active,
+            'max': self.max_processes,
+            'waiting': len(self._waiters),
+            'spawned': self.spawned,
+            'rejected': self.rejected,
+            'stalls': self.stalls,
+            'reaped': self.reaped,
+            'processes': processes,
+        }
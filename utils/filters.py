@@ -0,0 +1,151 @@
+"""
+Filtros de áudio (bass boost, nightcore, velocidade, tom e equalizador) compilados para o FFmpeg
+"""
+from typing import Dict, List, Optional, Tuple, Union
+
+SAMPLE_RATE = 48000
+
+# Bandas do equalizador (Hz), ajustadas com `!filter eq <banda> <ganho>`
+EQ_BANDS = (60, 230, 910, 3600, 14000)
+
+# Ordem em que os filtros entram no grafo
+FILTER_ORDER = ('bassboost', 'eq', 'pitch', 'nightcore', 'speed')
+
+FilterValue = Union[bool, float, Dict[int, float]]
+
+
+class FilterError(ValueError):
+    """Filtro ou valor inválido"""
+
+
+def _atempo(factor: float) -> List[str]:
+    """O `atempo` aceita de 0.5 a 2.0; fatores maiores são divididos em etapas"""
+    steps = []
+    while factor > 2.0:
+        steps.append('atempo=2.0')
+        factor /= 2.0
+    while factor < 0.5:
+        steps.append('atempo=0.5')
+        factor /= 0.5
+    steps.append(f'atempo={factor:.4f}')
+    return steps
+
+
+class FilterChain:
+    """Conjunto de filtros ativos de um servidor
+
+    `compile` gera um único grafo para o `-af` do FFmpeg e `speed` informa
+    quanto a música anda por segundo de áudio (para o relógio de posição).
+    """
+
+    def __init__(self):
+        self.active: Dict[str, FilterValue] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self.active)
+
+    def set(self, name: str, value: Optional[str] = None):
+        """Liga, ajusta ou desliga um filtro a partir dos argumentos do comando"""
+        name = name.lower()
+        if name == 'bassboost':
+            gain = float(value) if value else 10.0
+            self._toggle(name, gain, not 0 < gain <= 20, "O ganho do bass boost deve estar entre 0 e 20 dB")
+        elif name == 'nightcore':
+            self._toggle(name, True, False, '')
+        elif name == 'speed':
+            speed = float(value) if value else 1.0
+            if not 0.25 <= speed <= 4.0:
+                raise FilterError("A velocidade deve estar entre 0.25 e 4")
+            self._update(name, speed, speed == 1.0)
+        elif name == 'pitch':
+            semitones = float(value) if value else 0.0
+            if not -12 <= semitones <= 12:
+                raise FilterError("O tom deve estar entre -12 e 12 semitons")
+            self._update(name, semitones, semitones == 0)
+        elif name == 'eq':
+            self._set_eq(value)
+        else:
+            raise FilterError(f"Filtro desconhecido: {name}")
+
+    def _toggle(self, name: str, value: FilterValue, invalid: bool, message: str):
+        if invalid:
+            raise FilterError(message)
+        self._update(name, value, self.active.get(name) == value)
+
+    def _update(self, name: str, value: FilterValue, remove: bool):
+        if remove:
+            self.active.pop(name, None)
+        else:
+            self.active[name] = value
+
+    def _set_eq(self, value: Optional[str]):
+        try:
+            band, gain = (value or '').split()
+            band, gain = int(band), float(gain)
+        except ValueError:
+            raise FilterError(f"Use `!filter eq <banda> <ganho>` com banda em {', '.join(map(str, EQ_BANDS))}")
+        if band not in EQ_BANDS:
+            raise FilterError(f"Bandas disponíveis: {', '.join(map(str, EQ_BANDS))}")
+        if not -20 <= gain <= 20:
+            raise FilterError("O ganho do equalizador deve estar entre -20 e 20 dB")
+        bands = dict(self.active.get('eq', {}))
+        if gain:
+            bands[band] = gain
+        else:
+            bands.pop(band, None)
+        self._update('eq', bands, not bands)
+
+    def clear(self):
+        self.active.clear()
+
+    @property
+    def speed(self) -> float:
+        """Segundos da música tocados por segundo de áudio"""
+        speed = self.active.get('speed', 1.0)
+        if 'nightcore' in self.active:
+            speed *= 1.25
+        return speed
+
+    def compile(self) -> str:
+        """Gera o grafo de filtros (vazio se nenhum estiver ativo)"""
+        graph: List[str] = []
+        for name in FILTER_ORDER:
+            value = self.active.get(name)
+            if value is None:
+                continue
+            if name == 'bassboost':
+                graph.append(f'bass=g={value:g}:f=110:w=0.6')
+            elif name == 'eq':
+                graph.extend(f'equalizer=f={band}:t=o:w=1:g={gain:g}' for band, gain in sorted(value.items()))
+            elif name == 'pitch':
+                # Muda o tom sem mudar a velocidade: reamostra e compensa com atempo
+                ratio = 2 ** (value / 12)
+                graph.append(f'asetrate={SAMPLE_RATE * ratio:.0f},aresample={SAMPLE_RATE}')
+                graph.extend(_atempo(1 / ratio))
+            elif name == 'nightcore':
+                graph.append(f'asetrate={SAMPLE_RATE * 1.25:.0f},aresample={SAMPLE_RATE}')
+            elif name == 'speed':
+                graph.extend(_atempo(value))
+        if graph:
+            # O `asetrate` supõe 48 kHz na entrada; streams em 44,1 kHz (m4a) sairiam com tom e velocidade errados
+            graph.insert(0, f'aresample={SAMPLE_RATE}')
+        return ','.join(graph)
+
+    def describe(self) -> List[Tuple[str, str]]:
+        """Filtros ativos em formato legível: [(nome, valor)]"""
+        result = []
+        for name in FILTER_ORDER:
+            value = self.active.get(name)
+            if value is None:
+                continue
+            if name == 'bassboost':
+                result.append(('Bass boost', f'+{value:g} dB'))
+            elif name == 'eq':
+                result.append(('Equalizador', ', '.join(f'{band} Hz {gain:+g} dB' for band, gain in sorted(value.items()))))
+            elif name == 'pitch':
+                result.append(('Tom', f'{value:+g} semitons'))
+            elif name == 'nightcore':
+                result.append(('Nightcore', 'ativado'))
+            elif name == 'speed':
+                result.append(('Velocidade', f'{value:g}x'))
+        return result
@@ -0,0 +1,263 @@
+"""
+Saúde do event loop: atraso, travadas com a pilha de quem bloqueou e perfil dos comandos lentos
+"""
+import asyncio
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from utils import metrics
+from config import (LOOP_LAG_INTERVAL, LOOP_STALL_THRESHOLD, LOOP_DEBUG, LOOP_MONITOR_LOG, SLOW_COMMAND_THRESHOLD,
+                    PROFILER_SAMPLE_INTERVAL, PROFILER_MAX_SAMPLES, PROFILE_DIR)
+
+Stack = Tuple[str, ...]
+
+
+def _stack_key(frame) -> Stack:
+    """Pilha de uma thread como tupla de "função (arquivo:linha)", da raiz para o topo"""
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    stack.reverse()
+    return tuple(stack)
+
+
+def _is_idle(frame) -> bool:
+    """O loop está parado no select, esperando I/O"""
+    return frame.f_code.co_name == 'select' and frame.f_code.co_filename.endswith('selectors.py')
+
+
+class _SinkHandler(logging.Handler):
+    """Encaminha os avisos do modo debug do asyncio ("Executing ... took 0.3 seconds") para o monitor"""
+
+    def __init__(self, monitor: 'LoopMonitor'):
+        super().__init__(logging.WARNING)
+        self.monitor = monitor
+
+    def emit(self, record: logging.LogRecord):
+        self.monitor.log('slow_callback', record.getMessage())
+
+
+class LoopMonitor:
+    """Mede a saúde do event loop do bot
+
+    - uma task mede o atraso do loop a cada `interval` segundos;
+    - uma thread de vigia manda "batidas" para o loop; se uma batida demorar
+      mais que `stall_threshold`, a pilha da thread do loop é capturada
+      enquanto ele ainda está travado (ou seja, a pilha de quem bloqueou);
+    - enquanto há comandos rodando, a mesma thread amostra a pilha do loop a
+      cada `sample_interval`. Um comando que passe de `slow_command` segundos
+      gera um perfil com as amostras da sua janela, no formato "folded"
+      (flamegraph.pl, speedscope). As amostras mostram tudo o que o loop
+      executou nesse tempo, não só o comando; sem amostras, o comando passou
+      o tempo esperando I/O.
+
+    Os eventos ficam em memória (comando `!lag`), vão para o stdout e, se
+    `log_path` estiver definido, para um arquivo com um JSON por linha. Os
+    arquivos (log e perfis) são gravados em uma thread própria, para que o
+    monitor não trave o loop que mede.
+    """
+
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL, stall_threshold: float = LOOP_STALL_THRESHOLD,
+                 slow_command: float = SLOW_COMMAND_THRESHOLD, sample_interval: float = PROFILER_SAMPLE_INTERVAL,
+                 log_path: Optional[str] = LOOP_MONITOR_LOG, profile_dir: Optional[str] = PROFILE_DIR,
+                 debug: bool = LOOP_DEBUG):
+        self.interval = interval
+        self.stall_threshold = stall_threshold
+        self.slow_command = slow_command
+        self.sample_interval = sample_interval
+        self.log_path = log_path
+        self.profile_dir = profile_dir
+        self.debug = debug
+        self.lags: Deque[float] = deque(maxlen=600)
+        self.max_lag = 0.0
+        self.events: Deque[Dict[str, Any]] = deque(maxlen=50)
+        self.stalls = 0
+        self.slow_commands = 0
+        # Amostras e comandos ativos são lidos pela thread de vigia e alterados no loop
+        self._samples_lock = threading.Lock()
+        self._samples: Deque[Tuple[float, Stack]] = deque(maxlen=PROFILER_MAX_SAMPLES)
+        self._active_commands = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._posted_at: Optional[float] = None
+        self._stall_stack: Optional[List[str]] = None
+        self._handler: Optional[_SinkHandler] = None
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='loop-monitor')
+
+    def start(self):
+        """Inicia a medição no loop atual (chamar de dentro dele)"""
+        self._loop = asyncio.get_running_loop()
+        self._thread_id = threading.get_ident()
+        if self.debug:
+            self._loop.set_debug(True)
+            self._loop.slow_callback_duration = self.stall_threshold
+            self._handler = _SinkHandler(self)
+            logging.getLogger('asyncio').addHandler(self._handler)
+        self._task = self._loop.create_task(self._sample_lag())
+        self._watchdog = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+        self._watchdog.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._task:
+            self._task.cancel()
+        if self._handler:
+            logging.getLogger('asyncio').removeHandler(self._handler)
+            self._handler = None
+        # As gravações já agendadas terminam na thread
+        self._writer.shutdown(wait=False)
+
+    # --- Atraso ---
+
+    async def _sample_lag(self):
+        loop = self._loop
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(loop.time() - start - self.interval, 0.0)
+            self.lags.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+            metrics.EVENT_LOOP_LAG.observe(lag)
+
+    # --- Vigia (roda em outra thread) ---
+
+    def _watch(self):
+        while True:
+            with self._samples_lock:
+                active = self._active_commands
+            tick = self.sample_interval if active else self.stall_threshold / 5
+            if self._stopped.wait(tick):
+                return
+            now = time.monotonic()
+            posted_at = self._posted_at
+            if posted_at is None:
+                self._stall_stack = None
+                self._posted_at = now
+                try:
+                    self._loop.call_soon_threadsafe(self._beat)
+                except RuntimeError:
+                    return  # loop fechado
+            elif self._stall_stack is None and now - posted_at >= self.stall_threshold:
+                frame = sys._current_frames().get(self._thread_id)
+                self._stall_stack = traceback.format_stack(frame) if frame is not None else []
+            if active:
+                frame = sys._current_frames().get(self._thread_id)
+                if frame is not None and not _is_idle(frame):
+                    stack = _stack_key(frame)
+                    with self._samples_lock:
+                        self._samples.append((now, stack))
+
+    def _beat(self):
+        """Roda no loop: mede quanto a batida esperou"""
+        delay = time.monotonic() - self._posted_at
+        stack = self._stall_stack
+        self._posted_at = None
+        if delay < self.stall_threshold:
+            return
+        self.stalls += 1
+        metrics.EVENT_LOOP_STALLS.inc()
+        self.log('stall', f"Event loop travado por {delay * 1000:.0f}ms", duration=round(delay, 3),
+                 stack=''.join(stack or []))
+
+    # --- Comandos (ganchos before_invoke/after_invoke do bot) ---
+
+    async def command_started(self, ctx):
+        ctx.loop_monitor_started_at = time.monotonic()
+        with self._samples_lock:
+            self._active_commands += 1
+
+    async def command_finished(self, ctx):
+        started = getattr(ctx, 'loop_monitor_started_at', None)
+        if started is None:
+            return
+        with self._samples_lock:
+            self._active_commands -= 1
+        duration = time.monotonic() - started
+        if duration < self.slow_command:
+            return
+        name = ctx.command.qualified_name if ctx.command else 'desconhecido'
+        self.slow_commands += 1
+        metrics.SLOW_COMMANDS.labels(name).inc()
+        with self._samples_lock:
+            # Cópia: a thread de vigia continua amostrando enquanto o perfil é montado
+            snapshot = list(self._samples)
+        samples = [stack for sampled_at, stack in snapshot if sampled_at >= started]
+        if not samples:
+            self.log('slow_command', f"!{name} levou {duration:.1f}s esperando I/O (loop livre)",
+                     command=name, duration=round(duration, 3))
+            return
+        path = self._dump_profile(name, samples)
+        top = Counter(stack[-1] for stack in samples).most_common(3)
+        self.log('slow_command',
+                 f"!{name} levou {duration:.1f}s; loop ocupado ~{len(samples) * self.sample_interval:.2f}s",
+                 command=name, duration=round(duration, 3), samples=len(samples), profile=path,
+                 top=[f"{frame} ×{count}" for frame, count in top])
+
+    def _dump_profile(self, name: str, samples: List[Stack]) -> Optional[str]:
+        """Agenda a gravação do perfil e retorna o caminho do arquivo"""
+        if not self.profile_dir:
+            return None
+        path = os.path.join(self.profile_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{name}.folded")
+        self._write(self._write_profile, path, samples)
+        return path
+
+    def _write_profile(self, path: str, samples: List[Stack]):
+        """Grava as amostras no formato "folded": uma pilha por linha, seguida da contagem"""
+        try:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                for stack, count in Counter(samples).most_common():
+                    f.write(f"{';'.join(stack)} {count}\n")
+        except OSError as e:
+            print(f'Erro ao salvar o perfil: {e}')
+
+    def _write(self, func, *args):
+        """Executa uma gravação em arquivo na thread do monitor"""
+        try:
+            self._writer.submit(func, *args)
+        except RuntimeError:
+            pass  # Monitor já parado
+
+    # --- Registro ---
+
+    def log(self, kind: str, message: str, **fields):
+        """Guarda o evento, imprime e, se configurado, grava no arquivo de log"""
+        event = {'time': time.time(), 'kind': kind, 'message': message, **fields}
+        self.events.append(event)
+        print(f"🐢 {message}")
+        if fields.get('stack'):
+            print(fields['stack'], end='')
+        if self.log_path:
+            self._write(self._append_log, json.dumps(event, ensure_ascii=False))
+
+    def _append_log(self, line: str):
+        try:
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+        except OSError as e:
+            print(f'Erro ao gravar o log do event loop: {e}')
+
+    def stats(self) -> Dict[str, Any]:
+        lags = sorted(self.lags)
+        return {
+            'lag': self.lags[-1] if self.lags else 0.0,
+            'p50': lags[len(lags) // 2] if lags else 0.0,
+            'p99': lags[min(len(lags) - 1, int(len(lags) * 0.99))] if lags else 0.0,
+            'max': self.max_lag,
+            'stalls': self.stalls,
+            'slow_commands': self.slow_commands,
+            'active_commands': self._active_commands,
+        }
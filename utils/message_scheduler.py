@@ -0,0 +1,130 @@
+"""
+Agendador de atualizações de mensagens: agrupa mudanças seguidas em uma única edição
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Hashable, Tuple
+
+import discord
+
+from utils import metrics
+from config import STATUS_DEBOUNCE, STATUS_RATE_LIMITS
+
+Update = Callable[[], Awaitable[None]]
+
+
+class RateLimitBucket:
+    """Balde de fichas: no máximo `capacity` requisições a cada `period` segundos"""
+
+    def __init__(self, capacity: int, period: float):
+        self.capacity = capacity
+        self.period = period
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.capacity / self.period)
+        self.updated_at = now
+
+    def delay(self) -> float:
+        """Segundos até haver uma ficha disponível"""
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) * self.period / self.capacity
+
+    async def acquire(self):
+        """Espera uma ficha e a consome"""
+        while True:
+            wait = self.delay()
+            if not wait:
+                self.tokens -= 1
+                return
+            await asyncio.sleep(wait)
+
+
+class MessageScheduler:
+    """Agenda atualizações de mensagens por canal, descartando as que ficaram obsoletas
+
+    `schedule(channel_id, update)` guarda só a atualização mais recente de
+    cada canal. Um worker por canal espera `debounce` segundos (agrupando as
+    mudanças que chegarem nesse meio tempo), respeita o balde da rota
+    (`edit` ou `send`, por canal, como os limites do Discord) e executa a
+    atualização. As atualizações devem montar o embed na hora em que rodam,
+    para sempre refletir o estado mais novo.
+    """
+
+    def __init__(self, debounce: float = STATUS_DEBOUNCE,
+                 rate_limits: Dict[str, Tuple[int, float]] = STATUS_RATE_LIMITS):
+        self.debounce = debounce
+        self.rate_limits = rate_limits
+        self._pending: Dict[int, Tuple[str, Update]] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+        self._buckets: Dict[Tuple[str, Hashable], RateLimitBucket] = {}
+        self.scheduled = 0
+        self.superseded = 0
+        self.sent = 0
+
+    def bucket(self, route: str, channel_id: Hashable) -> RateLimitBucket:
+        """Balde de uma rota em um canal"""
+        key = (route, channel_id)
+        if key not in self._buckets:
+            capacity, period = self.rate_limits[route]
+            self._buckets[key] = RateLimitBucket(capacity, period)
+        return self._buckets[key]
+
+    def schedule(self, channel_id: int, update: Update, route: str = 'edit'):
+        """Agenda uma atualização, substituindo a que ainda não foi enviada"""
+        self.scheduled += 1
+        if channel_id in self._pending:
+            self.superseded += 1
+            metrics.STATUS_UPDATES.labels('superseded').inc()
+        self._pending[channel_id] = (route, update)
+        if channel_id not in self._workers:
+            self._workers[channel_id] = asyncio.create_task(self._run(channel_id))
+
+    async def _run(self, channel_id: int):
+        try:
+            while channel_id in self._pending:
+                await asyncio.sleep(self.debounce)
+                pending = self._pending.get(channel_id)
+                if pending is None:
+                    break  # Cancelada durante o debounce
+                route, _ = pending
+                await self.bucket(route, channel_id).acquire()
+                # Pega a atualização mais recente, que pode ter chegado durante a espera
+                pending = self._pending.pop(channel_id, None)
+                if pending is None:
+                    continue
+                try:
+                    await pending[1]()
+                    self.sent += 1
+                    metrics.STATUS_UPDATES.labels('sent').inc()
+                except discord.HTTPException as e:
+                    print(f'Erro ao atualizar mensagem: {e}')
+                except Exception as e:
+                    # Um erro na montagem do painel não pode parar as atualizações do canal
+                    print(f'Erro inesperado ao atualizar mensagem: {e}')
+                    metrics.ERRORS.labels(type(e).__name__).inc()
+        finally:
+            self._workers.pop(channel_id, None)
+
+    def cancel(self, channel_id: int):
+        """Descarta a atualização pendente de um canal"""
+        self._pending.pop(channel_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'scheduled': self.scheduled,
+            'superseded': self.superseded,
+            'sent': self.sent,
+            'pending': len(self._pending),
+        }
+
+    def close(self):
+        """Cancela todos os workers"""
+        self._pending.clear()
+        for task in self._workers.values():
+            task.cancel()
+        self._workers.clear()
@@ -0,0 +1,283 @@
+"""
+Métricas no formato de texto do Prometheus, com um endpoint HTTP local
+"""
+import bisect
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from aiohttp import web
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Base das métricas: nome, descrição e valores por combinação de labels"""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 registry: Optional['Registry'] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+
+    def _key(self, labels: Iterable[str]) -> LabelValues:
+        key = tuple(str(label) for label in labels)
+        if len(key) != len(self.labelnames):
+            raise ValueError(f"{self.name} espera os labels {self.labelnames}")
+        return key
+
+    def labels(self, *values: str) -> '_Bound':
+        """Retorna a métrica presa a uma combinação de labels"""
+        return _Bound(self, tuple(values))
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(self.samples())
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    """Contador que só aumenta"""
+
+    kind = 'counter'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, *labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}' for key, value in items]
+
+
+class Gauge(Metric):
+    """Valor que sobe e desce; pode ser calculado na hora da coleta com `set_function`"""
+
+    kind = 'gauge'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+        self._function: Optional[Callable[[], object]] = None
+
+    def set(self, value: float, *labels: str):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, *labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, *labels: str):
+        self.inc(-amount, *labels)
+
+    def set_function(self, function: Callable[[], object]):
+        """Calcula o valor na coleta; a função retorna um número ou {labels: valor}"""
+        self._function = function
+
+    def samples(self) -> List[str]:
+        if self._function is not None:
+            try:
+                result = self._function()
+            except Exception:
+                return []
+            if isinstance(result, dict):
+                items = [(self._key(key if isinstance(key, tuple) else (key,)), value)
+                         for key, value in result.items()]
+            else:
+                items = [((), result)]
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}' for key, value in items]
+
+
+class Histogram(Metric):
+    """Distribuição de valores em faixas (buckets) cumulativas"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry: Optional['Registry'] = None):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> (contagem por bucket, soma, total)
+        self._values: Dict[LabelValues, Tuple[List[int], float, int]] = {}
+
+    def observe(self, value: float, *labels: str):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total, count = self._values.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            if index < len(counts):
+                counts[index] += 1
+            self._values[key] = (counts, total + value, count + 1)
+
+    def time(self, *labels: str) -> '_Timer':
+        """Context manager que mede a duração de um bloco"""
+        return _Timer(self, labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(counts), total, count) for key, (counts, total, count) in self._values.items()]
+        lines = []
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(float(bound))}"')
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f'{self.name}_bucket{labels} {count}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, key)} {count}')
+        return lines
+
+
+class _Bound:
+    """Métrica com os labels já definidos: `ERRORS.labels('ValueError').inc()`"""
+
+    def __init__(self, metric: Metric, labels: Tuple[str, ...]):
+        self._metric = metric
+        self._labels = labels
+
+    def inc(self, amount: float = 1):
+        self._metric.inc(amount, *self._labels)
+
+    def dec(self, amount: float = 1):
+        self._metric.dec(amount, *self._labels)
+
+    def set(self, value: float):
+        self._metric.set(value, *self._labels)
+
+    def observe(self, value: float):
+        self._metric.observe(value, *self._labels)
+
+    def time(self) -> '_Timer':
+        return _Timer(self._metric, self._labels)
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: Tuple[str, ...]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self._start, *self.labels)
+
+
+class Registry:
+    """Conjunto de métricas expostas pelo endpoint"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric):
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        return '\n'.join(metric.render() for metric in self._metrics.values()) + '\n'
+
+
+REGISTRY = Registry()
+
+
+class MetricsServer:
+    """Servidor HTTP que expõe as métricas em /metrics"""
+
+    def __init__(self, host: str, port: int, registry: Registry = REGISTRY):
+        self.host = host
+        self.port = port
+        self.registry = registry
+        self._runner: Optional[web.AppRunner] = None
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.registry.render(), content_type='text/plain', charset='utf-8')
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/metrics', self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+# --- Métricas do bot ---
+
+COMMAND_LATENCY = Histogram('music_command_latency_seconds', 'Duração dos comandos', ['command'])
+EXTRACTION_TIME = Histogram('music_extraction_seconds', 'Duração das extrações do yt-dlp', ['profile'])
+FFMPEG_SPAWN_TIME = Histogram('music_ffmpeg_spawn_seconds', 'Tempo para iniciar o processo do FFmpeg')
+TIME_TO_FIRST_AUDIO = Histogram('music_time_to_first_audio_seconds',
+                                'Tempo entre pedir a próxima música e o primeiro frame de áudio')
+INTER_TRACK_GAP = Histogram('music_inter_track_gap_seconds', 'Silêncio entre o fim de uma música e o início da próxima')
+FFMPEG_RESTARTS = Counter('music_ffmpeg_restarts_total', 'FFmpeg reiniciado na mesma música, por motivo', ['reason'])
+FFMPEG_PROCESSES = Gauge('music_ffmpeg_processes', 'Processos do FFmpeg em execução')
+FFMPEG_WAITING = Gauge('music_ffmpeg_waiting', 'Músicas esperando uma vaga para iniciar o FFmpeg')
+FFMPEG_REJECTED = Counter('music_ffmpeg_rejected_total', 'Músicas que desistiram de esperar uma vaga do FFmpeg')
+FFMPEG_STALLS = Counter('music_ffmpeg_stalls_total', 'FFmpeg sem entregar áudio por mais que o limite')
+FFMPEG_CPU = Gauge('music_ffmpeg_cpu_percent', 'CPU de cada FFmpeg (% de um núcleo)', ['pid', 'guild'])
+FFMPEG_RSS = Gauge('music_ffmpeg_rss_bytes', 'Memória residente de cada FFmpeg', ['pid', 'guild'])
+STATUS_UPDATES = Counter('music_status_updates_total', 'Atualizações do painel: enviadas ou substituídas por outra mais nova', ['result'])
+ERRORS = Counter('music_errors_total', 'Erros por tipo', ['type'])
+ACTIVE_VOICE_CLIENTS = Gauge('music_active_voice_clients', 'Conexões de voz ativas')
+QUEUED_SONGS = Gauge('music_queued_songs', 'Músicas em todas as filas')
+MAX_QUEUE_LENGTH = Gauge('music_queue_length_max', 'Maior fila entre os servidores')
+RESOLVER_PENDING = Gauge('music_resolver_pending', 'Extrações aguardando ou em execução no resolvedor')
+RESOLVER_RUNNING = Gauge('music_resolver_running', 'Extrações em execução no resolvedor')
+SINGLEFLIGHT_SHARED = Counter('music_singleflight_shared_total', 'Pedidos atendidos por uma execução já em andamento', ['name'])
+SINGLEFLIGHT_SUPPRESSED = Counter('music_singleflight_suppressed_total', 'Pedidos recusados na hora porque a chave falhou há pouco', ['name'])
+EXTRACTOR_RATE = Gauge('music_extractor_rate', 'Extrações por segundo permitidas pelo limite adaptativo')
+EXTRACTOR_BREAKER_OPEN = Gauge('music_extractor_breaker_open', 'Disjuntor do extrator aberto ou em teste (1) ou fechado (0)')
+EXTRACTOR_REJECTED = Counter('music_extractor_rejected_total', 'Extrações recusadas pela saúde do extrator', ['reason'])
+PLAYBACK_RETRIES = Counter('music_playback_retries_total', 'Novas tentativas de iniciar a reprodução, por motivo', ['reason'])
+AUDIO_CACHE_REQUESTS = Counter('music_audio_cache_requests_total', 'Consultas ao cache local de áudio', ['result'])
+AUDIO_CACHE_BYTES = Gauge('music_audio_cache_bytes', 'Bytes ocupados pelo cache local de áudio')
+EVENT_LOOP_LAG = Histogram('music_event_loop_lag_seconds', 'Atraso do event loop em relação ao agendado',
+                           buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+EVENT_LOOP_STALLS = Counter('music_event_loop_stalls_total', 'Vezes em que o event loop ficou travado')
+SLOW_COMMANDS = Counter('music_slow_commands_total', 'Comandos acima do limite de duração', ['command'])
@@ -0,0 +1,241 @@
+"""
+Processamento de PCM com NumPy: volume com rampa, normalização de loudness e crossfade
+"""
+import threading
+from typing import Callable, Optional
+
+import discord
+
+try:
+    import numpy as np
+except ImportError:  # NumPy é opcional; sem ele o bot usa o PCMVolumeTransformer
+    np = None
+
+from config import LOUDNESS_TARGET, LOUDNESS_NORMALIZATION, VOLUME_RAMP_SECONDS, CROSSFADE_SECONDS
+
+FRAME_BYTES = discord.opus.Encoder.FRAME_SIZE  # 20 ms de PCM estéreo 16 bits a 48 kHz
+FRAME_SAMPLES = FRAME_BYTES // 2
+FRAME_SECONDS = 0.02
+
+# Loudness: blocos de 400 ms, histórico de 60 s, portas absoluta (-70 LUFS) e relativa (-10 LU)
+BLOCK_FRAMES = 20
+HISTORY_BLOCKS = 150
+ABSOLUTE_GATE = 10 ** ((-70 + 0.691) / 10)
+RELATIVE_GATE = 10 ** (-10 / 10)
+MIN_NORMALIZATION_GAIN = 0.25
+MAX_NORMALIZATION_GAIN = 4.0
+
+
+def available() -> bool:
+    """Indica se o NumPy está instalado"""
+    return np is not None
+
+
+class MixerSource(discord.AudioSource):
+    """Fonte PCM que processa cada frame como um array int16 do NumPy
+
+    - `volume` pode ser alterado a qualquer momento: o ganho muda em rampa
+      (`VOLUME_RAMP_SECONDS`) em vez de saltar, evitando estalos;
+    - com `normalize`, estima o loudness integrado no estilo EBU R128 (blocos
+      de 400 ms com portas absoluta e relativa, sem o filtro de ponderação K)
+      e ajusta o ganho para chegar a `LOUDNESS_TARGET`;
+    - `start_crossfade` mistura a próxima música enquanto esta termina. Quando
+      faltam `crossfade` segundos para o fim (`duration`), `on_crossfade` é
+      chamado (na thread de áudio) para providenciar a próxima fonte.
+
+    Todos os buffers são alocados na criação; o processamento de um frame não
+    cria arrays temporários.
+    """
+
+    def __init__(self, original: discord.AudioSource, volume: float = 1.0, normalize: bool = LOUDNESS_NORMALIZATION,
+                 duration: Optional[float] = None, crossfade: float = CROSSFADE_SECONDS,
+                 on_crossfade: Optional[Callable[[], None]] = None):
+        if np is None:
+            raise RuntimeError('NumPy não está instalado')
+        if original.is_opus():
+            raise discord.ClientException('AudioSource must not be Opus encoded.')
+        self.original = original
+        self.normalize = normalize
+        self.duration = duration
+        self.crossfade_frames = max(int(crossfade / FRAME_SECONDS), 0)
+        self._on_crossfade = on_crossfade
+        self._crossfade_requested = False
+        self._lock = threading.Lock()
+
+        # Buffers de entrada/saída com views int16 sobre a mesma memória
+        self._in_bytes = bytearray(FRAME_BYTES)
+        self._in = np.frombuffer(self._in_bytes, dtype=np.int16)
+        self._incoming_bytes = bytearray(FRAME_BYTES)
+        self._incoming_in = np.frombuffer(self._incoming_bytes, dtype=np.int16)
+        self._out_bytes = bytearray(FRAME_BYTES)
+        self._out = np.frombuffer(self._out_bytes, dtype=np.int16)
+        self._work = np.empty(FRAME_SAMPLES, dtype=np.float32)
+        self._incoming_work = np.empty(FRAME_SAMPLES, dtype=np.float32)
+        self._curve = np.empty(FRAME_SAMPLES, dtype=np.float32)
+        # Rampa de 0 a 1 ao longo de um frame (mesmo valor para os dois canais)
+        self._ramp = np.repeat(np.arange(1, FRAME_SAMPLES // 2 + 1, dtype=np.float32) / (FRAME_SAMPLES // 2), 2)
+
+        # Ganho
+        self._volume = max(volume, 0.0)
+        self._norm_gain = 1.0
+        self._gain = self._volume
+        self._ramp_frames = max(int(VOLUME_RAMP_SECONDS / FRAME_SECONDS), 1)
+        self._ramp_left = 0
+
+        # Loudness
+        self._block_energy = 0.0
+        self._block_count = 0
+        self._history = np.zeros(HISTORY_BLOCKS, dtype=np.float64)
+        self._history_mask = np.zeros(HISTORY_BLOCKS, dtype=bool)
+        self._history_len = 0
+        self._history_pos = 0
+
+        # Crossfade
+        self.incoming: Optional[discord.AudioSource] = None
+        self._fade_pos = 0
+        self.handed_over = False
+
+    # --- Volume ---
+
+    @property
+    def volume(self) -> float:
+        return self._volume
+
+    @volume.setter
+    def volume(self, value: float):
+        self._volume = max(value, 0.0)
+        self._ramp_left = self._ramp_frames
+
+    def _apply_gain(self, work):
+        target = self._volume * self._norm_gain
+        if self._ramp_left:
+            start = self._gain
+            end = start + (target - start) / self._ramp_left
+            self._ramp_left -= 1
+            np.multiply(self._ramp, end - start, out=self._curve)
+            self._curve += start
+            work *= self._curve
+            self._gain = end
+        else:
+            self._gain = target
+            if target != 1.0:
+                work *= target
+
+    # --- Loudness ---
+
+    def _measure(self, work):
+        self._block_energy += float(np.dot(work, work))
+        self._block_count += 1
+        if self._block_count < BLOCK_FRAMES:
+            return
+        energy = self._block_energy / (self._block_count * FRAME_SAMPLES * 32768.0 ** 2)
+        self._block_energy = 0.0
+        self._block_count = 0
+        if energy <= ABSOLUTE_GATE:
+            return
+        self._history[self._history_pos] = energy
+        self._history_pos = (self._history_pos + 1) % HISTORY_BLOCKS
+        self._history_len = min(self._history_len + 1, HISTORY_BLOCKS)
+
+        history = self._history[:self._history_len]
+        mask = self._history_mask[:self._history_len]
+        threshold = history.mean() * RELATIVE_GATE
+        np.greater(history, threshold, out=mask)
+        gated = mask.sum()
+        if not gated:
+            return
+        loudness = -0.691 + 10 * np.log10(np.dot(history, mask) / gated)
+        gain = 10 ** ((LOUDNESS_TARGET - loudness) / 20)
+        self._norm_gain = min(max(gain, MIN_NORMALIZATION_GAIN), MAX_NORMALIZATION_GAIN)
+        self._ramp_left = self._ramp_frames
+
+    # --- Crossfade ---
+
+    def start_crossfade(self, incoming: discord.AudioSource):
+        """Começa a misturar `incoming` com a música atual"""
+        with self._lock:
+            if self.incoming is None and not self.handed_over:
+                self.incoming = incoming
+                self._fade_pos = 0
+
+    def _read_frame(self, source: discord.AudioSource, buffer: bytearray) -> bool:
+        data = source.read()
+        if not data:
+            return False
+        size = len(data)
+        buffer[:size] = data
+        if size < FRAME_BYTES:
+            buffer[size:] = bytes(FRAME_BYTES - size)
+        return True
+
+    def _check_crossfade(self):
+        if self._crossfade_requested or not self._on_crossfade or not self.crossfade_frames or not self.duration:
+            return
+        elapsed = getattr(self.original, 'elapsed', None)
+        if elapsed is not None and self.duration - elapsed <= self.crossfade_frames * FRAME_SECONDS:
+            self._crossfade_requested = True
+            self._on_crossfade()
+
+    def _mix_incoming(self, work, has_current: bool) -> bool:
+        """Mistura o próximo frame da fonte seguinte; retorna False se ela não tiver áudio"""
+        if not self._read_frame(self.incoming, self._incoming_bytes):
+            # A próxima música não entregou áudio: segue só com a atual
+            self.incoming = None
+            return False
+        progress = self._fade_pos / self.crossfade_frames
+        step = 1 / self.crossfade_frames
+        np.copyto(self._incoming_work, self._incoming_in, casting='unsafe')
+        # Entrada sobe de `progress` até `progress + step`; a saída desce na mesma proporção
+        np.multiply(self._ramp, step, out=self._curve)
+        self._curve += progress
+        self._incoming_work *= self._curve
+        self._incoming_work *= self._volume
+        if has_current:
+            np.subtract(1.0, self._curve, out=self._curve)
+            work *= self._curve
+            work += self._incoming_work
+        else:
+            np.copyto(work, self._incoming_work)
+        self._fade_pos += 1
+        if self._fade_pos >= self.crossfade_frames:
+            self.handed_over = True
+        return True
+
+    # --- AudioSource ---
+
+    def read(self) -> bytes:
+        if self.handed_over:
+            return b''
+        with self._lock:
+            has_current = self._read_frame(self.original, self._in_bytes)
+            if not has_current and self.incoming is None:
+                return b''
+
+            work = self._work
+            if has_current:
+                np.copyto(work, self._in, casting='unsafe')
+                if self.normalize:
+                    self._measure(work)
+                self._apply_gain(work)
+            else:
+                work.fill(0)
+
+            if self.incoming is not None:
+                mixed = self._mix_incoming(work, has_current)
+                if not has_current:
+                    if not mixed:
+                        return b''
+                    # A música atual acabou antes do fim do crossfade: entrega a próxima
+                    self.handed_over = True
+            else:
+                self._check_crossfade()
+
+            np.clip(work, -32768, 32767, out=work)
+            np.copyto(self._out, work, casting='unsafe')
+        return bytes(self._out_bytes)
+
+    def is_opus(self) -> bool:
+        return False
+
+    def cleanup(self):
+        self.original.cleanup()
@@ -2,91 +2,636 @@
 Gerenciador de estado de música para cada servidor
 """
 import asyncio
+import sys
+import time
+from collections import deque
 import discord
-import yt_dlp
-from typing import List, Optional, Dict, Any
-from dataclasses import dataclass, field
-from config import YTDL_OPTIONS, FFMPEG_OPTIONS, DEFAULT_VOLUME, MAX_QUEUE_SIZE
+from typing import Optional, Dict, Any, Tuple, Union, Callable, Deque, Awaitable
+from config import (FFMPEG_OPTIONS, LOCAL_FFMPEG_OPTIONS, DEFAULT_VOLUME, MAX_QUEUE_SIZE, PREFETCH_WARM_FFMPEG,
+                    AUDIO_CACHE_DIR, FILTER_DEBOUNCE, FILTER_MAX_DELAY, STATUS_ACTIVITY_SIZE,
+                    FFMPEG_MAX_STALL_RESTARTS)
+from utils.resolver import Resolver, ResolverError
+from utils.audio_cache import AudioCache
+from utils.cache import stream_expiry
+from utils.audio import TrackedSource, create_source
+from utils.ffmpeg_supervisor import FFmpegBusy, FFmpegSupervisor, FFmpegProcess
+from utils.filters import FilterChain
+from utils.search import SearchService
+from utils.state_store import StateBackend, create_state_store
+from utils.song_queue import SongQueue
+from utils import metrics
+
+# Prefixos de URL repetidos em quase todas as músicas; cada Song guarda só o
+# restante da URL e uma referência ao prefixo compartilhado
+URL_PREFIXES = tuple(sys.intern(prefix) for prefix in (
+    'https://www.youtube.com/watch?v=',
+    'https://i.ytimg.com/vi/',
+    'https://i.ytimg.com/vi_webp/',
+    'https://i9.ytimg.com/vi/',
+    'https://',
+))
+
+
+def _split_url(url: Optional[str]) -> Tuple[str, Optional[str]]:
+    """Separa a URL em (prefixo compartilhado, restante)"""
+    if url:
+        for prefix in URL_PREFIXES:
+            if url.startswith(prefix):
+                return prefix, url[len(prefix):]
+    return '', url
+
 
-@dataclass
 class Song:
-    """Representa uma música na fila"""
-    url: str
-    title: str
-    duration: Optional[int] = None
-    thumbnail: Optional[str] = None
-    requester: Optional[discord.Member] = None
+    """Representa uma música na fila
+
+    Usa `__slots__` e guarda apenas o ID de quem pediu a música; o membro é
+    resolvido sob demanda por `Song.user_lookup` (definido pelo cog).
+    """
+    
+    __slots__ = ('_url_prefix', '_url_rest', 'title', 'duration', '_thumb_prefix', '_thumb_rest', 'requester_id')
+    
+    # Função user_id -> usuário do Discord, usada pela propriedade `requester`
+    user_lookup: Optional[Callable[[int], Optional[discord.abc.User]]] = None
+    
+    def __init__(self, url: str, title: str, duration: Optional[int] = None, thumbnail: Optional[str] = None,
+                 requester: Union[discord.abc.User, int, None] = None):
+        self._url_prefix, self._url_rest = _split_url(url)
+        self.title = title
+        self.duration = duration
+        self._thumb_prefix, self._thumb_rest = _split_url(thumbnail)
+        # Miniaturas do YouTube repetem o ID do vídeo: guarda só o final compartilhado ("/hqdefault.jpg")
+        if self._thumb_rest and self._url_rest and self._thumb_rest.startswith(self._url_rest + '/'):
+            tail = self._thumb_rest[len(self._url_rest):]
+            if '?' not in tail:
+                self._thumb_rest = sys.intern(tail)
+        self.requester_id: Optional[int] = requester if isinstance(requester, int) or requester is None else requester.id
+    
+    @property
+    def url(self) -> str:
+        return self._url_prefix + self._url_rest
+    
+    @property
+    def thumbnail(self) -> Optional[str]:
+        if self._thumb_rest is None:
+            return None
+        if self._thumb_rest.startswith('/'):
+            return self._thumb_prefix + self._url_rest + self._thumb_rest
+        return self._thumb_prefix + self._thumb_rest
+    
+    @property
+    def requester(self) -> Optional[discord.abc.User]:
+        """Usuário que pediu a música (resolvido sob demanda)"""
+        if self.requester_id is None or Song.user_lookup is None:
+            return None
+        return Song.user_lookup(self.requester_id)
+    
+    @property
+    def requester_mention(self) -> Optional[str]:
+        """Menção de quem pediu a música, sem precisar buscar o membro"""
+        return f"<@{self.requester_id}>" if self.requester_id else None
+    
+    def __repr__(self) -> str:
+        return f"Song(url={self.url!r}, title={self.title!r}, duration={self.duration!r}, requester_id={self.requester_id!r})"
+    
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Song):
+            return NotImplemented
+        return (self.url, self.title, self.duration, self.thumbnail, self.requester_id) == \
+            (other.url, other.title, other.duration, other.thumbnail, other.requester_id)
+    
+    __hash__ = None
     
     @classmethod
-    async def from_url(cls, url: str, requester: discord.Member = None) -> 'Song':
+    async def from_url(cls, url: str, requester: discord.Member = None, resolver: Resolver = None,
+                       message_id: Optional[int] = None) -> 'Song':
         """Cria uma instância de Song a partir de uma URL"""
+        resolver = resolver or Resolver.default()
         try:
-            with yt_dlp.YoutubeDL(YTDL_OPTIONS) as ydl:
-                info = ydl.extract_info(url, download=False)
-                
-                # Se for uma playlist, pega a primeira música
-                if 'entries' in info:
-                    entries = [entry for entry in info['entries'] if entry is not None]
-                    if not entries:
-                        raise ValueError("Nenhum vídeo válido encontrado")
-                    info = entries[0]
-                
-                return cls(
-                    url=info.get('webpage_url', url),
-                    title=info.get('title', 'Música Desconhecida'),
-                    duration=info.get('duration'),
-                    thumbnail=info.get('thumbnail'),
-                    requester=requester
-                )
+            info = await resolver.resolve_metadata(url, message_id=message_id)
+            
+            return cls(
+                url=info.get('webpage_url') or url,
+                title=info.get('title') or 'Música Desconhecida',
+                duration=info.get('duration'),
+                thumbnail=info.get('thumbnail'),
+                requester=requester
+            )
+        except ResolverError:
+            raise
         except Exception as e:
             raise ValueError(f"Erro ao processar URL: {e}")
+    
+    @classmethod
+    def from_entry(cls, entry: Dict[str, Any], requester: discord.Member = None) -> 'Song':
+        """Cria uma instância de Song a partir de uma entrada "flat" de playlist"""
+        url = entry.get('webpage_url') or entry.get('url')
+        if entry.get('ie_key') == 'Youtube' and entry.get('id'):
+            url = f"https://www.youtube.com/watch?v={entry['id']}"
+        
+        thumbnail = entry.get('thumbnail')
+        if not thumbnail and entry.get('thumbnails'):
+            thumbnail = entry['thumbnails'][-1].get('url')
+        
+        return cls(
+            url=url,
+            title=entry.get('title') or 'Música Desconhecida',
+            duration=int(entry['duration']) if entry.get('duration') else None,
+            thumbnail=thumbnail,
+            requester=requester
+        )
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializa a música para persistência"""
+        return {
+            'url': self.url,
+            'title': self.title,
+            'duration': self.duration,
+            'thumbnail': self.thumbnail,
+            'requester_id': self.requester_id,
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Song':
+        """Recria uma música serializada por `to_dict`"""
+        return cls(
+            url=data['url'],
+            title=data['title'],
+            duration=data.get('duration'),
+            thumbnail=data.get('thumbnail'),
+            requester=data.get('requester_id')
+        )
 
 class GuildMusicManager:
     """Gerencia o estado de música para um servidor específico"""
     
-    def __init__(self, guild_id: int):
+    def __init__(self, guild_id: int, resolver: Optional[Resolver] = None,
+                 store: Optional[StateBackend] = None, audio_cache: Optional[AudioCache] = None,
+                 ffmpeg: Optional[FFmpegSupervisor] = None):
         self.guild_id = guild_id
-        self.queue: List[Song] = []
-        self.current_song: Optional[Song] = None
+        self.resolver = resolver or Resolver.default()
+        self.store = store
+        self.audio_cache = audio_cache
+        self.ffmpeg = ffmpeg or FFmpegSupervisor.default()
+        self.queue: SongQueue = SongQueue()
+        self._current_song: Optional[Song] = None
         self.voice_channel: Optional[discord.VoiceChannel] = None
         self.voice_client: Optional[discord.VoiceClient] = None
-        self.volume: float = DEFAULT_VOLUME
-        self.is_looping: bool = False
+        self._volume: float = DEFAULT_VOLUME
+        self._is_looping: bool = False
         self.is_paused: bool = False
+        # Momento (perf_counter) em que a última música terminou, para medir o intervalo até a próxima
+        self.last_track_ended_at: Optional[float] = None
         self._disconnect_task: Optional[asyncio.Task] = None
+        self._import_task: Optional[asyncio.Task] = None
+        self._progress_task: Optional[asyncio.Task] = None
+        # Pré-carregamento da próxima música: (música, task que resolve (url, source aquecido))
+        self._prefetch: Optional[Tuple[Song, asyncio.Task]] = None
+        # Próxima música já tocando em crossfade: (música, fonte, url)
+        self._crossfade: Optional[Tuple[Song, TrackedSource, str]] = None
+        # Fonte da música atual e de onde ela vem (arquivo local ou URL de stream)
+        self.now_playing: Optional[TrackedSource] = None
+        self.audio_url: Optional[str] = None
+        # Efeitos de áudio; mudanças são aplicadas com atraso para agrupar cliques seguidos
+        self.filters = FilterChain()
+        self._filter_task: Optional[asyncio.Task] = None
+        self._filter_pending_since: Optional[float] = None
+        # Mensagem do painel de controle (uma por servidor, editada a cada música)
+        self.panel_message: Optional[discord.Message] = None
+        # Últimas ações (pular, embaralhar...) mostradas no painel em vez de mensagens novas
+        self.activity: Deque[str] = deque(maxlen=STATUS_ACTIVITY_SIZE)
+        # Transições de estado (começar, pular, parar, fim da música) são feitas sob este lock;
+        # a resolução e o FFmpeg ficam fora dele
+        self.lock = asyncio.Lock()
+        # Número da música atual: inícios e callbacks de uma música antiga comparam com ele e desistem
+        self.track_id = 0
+        # Uma música foi escolhida e está sendo resolvida, mas ainda não começou a tocar
+        self.starting = False
+        # Falhas seguidas ao iniciar músicas e a nova tentativa agendada (ver Music.playback_failed)
+        self.playback_failures = 0
+        self._retry_task: Optional[asyncio.Task] = None
+        
+    # Volume, loop e música atual são salvos a cada alteração
+    
+    @property
+    def volume(self) -> float:
+        return self._volume
+    
+    @volume.setter
+    def volume(self, value: float):
+        self._volume = value
+        self._save_settings()
+    
+    @property
+    def is_looping(self) -> bool:
+        return self._is_looping
+    
+    @is_looping.setter
+    def is_looping(self, value: bool):
+        self._is_looping = value
+        self._save_settings()
+    
+    @property
+    def current_song(self) -> Optional[Song]:
+        return self._current_song
+    
+    @current_song.setter
+    def current_song(self, song: Optional[Song]):
+        self._current_song = song
+        self._save_settings()
+    
+    @property
+    def is_active(self) -> bool:
+        """Há uma música tocando, pausada ou sendo iniciada"""
+        if self.starting:
+            return True
+        return bool(self.voice_client and (self.voice_client.is_playing() or self.voice_client.is_paused()))
+    
+    def next_track(self) -> int:
+        """Passa para uma nova música, invalidando o início e o callback pendentes da anterior"""
+        self.track_id += 1
+        return self.track_id
+    
+    def stop(self):
+        """Para a reprodução e limpa a fila (chamar com `lock`)"""
+        self.next_track()
+        self.starting = False
+        self.cancel_retry()
+        self.cancel_import()
+        self.cancel_progress_updates()
+        if self.voice_client:
+            self.voice_client.stop()
+        self.clear_queue()
+        self.now_playing = None
+        self.audio_url = None
+        self.current_song = None
+    
+    def _save_settings(self):
+        if self.store:
+            self.store.save_settings(
+                self.guild_id, self._volume, self._is_looping,
+                self._current_song.to_dict() if self._current_song else None
+            )
+    
+    def restore(self, state: Dict[str, Any]):
+        """Restaura um estado salvo, sem regravá-lo
+
+        A música que estava tocando volta para o início da fila, para ser
+        retomada quando o bot voltar a um canal de voz.
+        """
+        if state.get('volume') is not None:
+            self._volume = state['volume']
+        self._is_looping = state.get('is_looping', False)
+        self.queue = SongQueue(Song.from_dict(data) for data in state.get('queue', []))
+        if state.get('current_song'):
+            self.queue.insert(0, Song.from_dict(state['current_song']))
+            if self.store:
+                self.store.replace_queue(self.guild_id, [song.to_dict() for song in self.queue])
+                self.store.save_settings(self.guild_id, self._volume, self._is_looping, None)
         
     def add_song(self, song: Song) -> bool:
         """Adiciona uma música à fila"""
         if len(self.queue) >= MAX_QUEUE_SIZE:
             return False
         self.queue.append(song)
+        if self.store:
+            self.store.append(self.guild_id, len(self.queue) - 1, song.to_dict())
+        if len(self.queue) == 1:
+            self.refresh_prefetch()
         return True
         
     def remove_song(self, index: int) -> Optional[Song]:
         """Remove uma música da fila pelo índice"""
         if 0 <= index < len(self.queue):
-            return self.queue.pop(index)
+            song = self.queue.pop(index)
+            if self.store:
+                self.store.remove(self.guild_id, index)
+            if index == 0:
+                self.refresh_prefetch()
+            return song
         return None
         
     def clear_queue(self):
         """Limpa a fila de músicas"""
         self.queue.clear()
+        if self.store:
+            self.store.replace_queue(self.guild_id, [])
+        self.invalidate_prefetch()
         
     def get_next_song(self) -> Optional[Song]:
         """Obtém a próxima música da fila"""
         if self.is_looping and self.current_song:
             return self.current_song
-        return self.queue.pop(0) if self.queue else None
+        if not self.queue:
+            return None
+        song = self.queue.popleft()
+        if self.store:
+            self.store.remove(self.guild_id, 0)
+        return song
+        
+    def requeue(self, song: Song):
+        """Devolve ao início da fila uma música que não conseguiu começar (chamar com `lock`)"""
+        if self.is_looping:
+            return  # No loop, a música atual já é a próxima
+        self.queue.insert(0, song)
+        if self.store:
+            self.store.replace_queue(self.guild_id, [queued.to_dict() for queued in self.queue])
+        self.invalidate_prefetch()
+        
+    def schedule_retry(self, delay: float, retry: Callable[[], Awaitable[Any]]):
+        """Chama `retry()` daqui a `delay` segundos, substituindo a tentativa já agendada"""
+        self.cancel_retry()
+        
+        async def wait_and_retry():
+            await asyncio.sleep(delay)
+            self._retry_task = None
+            await retry()
+            
+        self._retry_task = asyncio.create_task(wait_and_retry())
+        
+    def cancel_retry(self):
+        if self._retry_task:
+            self._retry_task.cancel()
+        self._retry_task = None
         
     def shuffle_queue(self):
         """Embaralha a fila de músicas"""
-        import random
-        random.shuffle(self.queue)
+        self.queue.shuffle()
+        if self.store:
+            self.store.replace_queue(self.guild_id, [song.to_dict() for song in self.queue])
+        self.refresh_prefetch()
+        
+    def start_prefetch(self):
+        """Resolve (e opcionalmente aquece o FFmpeg de) a próxima música enquanto a atual toca"""
+        if not self.queue or self.is_looping:
+            return
+        head = self.queue[0]
+        if self._prefetch and self._prefetch[0] is head:
+            return
+        self.invalidate_prefetch()
+        try:
+            task = asyncio.get_running_loop().create_task(self._run_prefetch(head))
+        except RuntimeError:
+            return
+        self._prefetch = (head, task)
+        
+    async def _run_prefetch(self, song: Song) -> Tuple[str, Optional[discord.AudioSource]]:
+        """Resolve a URL de stream da música e, se configurado, já inicia o FFmpeg"""
+        audio_url = await self.resolve_audio(song)
+        source = None
+        # Só aquece se houver um FFmpeg livre agora; senão ele é iniciado na hora de tocar
+        if PREFETCH_WARM_FFMPEG and self.ffmpeg.try_admit():
+            with metrics.FFMPEG_SPAWN_TIME.time():
+                source = self.create_source(audio_url, admitted=True)
+        return audio_url, source
+        
+    async def resolve_audio(self, song: Song) -> str:
+        """Retorna o arquivo local da música, se estiver no cache de áudio, ou a URL de stream"""
+        if self.audio_cache:
+            path = self.audio_cache.lookup(song.url)
+            if path:
+                return path
+        return await self.resolver.resolve_stream(song.url)
+        
+    def ffmpeg_options(self, audio_url: str) -> Dict[str, str]:
+        """Opções do FFmpeg para a URL de stream ou para um arquivo do cache local"""
+        if self.audio_cache and audio_url.startswith(self.audio_cache.directory):
+            return LOCAL_FFMPEG_OPTIONS
+        return FFMPEG_OPTIONS
+        
+    def create_source(self, audio_url: str, start: float = 0.0, admitted: bool = False,
+                      restarts: int = 0, replaces: Optional[FFmpegProcess] = None) -> discord.AudioSource:
+        """Inicia o FFmpeg para a URL com o volume e os filtros atuais do servidor
+
+        O processo é registrado no supervisor. Com `admitted`, usa a vaga já
+        reservada (`ffmpeg.admit`/`try_admit`); com `replaces` (reinício da
+        música atual), herda a vaga do processo substituído.
+        """
+        options = self.ffmpeg_options(audio_url)
+        filters = self.filters.compile()
+        return self.ffmpeg.spawn(
+            self.guild_id,
+            lambda: create_source(audio_url, self.volume, start=start, ffmpeg_options=options, filters=filters),
+            admitted=admitted, restarts=restarts, on_stall=self._ffmpeg_stalled, replaces=replaces
+        )
+        
+    def _ffmpeg_stalled(self, record: FFmpegProcess):
+        """Chamado pelo supervisor quando um FFmpeg deste servidor para de entregar áudio"""
+        tracked = self.now_playing
+        if tracked is None or getattr(tracked.original, 'record', None) is not record:
+            # Não é a música atual (crossfade, fonte esquecida): só encerra
+            record.kill()
+            return
+        if record.restarts >= FFMPEG_MAX_STALL_RESTARTS:
+            # A leitura volta vazia e a fila segue para a próxima música
+            print(f'FFmpeg travou {record.restarts + 1} vezes na mesma música; pulando')
+            record.kill()
+            return
+        self.restart_playback(reason='stall', restarts=record.restarts + 1)
+        
+    def set_filter(self, name: str, value: Optional[str] = None):
+        """Liga/ajusta um filtro; a música atual é reiniciada na mesma posição após o debounce"""
+        self.filters.set(name, value)
+        self._schedule_filter_restart()
+        
+    def clear_filters(self):
+        """Desliga todos os filtros"""
+        if self.filters:
+            self.filters.clear()
+            self._schedule_filter_restart()
+        
+    def _schedule_filter_restart(self, reason: str = 'filter'):
+        """Reagenda a aplicação dos filtros/volume, para que vários cliques gerem um único FFmpeg"""
+        now = time.monotonic()
+        if self._filter_pending_since is None:
+            self._filter_pending_since = now
+        delay = min(FILTER_DEBOUNCE, max(self._filter_pending_since + FILTER_MAX_DELAY - now, 0))
+        if self._filter_task and not self._filter_task.done():
+            self._filter_task.cancel()
+        self._filter_task = asyncio.create_task(self._apply_filters(delay, reason))
+        
+    async def _apply_filters(self, delay: float, reason: str):
+        await asyncio.sleep(delay)
+        self._filter_pending_since = None
+        self.restart_playback(reason=reason)
+        if PREFETCH_WARM_FFMPEG:
+            # O FFmpeg aquecido foi iniciado com os filtros antigos
+            self.refresh_prefetch()
+        
+    def set_volume(self, volume: float):
+        """Altera o volume, inclusive da música que está tocando
+
+        Com fontes PCM o volume muda na hora (em rampa, no modo `numpy`); com fontes Opus o FFmpeg é
+        reiniciado na posição atual com o novo filtro de volume, após o mesmo debounce dos filtros.
+        """
+        self.volume = volume
+        source = self.voice_client.source if self.voice_client else None
+        if not hasattr(source, 'volume'):
+            self._schedule_filter_restart(reason='volume')
+            return
+        source.volume = volume
+        if PREFETCH_WARM_FFMPEG:
+            # O FFmpeg aquecido foi iniciado com o volume antigo
+            self.refresh_prefetch()
+        
+    @property
+    def position(self) -> float:
+        """Posição da música atual em segundos, contada pelos frames já entregues"""
+        if not self.now_playing or not self.voice_client:
+            return 0.0
+        if not (self.voice_client.is_playing() or self.voice_client.is_paused()):
+            return 0.0
+        return self.now_playing.elapsed
+        
+    async def seek(self, position: float) -> bool:
+        """Reinicia a música atual em `position` segundos
+
+        Reaproveita a URL de stream já resolvida; só consulta o resolvedor
+        (que usa o cache) se a URL assinada já tiver expirado.
+        """
+        song = self.current_song
+        if not song or not self.audio_url:
+            return False
+        if song.duration:
+            position = min(position, max(song.duration - 1, 0))
+        position = max(position, 0.0)
+        is_local = self.audio_cache and self.audio_url.startswith(self.audio_cache.directory)
+        if not is_local and stream_expiry(self.audio_url) <= time.time():
+            track_id = self.track_id
+            audio_url = await self.resolve_audio(song)
+            # A música mudou enquanto a URL era resolvida
+            if self.track_id != track_id:
+                return False
+            self.audio_url = audio_url
+        return self.restart_playback(position, reason='seek')
+        
+    def start_progress_updates(self, coro) -> asyncio.Task:
+        """Inicia a atualização periódica do painel, cancelando a anterior"""
+        self.cancel_progress_updates()
+        self._progress_task = asyncio.create_task(coro)
+        return self._progress_task
+        
+    def cancel_progress_updates(self):
+        if self._progress_task and not self._progress_task.done():
+            self._progress_task.cancel()
+        self._progress_task = None
+        
+    def restart_playback(self, position: Optional[float] = None, reason: str = 'volume', restarts: int = 0) -> bool:
+        """Reinicia o FFmpeg da música atual em `position` (padrão: posição atual)"""
+        tracked = self.now_playing
+        if not tracked or not self.audio_url or not self.voice_client:
+            return False
+        if not (self.voice_client.is_playing() or self.voice_client.is_paused()):
+            return False
+        if position is None:
+            position = tracked.elapsed
+        try:
+            with metrics.FFMPEG_SPAWN_TIME.time():
+                source = self.create_source(self.audio_url, start=position, restarts=restarts,
+                                            replaces=getattr(tracked.original, 'record', None))
+        except FFmpegBusy:
+            return False  # O FFmpeg atual já tinha terminado e não há vaga livre
+        tracked.replace(source, position, self.filters.speed).cleanup()
+        metrics.FFMPEG_RESTARTS.labels(reason).inc()
+        return True
+        
+    async def take_prefetched(self, song: Song) -> Optional[Tuple[str, Optional[discord.AudioSource]]]:
+        """Retorna o resultado do pré-carregamento se ele for desta música"""
+        if not self._prefetch or self._prefetch[0] is not song:
+            self.invalidate_prefetch()
+            return None
+        _, task = self._prefetch
+        self._prefetch = None
+        try:
+            return await task
+        except Exception:
+            return None
+        
+    async def prepare_crossfade(self, mixer: discord.AudioSource):
+        """Inicia a próxima música da fila e começa a misturá-la com a atual"""
+        if self.is_looping or not self.queue or self._crossfade:
+            return
+        song = self.queue[0]
+        try:
+            prefetched = await self.take_prefetched(song)
+            audio_url, source = prefetched if prefetched else (await self.resolve_audio(song), None)
+            if source is None:
+                if not self.ffmpeg.try_admit():
+                    return  # Sem FFmpeg livre: a próxima música começa sem crossfade
+                with metrics.FFMPEG_SPAWN_TIME.time():
+                    source = self.create_source(audio_url, admitted=True)
+        except Exception as e:
+            print(f'Erro ao preparar o crossfade: {e}')
+            return
+        if not self.queue or self.queue[0] is not song:
+            source.cleanup()
+            return
+        tracked = TrackedSource(source, speed=self.filters.speed)
+        self._crossfade = (song, tracked, audio_url)
+        if self.voice_client and self.voice_client.source is mixer:
+            mixer.start_crossfade(tracked)
+        
+    def take_crossfade(self, song: Song) -> Optional[Tuple[TrackedSource, str]]:
+        """Retorna a fonte (já em reprodução) da música que entrou em crossfade"""
+        if not self._crossfade or self._crossfade[0] is not song:
+            self.discard_crossfade()
+            return None
+        _, tracked, audio_url = self._crossfade
+        self._crossfade = None
+        return tracked, audio_url
+        
+    def discard_crossfade(self):
+        if self._crossfade:
+            self._crossfade[1].cleanup()
+            self._crossfade = None
+        
+    def invalidate_prefetch(self):
+        """Descarta o pré-carregamento atual (ex.: quando a fila é reordenada)"""
+        self.discard_crossfade()
+        if not self._prefetch:
+            return
+        _, task = self._prefetch
+        self._prefetch = None
+        if task.done():
+            if not task.cancelled() and task.exception() is None:
+                _, source = task.result()
+                if source:
+                    source.cleanup()
+        else:
+            task.cancel()
+        
+    def start_import(self, coro) -> asyncio.Task:
+        """Inicia a importação de uma playlist em segundo plano, cancelando a anterior"""
+        self.cancel_import()
+        self._import_task = asyncio.create_task(coro)
+        return self._import_task
+        
+    def cancel_import(self):
+        """Cancela a importação de playlist em andamento"""
+        if self._import_task and not self._import_task.done():
+            self._import_task.cancel()
+        self._import_task = None
+        
+    def refresh_prefetch(self):
+        """Invalida o pré-carregamento e, se algo estiver tocando, pré-carrega o novo início da fila"""
+        self.invalidate_prefetch()
+        if self.current_song:
+            self.start_prefetch()
         
     async def cleanup(self):
         """Limpa recursos e desconecta do canal de voz"""
-        if self._disconnect_task:
+        self.next_track()
+        self.starting = False
+        self.cancel_retry()
+        # A própria desconexão por inatividade também chama cleanup
+        if self._disconnect_task and self._disconnect_task is not asyncio.current_task():
             self._disconnect_task.cancel()
+        if self._filter_task:
+            self._filter_task.cancel()
+        self._filter_pending_since = None
+        self.filters.clear()
+        self.cancel_progress_updates()
+        self.cancel_import()
+        self.invalidate_prefetch()
             
         if self.voice_client:
             if self.voice_client.is_playing():
@@ -95,29 +640,89 @@ class GuildMusicManager:
             
         self.voice_client = None
         self.voice_channel = None
+        self.now_playing = None
+        self.audio_url = None
+        self.panel_message = None
+        self.activity.clear()
         self.current_song = None
         self.clear_queue()
 
 class MusicManager:
     """Gerenciador global de música para todos os servidores"""
     
-    def __init__(self):
+    def __init__(self, resolver: Optional[Resolver] = None, store: Optional[StateBackend] = None,
+                 audio_cache: Optional[AudioCache] = None):
         self.guilds: Dict[int, GuildMusicManager] = {}
+        # Servidores cujo estado salvo ainda está sendo lido
+        self._loading: Dict[int, asyncio.Task] = {}
+        self.resolver = resolver or Resolver.default()
+        self.search = SearchService(self.resolver)
+        if store is None:
+            store = create_state_store()
+        self.store = store
+        if audio_cache is None and AUDIO_CACHE_DIR:
+            audio_cache = AudioCache(AUDIO_CACHE_DIR, resolver=self.resolver)
+        self.audio_cache = audio_cache
+        self.ffmpeg = FFmpegSupervisor.default()
+        # Encerrando com as filas preservadas: as desconexões não apagam o estado salvo
+        self.preserving_state = False
+        
+    async def get_guild_manager(self, guild_id: int) -> GuildMusicManager:
+        """Obtém ou cria um gerenciador para um servidor
+
+        Na primeira vez que o servidor é usado o estado salvo é lido em uma
+        thread (a leitura espera as escritas pendentes do banco); comandos
+        simultâneos do mesmo servidor esperam a mesma leitura.
+        """
+        manager = self.guilds.get(guild_id)
+        if manager is not None:
+            return manager
+        task = self._loading.get(guild_id)
+        if task is None:
+            task = asyncio.ensure_future(self._create_guild_manager(guild_id))
+            self._loading[guild_id] = task
+            task.add_done_callback(lambda _: self._loading.pop(guild_id, None))
+        return await asyncio.shield(task)
         
-    def get_guild_manager(self, guild_id: int) -> GuildMusicManager:
-        """Obtém ou cria um gerenciador para um servidor"""
-        if guild_id not in self.guilds:
-            self.guilds[guild_id] = GuildMusicManager(guild_id)
-        return self.guilds[guild_id]
+    async def _create_guild_manager(self, guild_id: int) -> GuildMusicManager:
+        manager = GuildMusicManager(guild_id, self.resolver, self.store, self.audio_cache, self.ffmpeg)
+        # Restaura o estado salvo na primeira vez que o servidor é usado
+        if self.store:
+            state = await asyncio.get_running_loop().run_in_executor(None, self.store.load, guild_id)
+            if state:
+                manager.restore(state)
+        self.guilds[guild_id] = manager
+        return manager
         
     async def cleanup_guild(self, guild_id: int):
         """Limpa recursos de um servidor específico"""
+        if self.preserving_state:
+            return  # `cleanup_all` já está limpando (ex.: a desconexão do encerramento)
         if guild_id in self.guilds:
             await self.guilds[guild_id].cleanup()
             del self.guilds[guild_id]
+        if self.store:
+            self.store.delete_guild(guild_id)
             
-    async def cleanup_all(self):
-        """Limpa recursos de todos os servidores"""
-        for guild_manager in self.guilds.values():
+    async def cleanup_all(self, preserve_state: bool = False):
+        """Limpa recursos de todos os servidores
+
+        Com `preserve_state`, as filas salvas são mantidas para serem
+        restauradas quando o bot reiniciar.
+        """
+        if preserve_state:
+            self.preserving_state = True
+        # Cópia: as desconexões disparam eventos que também mexem em `self.guilds`
+        for _, guild_manager in list(self.guilds.items()):
+            if preserve_state:
+                guild_manager.store = None
             await guild_manager.cleanup()
-        self.guilds.clear()
\ No newline at end of file
+        self.guilds.clear()
+        
+    def close(self):
+        """Grava o estado pendente, fecha o banco e salva o índice do cache de áudio"""
+        self.ffmpeg.stop()
+        if self.store:
+            self.store.close()
+        if self.audio_cache:
+            self.audio_cache.close()
\ No newline at end of file
@@ -0,0 +1,311 @@
+"""
+Resolvedor de músicas: executa as extrações do yt-dlp fora do event loop
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from utils.cache import SongCache, canonical_id, normalize_query
+from utils.singleflight import SingleFlight
+from utils.extractor_health import ExtractorHealth, ExtractorUnavailable
+from utils.ytdl_pool import YTDLPool
+from utils import metrics
+from config import PLAYLIST_BATCH_SIZE, RESOLVER_WORKERS, RESOLVER_MAX_PENDING, RESOLVER_TIMEOUT
+
+
+class ResolverError(Exception):
+    """Erro base do resolvedor"""
+
+
+class ResolverBusy(ResolverError):
+    """O resolvedor atingiu o limite de requisições pendentes"""
+
+
+class ResolverTimeout(ResolverError, TimeoutError):
+    """A extração demorou mais que o tempo limite"""
+
+
+class ResolverCancelled(ResolverError):
+    """A extração foi cancelada porque a mensagem do comando foi apagada"""
+
+
+def _extract_flat(ydl, url: str) -> Dict[str, Any]:
+    return ydl.extract_info(url, download=False, process=False)
+
+
+def _take(ydl, entries: Iterator[Dict[str, Any]], size: int) -> List[Dict[str, Any]]:
+    return list(islice(entries, size))
+
+
+class Resolver:
+    """Envia as extrações do yt-dlp para um pool de threads limitado
+
+    Extrações iguais pedidas ao mesmo tempo (a mesma música tocando em vários
+    servidores) rodam uma única vez; ver `SingleFlight`.
+    """
+
+    _default: Optional['Resolver'] = None
+
+    @classmethod
+    def default(cls) -> 'Resolver':
+        """Retorna o resolvedor compartilhado do processo"""
+        if cls._default is None:
+            cls._default = cls()
+        return cls._default
+
+    def __init__(self, workers: int = RESOLVER_WORKERS, max_pending: int = RESOLVER_MAX_PENDING,
+                 timeout: float = RESOLVER_TIMEOUT, cache: Optional[SongCache] = None,
+                 pool: Optional[YTDLPool] = None, health: Optional[ExtractorHealth] = None):
+        self.cache = cache or SongCache()
+        self.pool = pool or YTDLPool(prewarm=False)
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='resolver')
+        # Aquece o pool de instâncias do yt-dlp sem atrasar o login do bot
+        self._executor.submit(self.pool.prewarm)
+        self._by_message: Dict[int, Set[asyncio.Task]] = {}
+        self._dropped: Set[asyncio.Task] = set()
+        self._lock = threading.Lock()
+        # Fila cheia e extrações pausadas são passageiras: não colocam a música em espera
+        self.flights = SingleFlight('extract', transient=(ResolverBusy, ExtractorUnavailable))
+        self.health = health or ExtractorHealth()
+
+        # Métricas
+        self.pending = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.cancelled = 0
+        self.rejected = 0
+        self.total_time = 0.0
+
+    def _call(self, func: Callable[..., Any], *args) -> Any:
+        """Executa uma função bloqueante contabilizando as threads ocupadas"""
+        with self._lock:
+            self.running += 1
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self.running -= 1
+
+    def _extract_sync(self, query: str, profile: str) -> Dict[str, Any]:
+        """Executa a extração (roda dentro de uma thread do pool)"""
+        with self.pool.checkout(profile) as ydl:
+            return ydl.extract_info(query, download=False)
+
+    async def run(self, func: Callable[..., Any], *args, message_id: Optional[int] = None,
+                  timeout: Optional[float] = None, executor: Optional[Executor] = None) -> Any:
+        """Executa uma função bloqueante no pool sem bloquear o event loop
+
+        Se `message_id` for informado, a execução é cancelada quando a mensagem
+        do comando for apagada (ver `cancel_for_message`). `executor` troca o
+        pool de threads (ex.: downloads do cache de áudio, que são longos).
+        """
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise ResolverBusy("Muitas buscas em andamento, tente novamente em instantes")
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(executor or self._executor, self._call, func, *args)
+        task = asyncio.ensure_future(asyncio.wait_for(future, timeout or self.timeout))
+
+        self.pending += 1
+        start = time.monotonic()
+        try:
+            result = await self._follow(task, message_id)
+            self.completed += 1
+            return result
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise ResolverTimeout("A busca demorou demais para responder")
+        except (asyncio.CancelledError, ResolverCancelled):
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.pending -= 1
+            self.total_time += time.monotonic() - start
+
+    async def _follow(self, task: asyncio.Task, message_id: Optional[int]) -> Any:
+        """Espera a task, que é cancelada se a mensagem do comando for apagada"""
+        if message_id is not None:
+            self._by_message.setdefault(message_id, set()).add(task)
+        try:
+            return await task
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            if task in self._dropped:
+                raise ResolverCancelled("A busca foi cancelada")
+            raise
+        finally:
+            self._dropped.discard(task)
+            if message_id is not None:
+                tasks = self._by_message.get(message_id)
+                if tasks is not None:
+                    tasks.discard(task)
+                    if not tasks:
+                        del self._by_message[message_id]
+
+    async def extract(self, query: str, profile: str = 'metadata',
+                      message_id: Optional[int] = None, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Extrai informações de uma URL ou busca sem bloquear o event loop
+
+        `profile` escolhe o conjunto de opções do yt-dlp (ver `YTDL_PROFILES`).
+        Pedidos com o mesmo perfil e a mesma chave canônica (ID do vídeo ou
+        termo normalizado) compartilham a extração em andamento; apagar a
+        mensagem só cancela a espera deste pedido.
+        """
+        task = asyncio.ensure_future(self.flights.do(self.flight_key(query, profile),
+                                                     partial(self._extract, query, profile, timeout)))
+        return await self._follow(task, message_id)
+
+    @staticmethod
+    def flight_key(query: str, profile: str) -> Tuple[str, str]:
+        """Chave do single-flight: ID do vídeo, a URL como veio ou o termo de busca normalizado"""
+        query = query.strip()
+        key = canonical_id(query) or (query if '://' in query else normalize_query(query))
+        return profile, key
+
+    async def _extract(self, query: str, profile: str, timeout: Optional[float]) -> Dict[str, Any]:
+        with metrics.EXTRACTION_TIME.labels(profile).time():
+            return await self.upstream(self._extract_sync, query, profile, timeout=timeout)
+
+    async def upstream(self, func: Callable[..., Any], *args, message_id: Optional[int] = None,
+                       timeout: Optional[float] = None, executor: Optional[Executor] = None) -> Any:
+        """Como `run`, para chamadas que acessam o YouTube: passam pelo limite de ritmo e pelo disjuntor"""
+        probe = await self.health.admit()
+        try:
+            result = await self.run(func, *args, message_id=message_id, timeout=timeout, executor=executor)
+        except BaseException as e:
+            self.health.record_failure(e, probe)
+            raise
+        self.health.record_success(probe)
+        return result
+
+    async def iter_playlist(self, url: str, batch_size: int = PLAYLIST_BATCH_SIZE,
+                            message_id: Optional[int] = None
+                            ) -> AsyncIterator[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+        """Lê as entradas de uma playlist em lotes, sem resolver cada vídeo
+
+        Gera tuplas (informações da playlist, lote de entradas). O primeiro lote
+        tem apenas uma entrada, para que a reprodução comece logo; as páginas
+        seguintes da playlist só são baixadas quando o lote é pedido.
+        """
+        # A instância só volta ao pool quando a última chamada terminar de fato na thread
+        lease = self.pool.lease('playlist')
+        try:
+            info = await self.upstream(lease.call, _extract_flat, url, message_id=message_id)
+            # Links como watch?v=...&list=... redirecionam para o extrator da playlist
+            for _ in range(3):
+                if info.get('_type') not in ('url', 'url_transparent'):
+                    break
+                info = await self.upstream(lease.call, _extract_flat, info['url'], message_id=message_id)
+
+            if 'entries' not in info:
+                # Não é uma playlist: devolve o próprio vídeo
+                yield {'title': info.get('title') or url, 'count': 1}, [info]
+                return
+
+            playlist = {
+                'title': info.get('title') or 'Playlist',
+                'count': info.get('playlist_count'),
+            }
+            entries = iter(info['entries'])
+            size = 1
+            while True:
+                # As páginas seguintes da playlist são baixadas aqui
+                batch = await self.upstream(lease.call, _take, entries, size, message_id=message_id)
+                if not batch:
+                    return
+                batch = [entry for entry in batch if entry]
+                if batch:
+                    yield playlist, batch
+                size = batch_size
+        finally:
+            lease.close()
+
+    async def resolve_metadata(self, query: str, message_id: Optional[int] = None) -> Dict[str, Any]:
+        """Resolve os metadados de uma URL ou busca, consultando o cache antes do yt-dlp"""
+        metadata = self.cache.get_metadata(query)
+        if metadata is not None:
+            return metadata
+
+        info = await self.extract(query, message_id=message_id)
+
+        # Se for uma playlist ou busca, pega a primeira música
+        if 'entries' in info:
+            entries = [entry for entry in info['entries'] if entry is not None]
+            if not entries:
+                raise ValueError("Nenhum vídeo válido encontrado")
+            info = entries[0]
+
+        self.cache.store(info, query)
+        return info
+
+    async def resolve_stream(self, url: str) -> str:
+        """Resolve a URL direta do áudio, reutilizando URLs assinadas ainda válidas"""
+        stream_url = self.cache.get_stream(url)
+        if stream_url is not None:
+            return stream_url
+
+        info = await self.extract(url, profile='stream')
+        if 'entries' in info:
+            entries = [entry for entry in info['entries'] if entry is not None]
+            if not entries:
+                raise ValueError("Nenhum vídeo válido encontrado")
+            info = entries[0]
+
+        self.cache.store(info, url)
+        return info['url']
+
+    def cancel_for_message(self, message_id: int) -> int:
+        """Cancela as extrações ligadas a uma mensagem; retorna quantas foram canceladas
+
+        A thread do pool termina a extração em andamento, mas o resultado é
+        descartado e o comando deixa de esperar por ele.
+        """
+        tasks = self._by_message.pop(message_id, set())
+        for task in tasks:
+            self._dropped.add(task)
+            task.cancel()
+        return len(tasks)
+
+    def stats(self) -> Dict[str, Any]:
+        """Retorna as métricas do resolvedor (profundidade da fila, tempos, erros)"""
+        finished = self.completed + self.failed + self.timeouts
+        return {
+            'workers': self.workers,
+            'pending': self.pending,
+            'running': self.running,
+            'queued': max(self.pending - self.running, 0),
+            'completed': self.completed,
+            'failed': self.failed,
+            'timeouts': self.timeouts,
+            'cancelled': self.cancelled,
+            'rejected': self.rejected,
+            'avg_time': self.total_time / finished if finished else 0.0,
+            'cache': self.cache.stats(),
+            'pool': self.pool.stats(),
+            'singleflight': self.flights.stats(),
+            'health': self.health.stats(),
+        }
+
+    def shutdown(self):
+        """Encerra o pool de threads"""
+        for tasks in self._by_message.values():
+            for task in tasks:
+                task.cancel()
+        self._by_message.clear()
+        self._executor.shutdown(wait=False)
+        self.pool.close()
+        self.cache.save()
+        if Resolver._default is self:
+            Resolver._default = None
@@ -0,0 +1,114 @@
+"""
+Serviço de busca: cache das buscas, buscas iguais compartilhadas e índice de títulos para autocomplete
+"""
+import bisect
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.cache import TTLCache, normalize_query
+from utils.resolver import Resolver
+from config import SEARCH_RESULTS_LIMIT, SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL, TITLE_INDEX_SIZE
+
+# Campos de cada resultado guardados no cache (a URL de stream fica no SongCache)
+RESULT_FIELDS = ('id', 'extractor_key', 'ie_key', 'webpage_url', 'title', 'duration', 'thumbnail', 'uploader')
+
+
+class TitleIndex:
+    """Títulos resolvidos recentemente, com busca por prefixo sem consultar o yt-dlp
+
+    Cada título é indexado a partir do início de cada palavra, então
+    "bohem" encontra "Queen - Bohemian Rhapsody". Guarda até `maxsize`
+    títulos; o menos recente sai quando o índice enche.
+    """
+
+    def __init__(self, maxsize: int = TITLE_INDEX_SIZE):
+        self.maxsize = maxsize
+        # URL -> título, na ordem de uso
+        self._titles: 'OrderedDict[str, str]' = OrderedDict()
+        # Lista ordenada de (trecho normalizado, URL)
+        self._keys: List[Tuple[str, str]] = []
+
+    def __len__(self) -> int:
+        return len(self._titles)
+
+    @staticmethod
+    def _suffixes(title: str) -> List[str]:
+        words = normalize_query(title).split(' ')
+        return [' '.join(words[i:]) for i in range(len(words)) if words[i]]
+
+    def add(self, title: Optional[str], url: Optional[str]):
+        if not title or not url:
+            return
+        if url in self._titles:
+            self._titles.move_to_end(url)
+            return
+        self._titles[url] = title
+        for suffix in self._suffixes(title):
+            bisect.insort(self._keys, (suffix, url))
+        while len(self._titles) > self.maxsize:
+            self._remove(*self._titles.popitem(last=False))
+
+    def _remove(self, url: str, title: str):
+        for suffix in self._suffixes(title):
+            index = bisect.bisect_left(self._keys, (suffix, url))
+            if index < len(self._keys) and self._keys[index] == (suffix, url):
+                del self._keys[index]
+
+    def complete(self, prefix: str, limit: int = 25) -> List[Tuple[str, str]]:
+        """Retorna até `limit` pares (título, URL) que começam com `prefix`, os mais recentes primeiro"""
+        prefix = normalize_query(prefix)
+        if not prefix:
+            return [(title, url) for url, title in reversed(self._titles.items())][:limit]
+        matches = []
+        seen = set()
+        index = bisect.bisect_left(self._keys, (prefix, ''))
+        while index < len(self._keys) and self._keys[index][0].startswith(prefix):
+            url = self._keys[index][1]
+            if url not in seen:
+                seen.add(url)
+                matches.append(url)
+            index += 1
+        # Os mais usados recentemente primeiro
+        order = {url: position for position, url in enumerate(reversed(self._titles))}
+        matches.sort(key=order.__getitem__)
+        return [(self._titles[url], url) for url in matches[:limit]]
+
+
+class SearchService:
+    """Buscas do `!search` com cache LRU/TTL pelo termo normalizado
+
+    Buscas iguais feitas ao mesmo tempo compartilham uma única extração (o
+    single-flight do resolvedor), sem ficar presas à mensagem de quem buscou.
+    Os resultados alimentam o `TitleIndex` e o cache de metadados do
+    resolvedor, então tocar um resultado depois não precisa de uma nova
+    extração de metadados.
+    """
+
+    def __init__(self, resolver: Optional[Resolver] = None, limit: int = SEARCH_RESULTS_LIMIT,
+                 cache_size: int = SEARCH_CACHE_SIZE, ttl: float = SEARCH_CACHE_TTL):
+        self.resolver = resolver or Resolver.default()
+        self.limit = limit
+        self.cache = TTLCache(cache_size, ttl)
+        self.index = TitleIndex()
+
+    async def search(self, query: str) -> List[Dict[str, Any]]:
+        """Retorna até `limit` resultados para o termo"""
+        key = normalize_query(query)
+        results = self.cache.get(key)
+        if results is not None:
+            return results
+        info = await self.resolver.extract(f"ytsearch{self.limit}:{key}", profile='search')
+        results = []
+        for entry in info.get('entries') or []:
+            if not entry:
+                continue
+            self.resolver.cache.store(entry)
+            result = {name: entry.get(name) for name in RESULT_FIELDS if entry.get(name) is not None}
+            result.setdefault('webpage_url', entry.get('url'))
+            results.append(result)
+            self.index.add(result.get('title'), result.get('webpage_url'))
+        self.cache.set(key, results)
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.cache.stats(), 'titles': len(self.index)}
@@ -0,0 +1,46 @@
+"""
+Funções auxiliares para dividir os shards entre processos
+"""
+from typing import List, Optional
+
+
+def parse_shard_ids(text: Optional[str]) -> Optional[List[int]]:
+    """Converte '0-3' ou '0,2,4' (ou combinações como '0-1,4') em uma lista de IDs"""
+    if not text:
+        return None
+    shard_ids = []
+    for part in text.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            start, end = part.split('-', 1)
+            shard_ids.extend(range(int(start), int(end) + 1))
+        else:
+            shard_ids.append(int(part))
+    return sorted(set(shard_ids))
+
+
+def format_shard_ids(shard_ids: List[int]) -> str:
+    """Formato inverso de `parse_shard_ids`, compactando faixas contínuas"""
+    ranges = []
+    for shard_id in sorted(shard_ids):
+        if ranges and ranges[-1][1] == shard_id - 1:
+            ranges[-1][1] = shard_id
+        else:
+            ranges.append([shard_id, shard_id])
+    return ','.join(str(start) if start == end else f'{start}-{end}' for start, end in ranges)
+
+
+def split_shards(shard_count: int, processes: int) -> List[List[int]]:
+    """Divide os shards em faixas contínuas, o mais equilibradas possível"""
+    processes = max(1, min(processes, shard_count))
+    size, extra = divmod(shard_count, processes)
+    groups = []
+    start = 0
+    for index in range(processes):
+        end = start + size + (1 if index < extra else 0)
+        groups.append(list(range(start, end)))
+        start = end
+    return groups
+
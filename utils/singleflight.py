@@ -0,0 +1,93 @@
+"""
+Single-flight: pedidos simultâneos pela mesma chave compartilham uma única execução
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from utils import metrics
+from config import SINGLEFLIGHT_BACKOFF, SINGLEFLIGHT_MAX_BACKOFF
+
+
+class SingleFlight:
+    """Agrupa chamadas concorrentes pela mesma chave em uma só
+
+    O primeiro pedido de uma chave ("líder") inicia a execução em uma task
+    própria; os que chegam enquanto ela roda apenas esperam o mesmo
+    resultado. Quem desiste de esperar (mensagem apagada, timeout do
+    comando) não cancela a execução dos outros.
+
+    Uma falha é repassada a todos que estavam esperando. Depois dela a chave
+    fica em espera por `backoff` segundos, dobrando a cada falha seguida até
+    `max_backoff`; nesse intervalo os pedidos recebem o mesmo erro na hora,
+    sem nova execução. Erros em `transient` (ex.: fila cheia) não contam.
+    """
+
+    def __init__(self, name: str, backoff: float = SINGLEFLIGHT_BACKOFF,
+                 max_backoff: float = SINGLEFLIGHT_MAX_BACKOFF, transient: Tuple[type, ...] = ()):
+        self.name = name
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.transient = transient
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        # chave -> (falhas seguidas, em espera até, último erro)
+        self._failures: Dict[Hashable, Tuple[int, float, BaseException]] = {}
+
+        # Métricas
+        self.leaders = 0
+        self.shared = 0
+        self.failures = 0
+        self.suppressed = 0
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """Retorna o resultado de `func()`, compartilhando a execução com quem pediu a mesma chave"""
+        future = self._inflight.get(key)
+        if future is not None:
+            self.shared += 1
+            metrics.SINGLEFLIGHT_SHARED.labels(self.name).inc()
+            return await asyncio.shield(future)
+
+        failure = self._failures.get(key)
+        if failure is not None:
+            _, until, error = failure
+            if time.monotonic() < until:
+                self.suppressed += 1
+                metrics.SINGLEFLIGHT_SUPPRESSED.labels(self.name).inc()
+                raise error.with_traceback(None)
+
+        self.leaders += 1
+        future = asyncio.ensure_future(func())
+        self._inflight[key] = future
+        future.add_done_callback(lambda done: self._finished(key, done))
+        return await asyncio.shield(future)
+
+    def _finished(self, key: Hashable, future: asyncio.Future):
+        self._inflight.pop(key, None)
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is None:
+            self._failures.pop(key, None)
+        elif not isinstance(error, self.transient):
+            self.failures += 1
+            count = self._failures[key][0] + 1 if key in self._failures else 1
+            delay = min(self.backoff * 2 ** (count - 1), self.max_backoff)
+            self._failures[key] = (count, time.monotonic() + delay, error)
+            self._prune()
+
+    def _prune(self):
+        """Esquece as falhas antigas (a contagem só vale para falhas seguidas)"""
+        now = time.monotonic()
+        expired = [key for key, (_, until, _) in self._failures.items() if until + self.max_backoff <= now]
+        for key in expired:
+            del self._failures[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'inflight': len(self._inflight),
+            'leaders': self.leaders,
+            'shared': self.shared,
+            'failures': self.failures,
+            'suppressed': self.suppressed,
+            'backing_off': sum(1 for _, until, _ in self._failures.values() if until > time.monotonic()),
+        }
@@ -0,0 +1,235 @@
+"""
+Fila de músicas indexada para filas grandes
+"""
+import random
+from collections import deque
+from itertools import chain, islice
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+def requester_key(song: Any) -> Optional[int]:
+    """Retorna o ID de quem pediu a música (ou None)"""
+    return getattr(song, 'requester_id', None)
+
+
+class SongQueue:
+    """Fila de músicas dividida em blocos, com índice posicional
+
+    As músicas ficam em blocos (deques) de até `2 * LOAD` itens e uma árvore
+    de Fenwick guarda o tamanho dos blocos. Com isso:
+
+    - `popleft` e `append` são O(1) (amortizado);
+    - acesso, inserção e remoção por posição custam O(log n + LOAD);
+    - uma página da fila (`queue[start:end]`) custa O(log n + tamanho da página).
+
+    A interface imita uma lista (`len`, iteração, índices, fatias, `pop`,
+    `insert`, `clear`) para substituir a lista usada antes.
+    """
+
+    LOAD = 64
+
+    def __init__(self, songs: Iterable[Any] = ()):
+        self._blocks: List[Deque[Any]] = []
+        self._tree: Optional[List[int]] = None
+        # Itens removidos do início do primeiro bloco que ainda não foram descontados da árvore
+        self._shift = 0
+        self._len = 0
+        # ID do solicitante -> músicas dele na fila (dict usado como conjunto ordenado)
+        self._by_requester: Dict[Optional[int], Dict[int, Any]] = {}
+        self.extend(songs)
+
+    # --- Índice de Fenwick sobre o tamanho dos blocos ---
+
+    def _build_tree(self) -> List[int]:
+        blocks = self._blocks
+        size = len(blocks)
+        tree = [0] * (size + 1)
+        for i in range(1, size + 1):
+            tree[i] += len(blocks[i - 1])
+            parent = i + (i & -i)
+            if parent <= size:
+                tree[parent] += tree[i]
+        self._tree = tree
+        self._shift = 0
+        return tree
+
+    def _update(self, block: int, delta: int):
+        tree = self._tree
+        if tree is None:
+            return
+        i = block + 1
+        size = len(tree) - 1
+        while i <= size:
+            tree[i] += delta
+            i += i & -i
+
+    def _locate(self, index: int) -> Tuple[int, int]:
+        """Converte uma posição da fila em (bloco, posição dentro do bloco)"""
+        first = len(self._blocks[0])
+        if index < first:
+            return 0, index
+        tree = self._tree if self._tree is not None else self._build_tree()
+        remaining = index + self._shift
+        pos = 0
+        step = 1 << (len(tree) - 1).bit_length()
+        while step:
+            nxt = pos + step
+            if nxt < len(tree) and tree[nxt] <= remaining:
+                pos = nxt
+                remaining -= tree[nxt]
+            step >>= 1
+        return pos, remaining
+
+    def _normalize(self, index: int) -> int:
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError('índice fora da fila')
+        return index
+
+    # --- Índice por solicitante ---
+
+    def _index(self, song: Any):
+        self._by_requester.setdefault(requester_key(song), {})[id(song)] = song
+
+    def _unindex(self, song: Any):
+        key = requester_key(song)
+        songs = self._by_requester.get(key)
+        if songs is not None:
+            songs.pop(id(song), None)
+            if not songs:
+                del self._by_requester[key]
+
+    def by_requester(self, requester_id: Optional[int]) -> List[Any]:
+        """Músicas de um solicitante, na ordem em que foram adicionadas"""
+        return list(self._by_requester.get(requester_id, {}).values())
+
+    def count_by(self, requester_id: Optional[int]) -> int:
+        """Quantidade de músicas de um solicitante na fila"""
+        return len(self._by_requester.get(requester_id, ()))
+
+    # --- Interface de lista ---
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __bool__(self) -> bool:
+        return self._len > 0
+
+    def __iter__(self) -> Iterator[Any]:
+        return chain.from_iterable(self._blocks)
+
+    def __repr__(self) -> str:
+        return f"SongQueue({list(self)!r})"
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._len)
+            if step != 1:
+                return list(self)[index]
+            return self.page_range(start, stop)
+        block, offset = self._locate(self._normalize(index))
+        return self._blocks[block][offset]
+
+    def page_range(self, start: int, stop: int) -> List[Any]:
+        """Retorna as músicas entre `start` e `stop` sem percorrer a fila inteira"""
+        if start >= stop or start >= self._len:
+            return []
+        block, offset = self._locate(start)
+        result: List[Any] = []
+        wanted = stop - start
+        for current in islice(self._blocks, block, None):
+            result.extend(islice(current, offset, offset + wanted - len(result)))
+            if len(result) >= wanted:
+                break
+            offset = 0
+        return result
+
+    def page(self, page: int, per_page: int = 10) -> List[Any]:
+        """Retorna uma página da fila (começando em 0)"""
+        return self.page_range(page * per_page, (page + 1) * per_page)
+
+    def append(self, song: Any):
+        blocks = self._blocks
+        if blocks and len(blocks[-1]) < self.LOAD:
+            blocks[-1].append(song)
+            self._update(len(blocks) - 1, 1)
+        else:
+            blocks.append(deque([song]))
+            self._tree = None
+        self._len += 1
+        self._index(song)
+
+    def extend(self, songs: Iterable[Any]):
+        for song in songs:
+            self.append(song)
+
+    def popleft(self) -> Any:
+        if not self._len:
+            raise IndexError('fila vazia')
+        first = self._blocks[0]
+        song = first.popleft()
+        if first:
+            self._shift += 1
+        else:
+            del self._blocks[0]
+            self._tree = None
+        self._len -= 1
+        self._unindex(song)
+        return song
+
+    def pop(self, index: int = -1) -> Any:
+        index = self._normalize(index)
+        if index == 0:
+            return self.popleft()
+        block, offset = self._locate(index)
+        current = self._blocks[block]
+        song = current[offset]
+        del current[offset]
+        if current:
+            self._update(block, -1)
+        else:
+            del self._blocks[block]
+            self._tree = None
+        self._len -= 1
+        self._unindex(song)
+        return song
+
+    def insert(self, index: int, song: Any):
+        if index < 0:
+            index = max(index + self._len, 0)
+        if index >= self._len:
+            self.append(song)
+            return
+        block, offset = self._locate(index)
+        current = self._blocks[block]
+        if block == 0 and offset == 0 and self._shift:
+            # Reaproveita o espaço deixado por popleft no primeiro bloco
+            current.appendleft(song)
+            self._shift -= 1
+        else:
+            current.insert(offset, song)
+            self._update(block, 1)
+        if len(current) > 2 * self.LOAD:
+            half = len(current) // 2
+            tail = deque(islice(current, half, None))
+            for _ in range(len(tail)):
+                current.pop()
+            self._blocks.insert(block + 1, tail)
+            self._tree = None
+        self._len += 1
+        self._index(song)
+
+    def clear(self):
+        self._blocks.clear()
+        self._by_requester.clear()
+        self._tree = None
+        self._shift = 0
+        self._len = 0
+
+    def shuffle(self, rng: random.Random = None):
+        """Embaralha a fila"""
+        songs = list(self)
+        (rng or random).shuffle(songs)
+        self.clear()
+        self.extend(songs)
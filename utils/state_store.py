@@ -0,0 +1,269 @@
+"""
+Persistência do estado de música dos servidores (SQLite ou memória)
+"""
+import json
+import queue
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+
+from config import STATE_BACKEND, STATE_DB_PATH
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS guild_state (
+    guild_id INTEGER PRIMARY KEY,
+    volume REAL NOT NULL,
+    is_looping INTEGER NOT NULL,
+    current_song TEXT
+);
+CREATE TABLE IF NOT EXISTS queue_entries (
+    guild_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    song TEXT NOT NULL,
+    PRIMARY KEY (guild_id, position)
+);
+"""
+
+# Quantidade máxima de operações agrupadas em uma única transação
+WRITE_BATCH = 256
+
+
+class StateBackend(ABC):
+    """Interface dos backends de estado usados pelo MusicManager
+
+    As escritas são incrementais (uma chamada por mudança na fila) e `load`
+    devolve o estado de um servidor no formato
+    `{'volume', 'is_looping', 'current_song', 'queue'}`, ou None.
+    """
+
+    @abstractmethod
+    def save_settings(self, guild_id: int, volume: float, is_looping: bool,
+                      current_song: Optional[Dict[str, Any]]):
+        ...
+
+    @abstractmethod
+    def append(self, guild_id: int, position: int, song: Dict[str, Any]):
+        ...
+
+    @abstractmethod
+    def remove(self, guild_id: int, position: int):
+        ...
+
+    @abstractmethod
+    def replace_queue(self, guild_id: int, songs: List[Dict[str, Any]]):
+        ...
+
+    @abstractmethod
+    def delete_guild(self, guild_id: int):
+        ...
+
+    @abstractmethod
+    def load(self, guild_id: int) -> Optional[Dict[str, Any]]:
+        ...
+
+    def flush(self):
+        """Espera as escritas pendentes (se o backend tiver alguma)"""
+
+    def close(self):
+        """Libera os recursos do backend"""
+
+
+class MemoryStateStore(StateBackend):
+    """Guarda o estado só na memória do processo (perdido ao reiniciar)
+
+    Útil para testes e para shards que não precisam restaurar filas.
+    """
+
+    def __init__(self):
+        self._guilds: Dict[int, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _state(self, guild_id: int) -> Dict[str, Any]:
+        return self._guilds.setdefault(guild_id, {
+            'volume': None, 'is_looping': False, 'current_song': None, 'queue': []
+        })
+
+    def save_settings(self, guild_id: int, volume: float, is_looping: bool,
+                      current_song: Optional[Dict[str, Any]]):
+        with self._lock:
+            state = self._state(guild_id)
+            state.update(volume=volume, is_looping=bool(is_looping),
+                         current_song=dict(current_song) if current_song else None)
+
+    def append(self, guild_id: int, position: int, song: Dict[str, Any]):
+        with self._lock:
+            songs = self._state(guild_id)['queue']
+            if position < len(songs):
+                songs[position] = dict(song)
+            else:
+                songs.append(dict(song))
+
+    def remove(self, guild_id: int, position: int):
+        with self._lock:
+            songs = self._state(guild_id)['queue']
+            if 0 <= position < len(songs):
+                del songs[position]
+
+    def replace_queue(self, guild_id: int, songs: List[Dict[str, Any]]):
+        with self._lock:
+            self._state(guild_id)['queue'] = [dict(song) for song in songs]
+
+    def delete_guild(self, guild_id: int):
+        with self._lock:
+            self._guilds.pop(guild_id, None)
+
+    def load(self, guild_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            state = self._guilds.get(guild_id)
+            if state is None:
+                return None
+            return {**state, 'queue': [dict(song) for song in state['queue']]}
+
+
+class GuildStateStore(StateBackend):
+    """Guarda filas e configurações de cada servidor em um banco SQLite
+
+    As escritas são incrementais (uma operação por mudança na fila) e feitas
+    por uma thread dedicada, que agrupa as operações pendentes em uma única
+    transação. Assim o event loop nunca espera pelo disco.
+
+    Vários processos (um por faixa de shards) podem usar o mesmo arquivo:
+    o modo WAL permite leituras concorrentes e cada servidor pertence a um
+    único shard, então as escritas de processos diferentes não se misturam.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._ops: 'queue.Queue[Optional[tuple]]' = queue.Queue()
+        self._reader = self._connect()
+        # As leituras rodam em threads do executor (ver `MusicManager.get_guild_manager`)
+        self._reader_lock = threading.Lock()
+        self._reader.executescript(SCHEMA)
+        self._reader.commit()
+        self._thread = threading.Thread(target=self._writer, name='state-store', daemon=True)
+        self._thread.start()
+        self.writes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _writer(self):
+        """Thread de escrita: executa as operações pendentes em lotes"""
+        conn = self._connect()
+        running = True
+        while running:
+            batch = [self._ops.get()]
+            while len(batch) < WRITE_BATCH:
+                try:
+                    batch.append(self._ops.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with conn:
+                    for op in batch:
+                        if op is None:
+                            running = False
+                            continue
+                        for sql, params in op:
+                            conn.execute(sql, params)
+                self.writes += len(batch)
+            except sqlite3.Error as e:
+                print(f'Erro ao salvar estado dos servidores: {e}')
+            finally:
+                for _ in batch:
+                    self._ops.task_done()
+        conn.close()
+
+    def _submit(self, *statements: tuple):
+        """Agenda uma operação (uma ou mais instruções SQL executadas juntas)"""
+        self._ops.put(statements)
+
+    # --- Escritas incrementais ---
+
+    def save_settings(self, guild_id: int, volume: float, is_looping: bool,
+                      current_song: Optional[Dict[str, Any]]):
+        self._submit((
+            'INSERT INTO guild_state (guild_id, volume, is_looping, current_song) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT(guild_id) DO UPDATE SET volume = excluded.volume, '
+            'is_looping = excluded.is_looping, current_song = excluded.current_song',
+            (guild_id, volume, int(is_looping), json.dumps(current_song) if current_song else None)
+        ))
+
+    def append(self, guild_id: int, position: int, song: Dict[str, Any]):
+        self._submit((
+            'INSERT OR REPLACE INTO queue_entries (guild_id, position, song) VALUES (?, ?, ?)',
+            (guild_id, position, json.dumps(song))
+        ))
+
+    def remove(self, guild_id: int, position: int):
+        # Duas etapas para não violar a chave primária ao deslocar as posições
+        self._submit(
+            ('DELETE FROM queue_entries WHERE guild_id = ? AND position = ?', (guild_id, position)),
+            ('UPDATE queue_entries SET position = -(position - 1) WHERE guild_id = ? AND position > ?',
+             (guild_id, position)),
+            ('UPDATE queue_entries SET position = -position WHERE guild_id = ? AND position < 0', (guild_id,)),
+        )
+
+    def replace_queue(self, guild_id: int, songs: List[Dict[str, Any]]):
+        self._submit(
+            ('DELETE FROM queue_entries WHERE guild_id = ?', (guild_id,)),
+            *[('INSERT INTO queue_entries (guild_id, position, song) VALUES (?, ?, ?)',
+               (guild_id, position, json.dumps(song))) for position, song in enumerate(songs)]
+        )
+
+    def delete_guild(self, guild_id: int):
+        self._submit(
+            ('DELETE FROM queue_entries WHERE guild_id = ?', (guild_id,)),
+            ('DELETE FROM guild_state WHERE guild_id = ?', (guild_id,)),
+        )
+
+    # --- Leitura ---
+
+    def load(self, guild_id: int) -> Optional[Dict[str, Any]]:
+        """Carrega o estado salvo de um servidor, ou None se não houver
+
+        Bloqueante: espera as escritas pendentes, então não deve rodar no event loop.
+        """
+        if self._ops.unfinished_tasks:
+            self.flush()
+        with self._reader_lock:
+            row = self._reader.execute(
+                'SELECT volume, is_looping, current_song FROM guild_state WHERE guild_id = ?', (guild_id,)
+            ).fetchone()
+            songs = [json.loads(song) for (song,) in self._reader.execute(
+                'SELECT song FROM queue_entries WHERE guild_id = ? ORDER BY position', (guild_id,)
+            )]
+        if row is None and not songs:
+            return None
+        volume, is_looping, current_song = row if row else (None, False, None)
+        return {
+            'volume': volume,
+            'is_looping': bool(is_looping),
+            'current_song': json.loads(current_song) if current_song else None,
+            'queue': songs,
+        }
+
+    def flush(self):
+        """Espera todas as escritas pendentes serem gravadas"""
+        self._ops.join()
+
+    def close(self):
+        """Grava o que estiver pendente e encerra a thread de escrita"""
+        if not self._thread.is_alive():
+            return
+        self._ops.put(None)
+        self._thread.join()
+        self._reader.close()
+
+
+def create_state_store(backend: str = STATE_BACKEND, path: Optional[str] = STATE_DB_PATH) -> Optional[StateBackend]:
+    """Cria o backend de estado configurado (`sqlite` ou `memory`)"""
+    if backend == 'memory':
+        return MemoryStateStore()
+    if backend == 'sqlite':
+        return GuildStateStore(path) if path else None
+    raise ValueError(f"Backend de estado desconhecido: {backend}")
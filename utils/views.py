@@ -4,93 +4,115 @@ Views e componentes de UI do Discord
 import discord
 from discord.ext import commands
 from typing import Optional
-from utils.music_manager import MusicManager
+from utils.music_manager import MusicManager, GuildMusicManager, Song
+from utils.embeds import MusicEmbeds
 
-class MusicControlView(discord.ui.View):
-    """View com botões de controle de música"""
+class MusicControlButton(discord.ui.DynamicItem[discord.ui.Button],
+                         template=r'music:(?P<action>play_pause|skip|stop|shuffle|loop):(?P<guild_id>[0-9]+)'):
+    """Botão persistente de controle; o `custom_id` codifica a ação e o servidor
+
+    Registrado uma única vez com `bot.add_dynamic_items`, funciona para
+    qualquer painel (inclusive após reiniciar o bot) sem manter um objeto
+    e um timer por mensagem.
+    """
     
-    def __init__(self, music_manager: MusicManager, guild_id: int):
-        super().__init__(timeout=300)
-        self.music_manager = music_manager
+    ACTIONS = {
+        'play_pause': ("⏯️", discord.ButtonStyle.primary),
+        'skip': ("⏭️", discord.ButtonStyle.secondary),
+        'stop': ("⏹️", discord.ButtonStyle.danger),
+        'shuffle': ("🔀", discord.ButtonStyle.secondary),
+        'loop': ("🔁", discord.ButtonStyle.secondary),
+    }
+    
+    def __init__(self, action: str, guild_id: int):
+        emoji, style = self.ACTIONS[action]
+        super().__init__(discord.ui.Button(emoji=emoji, style=style, custom_id=f"music:{action}:{guild_id}"))
+        self.action = action
         self.guild_id = guild_id
     
-    @discord.ui.button(emoji="⏯️", style=discord.ButtonStyle.primary)
-    async def play_pause(self, interaction: discord.Interaction, button: discord.ui.Button):
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(match['action'], int(match['guild_id']))
+    
+    async def callback(self, interaction: discord.Interaction):
+        music_cog = interaction.client.get_cog('Music')
+        if music_cog is None:
+            await interaction.response.send_message("❌ O módulo de música não está carregado!", ephemeral=True)
+            return
+        manager = await music_cog.music_manager.get_guild_manager(self.guild_id)
+        # A ação muda o estado sob o lock do servidor; a resposta é enviada depois de liberá-lo
+        async with manager.lock:
+            message = getattr(self, self.action)(music_cog, interaction, manager)
+        await interaction.response.send_message(message, ephemeral=True)
+        # Cliques seguidos viram uma única edição do painel
+        music_cog.refresh_status(interaction.channel, manager)
+    
+    def play_pause(self, music_cog, interaction: discord.Interaction, manager: GuildMusicManager) -> str:
         """Botão de play/pause"""
-        manager = self.music_manager.get_guild_manager(self.guild_id)
-        
         if not manager.voice_client:
-            await interaction.response.send_message("❌ Não estou conectado a um canal de voz!", ephemeral=True)
-            return
+            return "❌ Não estou conectado a um canal de voz!"
             
         if manager.voice_client.is_playing():
             manager.voice_client.pause()
             manager.is_paused = True
-            await interaction.response.send_message("⏸️ Música pausada", ephemeral=True)
-        elif manager.voice_client.is_paused():
+            return "⏸️ Música pausada"
+        if manager.voice_client.is_paused():
             manager.voice_client.resume()
             manager.is_paused = False
-            await interaction.response.send_message("▶️ Música retomada", ephemeral=True)
-        else:
-            await interaction.response.send_message("❌ Nenhuma música está tocando!", ephemeral=True)
+            return "▶️ Música retomada"
+        return "❌ Nenhuma música está tocando!"
     
-    @discord.ui.button(emoji="⏭️", style=discord.ButtonStyle.secondary)
-    async def skip(self, interaction: discord.Interaction, button: discord.ui.Button):
+    def skip(self, music_cog, interaction: discord.Interaction, manager: GuildMusicManager) -> str:
         """Botão de skip"""
-        manager = self.music_manager.get_guild_manager(self.guild_id)
-        
         if not manager.voice_client or not manager.voice_client.is_playing():
-            await interaction.response.send_message("❌ Nenhuma música está tocando!", ephemeral=True)
-            return
+            return "❌ Nenhuma música está tocando!"
             
         manager.voice_client.stop()
-        await interaction.response.send_message("⏭️ Música pulada", ephemeral=True)
+        return "⏭️ Música pulada"
     
-    @discord.ui.button(emoji="⏹️", style=discord.ButtonStyle.danger)
-    async def stop(self, interaction: discord.Interaction, button: discord.ui.Button):
+    def stop(self, music_cog, interaction: discord.Interaction, manager: GuildMusicManager) -> str:
         """Botão de stop"""
-        manager = self.music_manager.get_guild_manager(self.guild_id)
-        
-        if manager.voice_client:
-            manager.voice_client.stop()
-            manager.clear_queue()
-            manager.current_song = None
-            await interaction.response.send_message("⏹️ Reprodução parada e fila limpa", ephemeral=True)
-        else:
-            await interaction.response.send_message("❌ Não estou tocando nada!", ephemeral=True)
+        if not manager.voice_client:
+            return "❌ Não estou tocando nada!"
+            
+        music_cog.stop_playback(interaction.channel, manager)
+        return "⏹️ Reprodução parada e fila limpa"
     
-    @discord.ui.button(emoji="🔀", style=discord.ButtonStyle.secondary)
-    async def shuffle(self, interaction: discord.Interaction, button: discord.ui.Button):
+    def shuffle(self, music_cog, interaction: discord.Interaction, manager: GuildMusicManager) -> str:
         """Botão de shuffle"""
-        manager = self.music_manager.get_guild_manager(self.guild_id)
-        
         if not manager.queue:
-            await interaction.response.send_message("❌ A fila está vazia!", ephemeral=True)
-            return
+            return "❌ A fila está vazia!"
             
         manager.shuffle_queue()
-        await interaction.response.send_message("🔀 Fila embaralhada", ephemeral=True)
+        return "🔀 Fila embaralhada"
     
-    @discord.ui.button(emoji="🔁", style=discord.ButtonStyle.secondary)
-    async def loop(self, interaction: discord.Interaction, button: discord.ui.Button):
+    def loop(self, music_cog, interaction: discord.Interaction, manager: GuildMusicManager) -> str:
         """Botão de loop"""
-        manager = self.music_manager.get_guild_manager(self.guild_id)
-        
         manager.is_looping = not manager.is_looping
         status = "ativado" if manager.is_looping else "desativado"
         emoji = "🔁" if manager.is_looping else "➡️"
-        
-        await interaction.response.send_message(f"{emoji} Loop {status}", ephemeral=True)
+        return f"{emoji} Loop {status}"
+
+class MusicControlView(discord.ui.View):
+    """View com botões de controle de música (sem timeout; os cliques são tratados por MusicControlButton)"""
+    
+    def __init__(self, guild_id: int):
+        super().__init__(timeout=None)
+        self.guild_id = guild_id
+        for action in MusicControlButton.ACTIONS:
+            self.add_item(MusicControlButton(action, guild_id))
 
 class SearchResultView(discord.ui.View):
     """View para seleção de resultados de busca"""
     
-    def __init__(self, results: list, music_manager: MusicManager, guild_id: int, requester: discord.Member):
+    def __init__(self, results: list, music_manager: MusicManager, ctx: commands.Context):
         super().__init__(timeout=60)
         self.results = results
         self.music_manager = music_manager
-        self.guild_id = guild_id
-        self.requester = requester
+        self.ctx = ctx
+        self.guild_id = ctx.guild.id
+        self.requester = ctx.author
+        self.selected = False
         
         # Adiciona botões numerados para cada resultado
         for i in range(min(len(results), 5)):
@@ -108,11 +130,47 @@ class SearchResultView(discord.ui.View):
             if interaction.user != self.requester:
                 await interaction.response.send_message("❌ Apenas quem fez a busca pode selecionar!", ephemeral=True)
                 return
+            if self.selected:
+                await interaction.response.send_message("❌ Uma música já foi selecionada!", ephemeral=True)
+                return
+            music_cog = interaction.client.get_cog('Music')
+            if music_cog is None:
+                await interaction.response.send_message("❌ O módulo de música não está carregado!", ephemeral=True)
+                return
+            manager = await self.music_manager.get_guild_manager(self.guild_id)
+            if not manager.voice_client:
+                await interaction.response.send_message("❌ Não estou conectado a um canal de voz!", ephemeral=True)
+                return
+                
+            # O resultado já tem URL, título, duração e miniatura: nada de buscar de novo
+            # (a URL de stream também ficou no cache quando a busca foi feita)
+            song = Song.from_entry(self.results[index], self.requester)
+            async with manager.lock:
+                # Dois cliques quase juntos: o segundo não adiciona nada
+                already = self.selected
+                if not already:
+                    active = manager.is_active
+                    added = manager.add_song(song)
+                    position = len(manager.queue)
+                    if added:
+                        self.selected = True
+                        self.stop()
                 
-            # Aqui você implementaria a lógica para adicionar a música selecionada
-            result = self.results[index]
-            await interaction.response.send_message(f"✅ Selecionado: **{result.get('title', 'Música')}**", ephemeral=True)
-            self.stop()
+            if already:
+                await interaction.response.send_message("❌ Uma música já foi selecionada!", ephemeral=True)
+            elif not added:
+                # Os botões continuam: dá para escolher de novo quando a fila andar
+                embed = MusicEmbeds.error_embed("Fila Cheia", "A fila atingiu o limite máximo!")
+                await interaction.response.send_message(embed=embed, ephemeral=True)
+            elif active:
+                await interaction.response.edit_message(embed=MusicEmbeds.song_added(song, position), view=None)
+                music_cog.refresh_status(interaction.channel, manager,
+                                         f"➕ **{song.title}** (#{position}) — {self.requester.display_name}")
+            else:
+                # Como no !play: a mensagem some e a música começa a tocar
+                await interaction.response.defer()
+                await interaction.message.delete()
+                await music_cog.play_next_song(self.ctx, manager, if_idle=True)
             
         return callback
 
@@ -138,11 +196,8 @@ class VolumeModal(discord.ui.Modal):
             if not 0 <= volume <= 100:
                 raise ValueError("Volume deve estar entre 0 e 100")
                 
-            manager = self.music_manager.get_guild_manager(self.guild_id)
-            manager.volume = volume / 100.0
-            
-            if manager.voice_client and hasattr(manager.voice_client.source, 'volume'):
-                manager.voice_client.source.volume = manager.volume
+            manager = await self.music_manager.get_guild_manager(self.guild_id)
+            manager.set_volume(volume / 100.0)
                 
             await interaction.response.send_message(f"🔊 Volume ajustado para {volume}%", ephemeral=True)
             
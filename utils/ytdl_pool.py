@@ -0,0 +1,150 @@
+"""
+Pool de instâncias reutilizáveis do YoutubeDL, separadas por perfil de opções
+"""
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator
+
+import yt_dlp
+
+from config import YTDL_PROFILES, YTDL_POOL_SIZE
+
+# Extratores instanciados antecipadamente em cada instância do pool
+WARM_EXTRACTORS = ('Youtube', 'YoutubeTab', 'YoutubeSearch')
+
+
+class YTDLPool:
+    """Mantém instâncias do YoutubeDL já construídas para evitar recriá-las a cada extração
+
+    Cada instância é usada por uma única thread por vez: `acquire` entrega uma
+    instância livre (ou cria uma nova, se todas estiverem em uso) e `release`
+    a devolve ao pool. Até `size` instâncias ociosas são mantidas por perfil.
+    """
+
+    def __init__(self, profiles: Dict[str, Dict[str, Any]] = YTDL_PROFILES, size: int = YTDL_POOL_SIZE,
+                 factory: Callable[[Dict[str, Any]], Any] = None, prewarm: bool = True):
+        self.profiles = profiles
+        self.size = size
+        self.factory = factory or yt_dlp.YoutubeDL
+        self._idle: Dict[str, queue.LifoQueue] = {name: queue.LifoQueue() for name in profiles}
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+        if prewarm:
+            self.prewarm()
+
+    def _create(self, profile: str):
+        """Cria e aquece uma nova instância para o perfil"""
+        ydl = self.factory(self.profiles[profile])
+        for key in WARM_EXTRACTORS:
+            try:
+                ydl.get_info_extractor(key)
+            except Exception:
+                pass
+        with self._lock:
+            self.created += 1
+        return ydl
+
+    def prewarm(self):
+        """Cria antecipadamente `size` instâncias de cada perfil"""
+        for name, idle in self._idle.items():
+            while idle.qsize() < self.size:
+                idle.put(self._create(name))
+
+    def acquire(self, profile: str):
+        """Retira uma instância do pool (bloqueante apenas para criar uma nova)"""
+        if profile not in self._idle:
+            raise KeyError(f"Perfil do yt-dlp desconhecido: {profile}")
+        try:
+            ydl = self._idle[profile].get_nowait()
+        except queue.Empty:
+            return self._create(profile)
+        with self._lock:
+            self.reused += 1
+        return ydl
+
+    def release(self, profile: str, ydl):
+        """Devolve uma instância ao pool, fechando-a se já houver instâncias ociosas suficientes"""
+        idle = self._idle[profile]
+        if idle.qsize() < self.size:
+            idle.put(ydl)
+        else:
+            ydl.close()
+
+    @contextmanager
+    def checkout(self, profile: str) -> Iterator[Any]:
+        """Context manager que retira e devolve uma instância"""
+        ydl = self.acquire(profile)
+        try:
+            yield ydl
+        finally:
+            self.release(profile, ydl)
+
+    def lease(self, profile: str) -> 'PoolLease':
+        """Reserva uma instância para várias chamadas seguidas (ver `PoolLease`)"""
+        return PoolLease(self, profile)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'created': self.created,
+            'reused': self.reused,
+            'idle': {name: idle.qsize() for name, idle in self._idle.items()},
+        }
+
+    def close(self):
+        """Fecha todas as instâncias ociosas"""
+        for idle in self._idle.values():
+            while True:
+                try:
+                    idle.get_nowait().close()
+                except queue.Empty:
+                    break
+
+
+class PoolLease:
+    """Uma instância do pool usada por várias chamadas seguidas, cada uma em uma thread
+
+    `call` roda dentro de uma thread do resolvedor. Uma chamada que estourou o
+    tempo ou foi cancelada continua usando a instância na thread até
+    terminar, então a instância só volta ao pool depois de `close` e do fim
+    da última chamada.
+    """
+
+    def __init__(self, pool: YTDLPool, profile: str):
+        self.pool = pool
+        self.profile = profile
+        self.ydl = None
+        self._lock = threading.Lock()
+        self._running = False
+        self._closed = False
+
+    def call(self, func: Callable[..., Any], *args) -> Any:
+        """Executa `func(ydl, *args)` com a instância reservada (bloqueante)"""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("A instância do yt-dlp já foi devolvida ao pool")
+            self._running = True
+        try:
+            if self.ydl is None:
+                self.ydl = self.pool.acquire(self.profile)
+            return func(self.ydl, *args)
+        finally:
+            with self._lock:
+                self._running = False
+                release = self._closed
+            if release:
+                self._release()
+
+    def close(self):
+        """Devolve a instância ao pool assim que nenhuma chamada estiver rodando"""
+        with self._lock:
+            self._closed = True
+            release = not self._running
+        if release:
+            self._release()
+
+    def _release(self):
+        ydl, self.ydl = self.ydl, None
+        if ydl is not None:
+            self.pool.release(self.profile, ydl)